@@ -1,27 +1,246 @@
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.monitoring import ConnectionPoolListener
 from dotenv import load_dotenv
+from typing import Dict, Optional
 import os
-from fastapi import HTTPException
+import threading
+import time
 
 load_dotenv()
 
-try:
-    client = MongoClient(os.getenv("MONGODB_URL"))
-    # Test the connection
-    client.server_info()
-    db = client.perfume_db
-    
-    # Initialize collections
-    users_collection = db.users
-    preferences_collection = db.preferences
-    products_collection = db.products
-    carts_collection = db.carts
-    orders_collection = db.orders
-
-except ConnectionFailure as e:
-    print(f"Could not connect to MongoDB: {str(e)}")
-    raise HTTPException(status_code=503, detail="Database connection failed")
-except Exception as e:
-    print(f"Unexpected error occurred: {str(e)}")
-    raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+DATABASE_NAME = os.getenv("MONGODB_DATABASE", "perfume_db")
+# "mongo", or "memory" for the in-process store in app.memory_store
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo").lower()
+# mongodump directory loaded into the memory backend, e.g. backup/perfume_db
+MEMORY_DUMP_PATH = os.getenv("MEMORY_DUMP_PATH")
+
+def _int_env(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+def client_options() -> Dict:
+    """MongoClient keyword arguments from MONGODB_* environment variables"""
+    options = {
+        "maxPoolSize": _int_env("MONGODB_MAX_POOL_SIZE") or 100,
+        "minPoolSize": _int_env("MONGODB_MIN_POOL_SIZE") or 0,
+        "maxIdleTimeMS": _int_env("MONGODB_MAX_IDLE_TIME_MS"),
+        "connectTimeoutMS": _int_env("MONGODB_CONNECT_TIMEOUT_MS") or 5000,
+        "serverSelectionTimeoutMS": _int_env("MONGODB_SERVER_SELECTION_TIMEOUT_MS") or 5000,
+        "socketTimeoutMS": _int_env("MONGODB_SOCKET_TIMEOUT_MS"),
+        "waitQueueTimeoutMS": _int_env("MONGODB_WAIT_QUEUE_TIMEOUT_MS"),
+    }
+    # e.g. "zstd,snappy,zlib"; zstd and snappy need their optional packages
+    compressors = os.getenv("MONGODB_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    return {key: value for key, value in options.items() if value is not None}
+
+class PoolMonitor(ConnectionPoolListener):
+    """Connection pool counters per server address, for the readiness endpoint"""
+
+    def __init__(self):
+        self._pools: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, event, field: str, delta: int = 1):
+        address = "%s:%s" % event.address
+        with self._lock:
+            pool = self._pools.setdefault(address, {
+                "connections": 0, "checked_out": 0, "checkouts": 0,
+                "checkout_failures": 0, "cleared": 0
+            })
+            pool[field] += delta
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {address: dict(pool) for address, pool in self._pools.items()}
+
+    def pool_created(self, event):
+        self._count(event, "connections", 0)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._count(event, "cleared")
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop("%s:%s" % event.address, None)
+
+    def connection_created(self, event):
+        self._count(event, "connections")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count(event, "connections", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._count(event, "checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._count(event, "checked_out")
+        self._count(event, "checkouts")
+
+    def connection_checked_in(self, event):
+        self._count(event, "checked_out", -1)
+
+class Mongo:
+    """
+    Owns the synchronous client (catalog, services, CLIs) and the async
+    client (request handlers). Nothing connects at import time: the app's
+    lifespan calls connect() and close(), and scripts that never run the
+    app get a client on first collection access.
+
+    With backend="memory" both clients are views of one in-process store,
+    which outlives close() so a restarted lifespan keeps its data.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        database_name: str = DATABASE_NAME,
+        backend: str = STORAGE_BACKEND,
+        dump_path: Optional[str] = MEMORY_DUMP_PATH
+    ):
+        if backend not in ("mongo", "memory"):
+            raise ValueError(f"Unknown storage backend: {backend}")
+        self.url = url
+        self.database_name = database_name
+        self.backend = backend
+        self.dump_path = dump_path
+        self.options = client_options()
+        self.generation = 0
+        self._client: Optional[MongoClient] = None
+        self._async_client: Optional[AsyncMongoClient] = None
+        self._memory = None
+        self._monitors = {"sync": PoolMonitor(), "async": PoolMonitor()}
+        self._lock = threading.Lock()
+
+    def _url(self) -> Optional[str]:
+        return self.url or os.getenv("MONGODB_URL")
+
+    def _memory_client(self):
+        # Called with the lock held
+        if self._memory is None:
+            from .memory_store import MemoryClient, load_dump
+            self._memory = MemoryClient()
+            if self.dump_path:
+                load_dump(self._memory[self.database_name], self.dump_path)
+        return self._memory
+
+    def client(self) -> MongoClient:
+        with self._lock:
+            if self._client is None:
+                if self.backend == "memory":
+                    self._client = self._memory_client()
+                else:
+                    self._client = MongoClient(
+                        self._url(), event_listeners=[self._monitors["sync"]], **self.options
+                    )
+                self.generation += 1
+            return self._client
+
+    def async_client(self) -> AsyncMongoClient:
+        with self._lock:
+            if self._async_client is None:
+                if self.backend == "memory":
+                    from .memory_store import AsyncMemoryClient
+                    self._async_client = AsyncMemoryClient(self._memory_client())
+                else:
+                    self._async_client = AsyncMongoClient(
+                        self._url(), event_listeners=[self._monitors["async"]], **self.options
+                    )
+                self.generation += 1
+            return self._async_client
+
+    def database(self, asynchronous: bool = False):
+        client = self.async_client() if asynchronous else self.client()
+        return client[self.database_name]
+
+    def connect(self):
+        """Create both clients; pymongo opens connections in the background"""
+        self.client()
+        self.async_client()
+
+    async def ping(self) -> float:
+        """Round trip of a ping through the async pool, in milliseconds"""
+        started = time.perf_counter()
+        await self.database(asynchronous=True).command("ping")
+        return (time.perf_counter() - started) * 1000
+
+    def pool_stats(self) -> Dict:
+        if self.backend == "memory":
+            return {"backend": "memory"}
+        return {
+            "max_pool_size": self.options["maxPoolSize"],
+            "min_pool_size": self.options["minPoolSize"],
+            "pools": {kind: monitor.stats() for kind, monitor in self._monitors.items()}
+        }
+
+    async def close(self):
+        with self._lock:
+            client, async_client = self._client, self._async_client
+            self._client = self._async_client = None
+            self.generation += 1
+        if client is not None:
+            client.close()
+        if async_client is not None:
+            await async_client.close()
+
+mongo = Mongo()
+
+class LazyCollection:
+    """
+    Collection handle that resolves against mongo's current client, so
+    services can bind collections at import without connecting.
+    """
+
+    def __init__(self, name: str, asynchronous: bool = False):
+        self._name = name
+        self._asynchronous = asynchronous
+        self._resolved = (None, None)
+
+    def _collection(self):
+        generation, collection = self._resolved
+        if collection is None or generation != mongo.generation:
+            collection = mongo.database(self._asynchronous)[self._name]
+            self._resolved = (mongo.generation, collection)
+        return collection
+
+    def __getattr__(self, attribute):
+        return getattr(self._collection(), attribute)
+
+class LazyDatabase:
+    def __init__(self, asynchronous: bool = False):
+        self._asynchronous = asynchronous
+
+    def __getattr__(self, name: str) -> LazyCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return LazyCollection(name, self._asynchronous)
+
+    __getitem__ = __getattr__
+
+db = LazyDatabase()
+async_db = LazyDatabase(asynchronous=True)
+
+# Initialize collections
+users_collection = db.users
+preferences_collection = db.preferences
+products_collection = db.products
+carts_collection = db.carts
+orders_collection = db.orders
+recommendations_collection = db.recommendations
+
+# FastAPI dependencies
+def get_db():
+    return mongo.database()
+
+def get_async_db():
+    return mongo.database(asynchronous=True)
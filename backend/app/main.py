@@ -1,9 +1,49 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from .database import mongo
+from .migrations import run_migrations
 from .routes import auth, preferences, products, checkout
 from .services import recommender, cart
+from .services.batch import batch_pool
+from .services.copurchase import copurchase_model
+from .services.passwords import password_hasher
+from .services.user_import import import_hashing_pool
+from .services.tokens import token_verifier
 
-app = FastAPI(title="Perfume Recommendation System")
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
+
+def migrate():
+    try:
+        applied = run_migrations()
+        if applied:
+            print(f"Applied migrations: {applied}")
+    except Exception as e:
+        print(f"Could not apply migrations: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients connect in the background and index migrations do not hold up
+    # startup, so workers serve (or report not ready) straight away
+    mongo.connect()
+    token_verifier.load()
+    migrations = None
+    if RUN_MIGRATIONS_ON_STARTUP:
+        migrations = asyncio.get_running_loop().run_in_executor(None, migrate)
+    # Co-purchase counts stream every paid order, so they are built off the request path
+    copurchase_model.start()
+    yield
+    if migrations is not None:
+        await migrations
+    await asyncio.get_running_loop().run_in_executor(None, copurchase_model.stop)
+    await asyncio.get_running_loop().run_in_executor(None, batch_pool.shutdown)
+    await asyncio.get_running_loop().run_in_executor(None, import_hashing_pool.shutdown)
+    password_hasher.shutdown()
+    await mongo.close()
+
+app = FastAPI(title="Perfume Recommendation System", lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -12,6 +52,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor", "X-Total-Count"],
 )
 
 app.include_router(auth.router, tags=["authentication"], prefix="/auth")
@@ -23,4 +64,14 @@ app.include_router(checkout.router, tags=["checkout"], prefix="/api")
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to Perfume Recommendation System API"}
\ No newline at end of file
+    return {"message": "Welcome to Perfume Recommendation System API"}
+
+# Readiness probe: 503 until MongoDB answers a ping
+@app.get("/health/ready")
+async def readiness(response: Response):
+    try:
+        ping_ms = await mongo.ping()
+    except Exception as e:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "unavailable", "detail": str(e), "pool": mongo.pool_stats()}
+    return {"status": "ready", "ping_ms": ping_ms, "pool": mongo.pool_stats()}
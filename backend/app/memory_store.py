@@ -0,0 +1,794 @@
+"""
+In-memory stand-in for MongoDB, selected with STORAGE_BACKEND=memory.
+
+Covers the query and update shapes the app uses:
+  - filters: equality (including array membership and dotted paths), $regex,
+    $or/$and/$nor, $gt/$gte/$lt/$lte, $ne, $in/$nin, $exists
+  - updates: $set, $unset, $inc, $setOnInsert, upserts, replace_one
+  - cursors: projection, sort, skip, limit, explain
+  - bulk_write with InsertOne/UpdateOne/UpdateMany/ReplaceOne/DeleteOne/DeleteMany
+  - unique indexes, enforced with DuplicateKeyError like the server
+
+Documents are copied on the way in and out, as BSON round trips would.
+Lookups by _id or by every field of a unique index are hash lookups, while
+everything else is a scan. That is close enough to an indexed MongoDB for
+reproducible local and CI performance runs.
+
+load_dump() reads the mongodump output in backup/perfume_db.
+"""
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.operations import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+_MISSING = object()
+
+def _copy(value):
+    # Much cheaper than copy.deepcopy for BSON-shaped data
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return ("d",) + tuple((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return ("l",) + tuple(_hashable(item) for item in value)
+    return value
+
+# -- Filters ---------------------------------------------------------------
+
+def _resolve(document: Dict, path: str) -> List:
+    """Values at a dotted path, descending into arrays like MongoDB does"""
+    values = [document]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    found.append(value[int(part)])
+                for item in value:
+                    if isinstance(item, dict) and part in item:
+                        found.append(item[part])
+        values = found
+    return values
+
+def _candidates(values: List) -> Iterator:
+    for value in values:
+        yield value
+        if isinstance(value, list):
+            yield from value
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _comparable(left, right) -> bool:
+    if _is_number(left) and _is_number(right):
+        return True
+    return type(left) is type(right) and isinstance(left, (str, datetime, ObjectId, bytes))
+
+def _equals(values: List, expected) -> bool:
+    if expected is None and not values:
+        return True
+    if isinstance(expected, re.Pattern):
+        return any(isinstance(value, str) and expected.search(value) for value in _candidates(values))
+    # True == 1 in Python but not in BSON
+    return any(value == expected and isinstance(value, bool) == isinstance(expected, bool)
+               for value in _candidates(values))
+
+_COMPARISONS = {
+    "$gt": lambda left, right: left > right,
+    "$gte": lambda left, right: left >= right,
+    "$lt": lambda left, right: left < right,
+    "$lte": lambda left, right: left <= right,
+}
+
+def _regex(pattern, options: str = "") -> re.Pattern:
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for option, flag in (("i", re.IGNORECASE), ("m", re.MULTILINE), ("s", re.DOTALL), ("x", re.VERBOSE)):
+        if option in options:
+            flags |= flag
+    return re.compile(pattern, flags)
+
+def _match_operators(values: List, operators: Dict) -> bool:
+    for operator, argument in operators.items():
+        if operator in _COMPARISONS:
+            compare = _COMPARISONS[operator]
+            if not any(_comparable(value, argument) and compare(value, argument)
+                       for value in _candidates(values)):
+                return False
+        elif operator == "$eq":
+            if not _equals(values, argument):
+                return False
+        elif operator == "$ne":
+            if _equals(values, argument):
+                return False
+        elif operator == "$in":
+            if not any(_equals(values, item) for item in argument):
+                return False
+        elif operator == "$nin":
+            if any(_equals(values, item) for item in argument):
+                return False
+        elif operator == "$exists":
+            if bool(values) != bool(argument):
+                return False
+        elif operator == "$regex":
+            if not _equals(values, _regex(argument, operators.get("$options", ""))):
+                return False
+        elif operator == "$options":
+            continue
+        else:
+            raise OperationFailure(f"unsupported query operator for the memory backend: {operator}")
+    return True
+
+def _is_operator_document(value) -> bool:
+    return isinstance(value, dict) and bool(value) and all(key.startswith("$") for key in value)
+
+def matches(document: Dict, query: Dict) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, branch) for branch in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, branch) for branch in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, branch) for branch in condition):
+                return False
+        elif key.startswith("$"):
+            raise OperationFailure(f"unsupported query operator for the memory backend: {key}")
+        elif _is_operator_document(condition):
+            if not _match_operators(_resolve(document, key), condition):
+                return False
+        elif not _equals(_resolve(document, key), condition):
+            return False
+    return True
+
+# -- Projections and sorting -------------------------------------------------
+
+def _path_tree(paths: Iterable[str]) -> Dict:
+    tree: Dict = {}
+    for path in paths:
+        node = tree
+        parts = path.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if node is True:
+                break
+        else:
+            node[parts[-1]] = True
+    return tree
+
+def _include(value, tree: Dict):
+    if isinstance(value, list):
+        return [_include(item, tree) for item in value if isinstance(item, (dict, list))]
+    if not isinstance(value, dict):
+        return _MISSING
+    result = {}
+    for key, subtree in tree.items():
+        if key not in value:
+            continue
+        if subtree is True:
+            result[key] = _copy(value[key])
+        else:
+            included = _include(value[key], subtree)
+            if included is not _MISSING:
+                result[key] = included
+    return result
+
+def _exclude(value, tree: Dict):
+    if isinstance(value, list):
+        return [_exclude(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return _copy(value)
+    result = {}
+    for key, item in value.items():
+        subtree = tree.get(key)
+        if subtree is True:
+            continue
+        result[key] = _exclude(item, subtree) if subtree else _copy(item)
+    return result
+
+def project(document: Dict, projection: Optional[Dict]) -> Dict:
+    if not projection:
+        return _copy(document)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = bool(projection.get("_id", True))
+    fields = {field: bool(flag) for field, flag in projection.items() if field != "_id"}
+    if any(fields.values()):
+        result = _include(document, _path_tree(field for field, flag in fields.items() if flag))
+        if include_id and "_id" in document:
+            result = {"_id": document["_id"], **result}
+        return result
+    excluded = [field for field in fields] + ([] if include_id else ["_id"])
+    return _exclude(document, _path_tree(excluded))
+
+# BSON comparison order, so mixed-type sorts come out like the server's
+_TYPE_ORDER = ((type(None), 1), (bool, 8), (int, 2), (float, 2), (str, 3), (dict, 4),
+               (list, 5), (bytes, 6), (ObjectId, 7), (datetime, 9))
+
+def _sort_key(value):
+    if value is _MISSING:
+        return (1, 0)
+    for kind, order in _TYPE_ORDER:
+        if isinstance(value, kind):
+            if kind in (dict, list):
+                return (order, repr(value))
+            return (order, value if value is not None else 0)
+    return (10, repr(value))
+
+def _sort_value(document: Dict, field: str):
+    values = _resolve(document, field)
+    return values[0] if values else _MISSING
+
+def _normalize_sort(key_or_list, direction=None) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or ASCENDING)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+# -- Updates -------------------------------------------------------------------
+
+def _set_path(document: Dict, path: str, value):
+    parts = path.split(".")
+    node = document
+    for part in parts[:-1]:
+        if isinstance(node, list) and part.isdigit():
+            node = node[int(part)]
+            continue
+        node = node.setdefault(part, {})
+    if isinstance(node, list) and parts[-1].isdigit():
+        node[int(parts[-1])] = value
+    else:
+        node[parts[-1]] = value
+
+def _unset_path(document: Dict, path: str):
+    parts = path.split(".")
+    node = document
+    for part in parts[:-1]:
+        node = node.get(part) if isinstance(node, dict) else None
+        if node is None:
+            return
+    if isinstance(node, dict):
+        node.pop(parts[-1], None)
+
+def apply_update(document: Dict, update: Dict, inserting: bool = False) -> Dict:
+    updated = _copy(document)
+    for operator, fields in update.items():
+        if operator == "$set" or (operator == "$setOnInsert" and inserting):
+            for path, value in fields.items():
+                _set_path(updated, path, _copy(value))
+        elif operator == "$setOnInsert":
+            continue
+        elif operator == "$unset":
+            for path in fields:
+                _unset_path(updated, path)
+        elif operator == "$inc":
+            for path, amount in fields.items():
+                current = _sort_value(updated, path)
+                _set_path(updated, path, (0 if current is _MISSING else current) + amount)
+        else:
+            raise OperationFailure(f"unsupported update operator for the memory backend: {operator}")
+    return updated
+
+def _upsert_seed(query: Dict) -> Dict:
+    """Equality fields of an upsert filter become fields of the new document"""
+    document: Dict = {}
+    for key, condition in query.items():
+        if key.startswith("$"):
+            continue
+        if _is_operator_document(condition):
+            if "$eq" in condition:
+                _set_path(document, key, _copy(condition["$eq"]))
+            continue
+        _set_path(document, key, _copy(condition))
+    return document
+
+# -- Collections ---------------------------------------------------------------
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query: Dict, projection: Optional[Dict]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    def _documents(self) -> List[Dict]:
+        documents = self._collection._select(self._query)
+        for field, direction in reversed(self._sort):
+            documents.sort(key=lambda document: _sort_key(_sort_value(document, field)),
+                           reverse=direction < 0)
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:abs(self._limit)]
+        return [project(document, self._projection) for document in documents]
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self._documents())
+
+    def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        documents = self._documents()
+        return documents[:length] if length else documents
+
+    def explain(self) -> Dict:
+        return {"queryPlanner": {"winningPlan": self._collection._plan(self._query)}}
+
+class MemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: Dict[Any, Dict] = {}
+        # name -> (fields, unique, sparse); unique ones also keep a value -> _id map
+        self._indexes: Dict[str, Tuple[Tuple[str, ...], bool, bool]] = {"_id_": (("_id",), True, False)}
+        self._unique_keys: Dict[str, Dict[Any, Any]] = {}
+        self._lock = threading.RLock()
+
+    # Index maintenance
+    def _index_key(self, document: Dict, fields: Tuple[str, ...], sparse: bool):
+        values = []
+        for field in fields:
+            value = _sort_value(document, field)
+            if value is _MISSING:
+                if sparse:
+                    return _MISSING
+                value = None
+            values.append(_hashable(value))
+        return tuple(values)
+
+    def _check_unique(self, document: Dict, ignore_id=_MISSING):
+        for name, keys in self._unique_keys.items():
+            fields, _, sparse = self._indexes[name]
+            key = self._index_key(document, fields, sparse)
+            if key is _MISSING:
+                continue
+            owner = keys.get(key, _MISSING)
+            if owner is not _MISSING and owner != ignore_id:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} index: {name}",
+                    11000, {"keyValue": dict(zip(fields, key))}
+                )
+
+    def _index(self, document: Dict):
+        for name, keys in self._unique_keys.items():
+            fields, _, sparse = self._indexes[name]
+            key = self._index_key(document, fields, sparse)
+            if key is not _MISSING:
+                keys[key] = document["_id"]
+
+    def _unindex(self, document: Dict):
+        for name, keys in self._unique_keys.items():
+            fields, _, sparse = self._indexes[name]
+            key = self._index_key(document, fields, sparse)
+            if key is not _MISSING and keys.get(key) == document["_id"]:
+                del keys[key]
+
+    def _store(self, document: Dict, replacing: Optional[Dict] = None):
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        if replacing is None and document["_id"] in self._documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_", 11000,
+                {"keyValue": {"_id": document["_id"]}}
+            )
+        self._check_unique(document, ignore_id=document["_id"] if replacing is not None else _MISSING)
+        if replacing is not None:
+            self._unindex(replacing)
+        self._documents[document["_id"]] = document
+        self._index(document)
+
+    # Query planning: hash lookups where an equality or $in filter allows it
+    @staticmethod
+    def _lookup_values(condition) -> Optional[List]:
+        if isinstance(condition, (dict, list, re.Pattern)):
+            if isinstance(condition, dict) and set(condition) == {"$in"} and not any(
+                isinstance(value, (dict, list, re.Pattern)) for value in condition["$in"]
+            ):
+                return list(condition["$in"])
+            return None
+        return [condition]
+
+    def _lookup_keys(self, query: Dict) -> Optional[List]:
+        if "_id" in query:
+            values = self._lookup_values(query["_id"])
+            if values is not None:
+                return values
+        for name, keys in self._unique_keys.items():
+            fields, _, sparse = self._indexes[name]
+            if sparse or not all(field in query for field in fields):
+                continue
+            if len(fields) == 1:
+                values = self._lookup_values(query[fields[0]])
+                if values is None:
+                    continue
+                owners = (keys.get((_hashable(value),), _MISSING) for value in values)
+            else:
+                if any(isinstance(query[field], (dict, list, re.Pattern)) for field in fields):
+                    continue
+                owners = [keys.get(tuple(_hashable(query[field]) for field in fields), _MISSING)]
+            return list(dict.fromkeys(owner for owner in owners if owner is not _MISSING))
+        return None
+
+    def _select(self, query: Optional[Dict]) -> List[Dict]:
+        query = query or {}
+        with self._lock:
+            ids = self._lookup_keys(query)
+            if ids is not None:
+                documents = [self._documents[_id] for _id in ids if _id in self._documents]
+            else:
+                documents = list(self._documents.values())
+        return [document for document in documents if matches(document, query)]
+
+    def _plan(self, query: Dict) -> Dict:
+        # Mirrors _select: only hash lookups use an index, non-unique indexes are never consulted
+        if self._lookup_keys(query) is not None:
+            return {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+        return {"stage": "COLLSCAN"}
+
+    # Reads
+    def find(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None, **kwargs) -> MemoryCursor:
+        cursor = MemoryCursor(self, filter or {}, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        return cursor.skip(kwargs.get("skip", 0)).limit(kwargs.get("limit", 0))
+
+    def find_one(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None, **kwargs) -> Optional[Dict]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        documents = self.find(filter, projection, **kwargs).limit(1).to_list()
+        return documents[0] if documents else None
+
+    def count_documents(self, filter: Dict, **kwargs) -> int:
+        documents = self._select(filter)
+        documents = documents[kwargs.get("skip", 0):]
+        return min(len(documents), kwargs["limit"]) if kwargs.get("limit") else len(documents)
+
+    def estimated_document_count(self, **kwargs) -> int:
+        return len(self._documents)
+
+    def distinct(self, key: str, filter: Optional[Dict] = None) -> List:
+        seen = {}
+        for document in self._select(filter):
+            for value in _candidates(_resolve(document, key)):
+                if not isinstance(value, list):
+                    seen.setdefault(_hashable(value), value)
+        return list(seen.values())
+
+    # Writes
+    def insert_one(self, document: Dict, **kwargs) -> InsertOneResult:
+        with self._lock:
+            stored = _copy(document)
+            self._store(stored)
+        # pymongo sets _id on the caller's document too
+        document.setdefault("_id", stored["_id"])
+        return InsertOneResult(stored["_id"], True)
+
+    def insert_many(self, documents: Iterable[Dict], ordered: bool = True, **kwargs) -> InsertManyResult:
+        _, inserted_ids = self._bulk([InsertOne(document) for document in documents], ordered)
+        return InsertManyResult(inserted_ids, True)
+
+    def _update(self, filter: Dict, update: Dict, upsert: bool, many: bool, replace: bool = False) -> Dict:
+        with self._lock:
+            targets = self._select(filter)
+            if not many:
+                targets = targets[:1]
+            modified = 0
+            for document in targets:
+                if replace:
+                    updated = _copy(update)
+                    updated["_id"] = document["_id"]
+                else:
+                    updated = apply_update(document, update)
+                    if updated.get("_id") != document["_id"]:
+                        raise OperationFailure("the _id field cannot be changed")
+                if updated != document:
+                    self._store(updated, replacing=document)
+                    modified += 1
+            if targets or not upsert:
+                return {"n": len(targets), "nModified": modified}
+            seed = _upsert_seed(filter)
+            if replace:
+                document = _copy(update)
+                if "_id" in seed:
+                    document.setdefault("_id", seed["_id"])
+            else:
+                document = apply_update(seed, update, inserting=True)
+            self._store(document)
+            return {"n": 1, "nModified": 0, "upserted": document["_id"]}
+
+    def update_one(self, filter: Dict, update: Dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, many=False), True)
+
+    def update_many(self, filter: Dict, update: Dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, many=True), True)
+
+    def replace_one(self, filter: Dict, replacement: Dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, replacement, upsert, many=False, replace=True), True)
+
+    def _delete(self, filter: Dict, many: bool) -> int:
+        with self._lock:
+            targets = self._select(filter)
+            if not many:
+                targets = targets[:1]
+            for document in targets:
+                self._unindex(document)
+                del self._documents[document["_id"]]
+            return len(targets)
+
+    def delete_one(self, filter: Dict, **kwargs) -> DeleteResult:
+        return DeleteResult({"n": self._delete(filter, many=False)}, True)
+
+    def delete_many(self, filter: Dict, **kwargs) -> DeleteResult:
+        return DeleteResult({"n": self._delete(filter, many=True)}, True)
+
+    def _bulk(self, requests: List, ordered: bool) -> Tuple[Dict, List]:
+        """Apply write operations; returns the server-style summary and inserted ids"""
+        summary = {
+            "writeErrors": [], "writeConcernErrors": [], "nInserted": 0, "nUpserted": 0,
+            "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []
+        }
+        inserted_ids = []
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    document = request._doc
+                    with self._lock:
+                        stored = _copy(document)
+                        self._store(stored)
+                    document.setdefault("_id", stored["_id"])
+                    inserted_ids.append(stored["_id"])
+                    summary["nInserted"] += 1
+                    continue
+                if isinstance(request, (DeleteOne, DeleteMany)):
+                    summary["nRemoved"] += self._delete(request._filter, many=isinstance(request, DeleteMany))
+                    continue
+                if isinstance(request, ReplaceOne):
+                    raw = self._update(request._filter, request._doc, bool(request._upsert), many=False, replace=True)
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    raw = self._update(request._filter, request._doc, bool(request._upsert),
+                                       many=isinstance(request, UpdateMany))
+                else:
+                    raise OperationFailure(f"unsupported bulk operation: {type(request).__name__}")
+                if "upserted" in raw:
+                    summary["nUpserted"] += 1
+                    summary["upserted"].append({"index": index, "_id": raw["upserted"]})
+                else:
+                    summary["nMatched"] += raw["n"]
+                    summary["nModified"] += raw["nModified"]
+            except (DuplicateKeyError, OperationFailure) as e:
+                summary["writeErrors"].append({
+                    "index": index, "code": e.code, "errmsg": str(e),
+                    "keyValue": (e.details or {}).get("keyValue"), "op": getattr(request, "_doc", None)
+                })
+                if ordered:
+                    break
+        if summary["writeErrors"]:
+            raise BulkWriteError(summary)
+        return summary, inserted_ids
+
+    def bulk_write(self, requests: List, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        summary, _ = self._bulk(requests, ordered)
+        return BulkWriteResult(summary, True)
+
+    # Indexes
+    def create_index(self, keys, unique: bool = False, sparse: bool = False, name: Optional[str] = None, **kwargs) -> str:
+        fields = tuple(field for field, _ in _normalize_sort(keys, ASCENDING))
+        name = name or "_".join(f"{field}_{direction}" for field, direction in _normalize_sort(keys, ASCENDING))
+        with self._lock:
+            self._indexes[name] = (fields, unique, sparse)
+            if unique:
+                self._unique_keys[name] = {}
+                try:
+                    for document in self._documents.values():
+                        self._check_unique(document, ignore_id=document["_id"])
+                        self._index(document)
+                except DuplicateKeyError:
+                    del self._unique_keys[name], self._indexes[name]
+                    raise
+        return name
+
+    def create_indexes(self, indexes: List) -> List[str]:
+        return [self.create_index(index.document["key"].items(), **{
+            key: value for key, value in index.document.items() if key != "key"
+        }) for index in indexes]
+
+    def drop_index(self, name: str):
+        with self._lock:
+            self._indexes.pop(name, None)
+            self._unique_keys.pop(name, None)
+
+    def index_information(self) -> Dict:
+        return {
+            name: {"key": [(field, ASCENDING) for field in fields], "unique": unique, "sparse": sparse}
+            for name, (fields, unique, sparse) in self._indexes.items()
+        }
+
+    def drop(self):
+        with self._lock:
+            self._documents = {}
+            for keys in self._unique_keys.values():
+                keys.clear()
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_collection(self, name: str) -> MemoryCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(name)
+            return self._collections[name]
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        return self.get_collection(name)
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    def drop_collection(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+
+    def command(self, command, *args, **kwargs) -> Dict:
+        if command == "ping":
+            return {"ok": 1.0}
+        raise OperationFailure(f"unsupported command for the memory backend: {command}")
+
+class MemoryClient:
+    """MongoClient look-alike; every database lives in this process"""
+
+    def __init__(self):
+        self._databases: Dict[str, MemoryDatabase] = {}
+        self._lock = threading.Lock()
+
+    def get_database(self, name: str) -> MemoryDatabase:
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = MemoryDatabase(name)
+            return self._databases[name]
+
+    __getitem__ = get_database
+
+    def drop_database(self, name: str):
+        with self._lock:
+            self._databases.pop(name, None)
+
+    def close(self):
+        pass
+
+# -- Async facade ----------------------------------------------------------------
+
+class AsyncMemoryCursor:
+    def __init__(self, cursor: MemoryCursor):
+        self._cursor = cursor
+
+    def sort(self, key_or_list, direction=None):
+        self._cursor.sort(key_or_list, direction)
+        return self
+
+    def skip(self, count: int):
+        self._cursor.skip(count)
+        return self
+
+    def limit(self, count: int):
+        self._cursor.limit(count)
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        return self._cursor.to_list(length)
+
+    async def explain(self) -> Dict:
+        return self._cursor.explain()
+
+    def __aiter__(self):
+        self._iterator = iter(self._cursor)
+        return self
+
+    async def __anext__(self) -> Dict:
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class AsyncMemoryCollection:
+    """AsyncCollection look-alike over the same data as the sync collection"""
+
+    def __init__(self, collection: MemoryCollection):
+        self._collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.find(*args, **kwargs))
+
+    def __getattr__(self, name: str):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+class AsyncMemoryDatabase:
+    def __init__(self, database: MemoryDatabase):
+        self._database = database
+        self.name = database.name
+
+    def __getitem__(self, name: str) -> AsyncMemoryCollection:
+        return AsyncMemoryCollection(self._database[name])
+
+    def __getattr__(self, name: str) -> AsyncMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, command, *args, **kwargs) -> Dict:
+        return self._database.command(command, *args, **kwargs)
+
+class AsyncMemoryClient:
+    def __init__(self, client: MemoryClient):
+        self._client = client
+
+    def __getitem__(self, name: str) -> AsyncMemoryDatabase:
+        return AsyncMemoryDatabase(self._client[name])
+
+    get_database = __getitem__
+
+    async def close(self):
+        pass
+
+# -- Dumps -----------------------------------------------------------------------
+
+def load_dump(database: MemoryDatabase, directory: str) -> Dict[str, int]:
+    """Load every <collection>.bson of a mongodump directory; returns document counts"""
+    counts = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".bson"):
+            continue
+        name = filename[:-len(".bson")]
+        collection = database[name]
+        collection.drop()
+        with open(os.path.join(directory, filename), "rb") as f:
+            collection.insert_many(bson.decode_file_iter(f))
+        counts[name] = collection.estimated_document_count()
+    return counts
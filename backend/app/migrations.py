@@ -0,0 +1,177 @@
+"""
+Versioned index migrations.
+
+Each migration has a version, a description and a function taking the
+(synchronous) database. Applied versions are recorded in the
+`schema_migrations` collection, and index builds are idempotent, so
+several workers starting at once is safe. Indexes keep MongoDB's default
+names, so ones created earlier by hand are adopted rather than duplicated.
+
+Usage (from backend/):
+    python -m app.migrations            # apply pending migrations
+    python -m app.migrations --status   # list applied and pending versions
+    python -m app.migrations --verify   # explain() the hot queries, fail on collection scans
+"""
+import argparse
+import sys
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from .database import mongo
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable
+
+def _lookup_indexes(db):
+    db.users.create_index("email", unique=True)
+    db.preferences.create_index("user_email", unique=True)
+    db.carts.create_index("user_email", unique=True)
+    db.orders.create_index([("user_email", ASCENDING), ("created_at", DESCENDING)])
+    # Only orders that reached payment carry a payment_id
+    db.orders.create_index("payment_id", sparse=True)
+    db.products.create_index("name", unique=True)
+
+def _product_filter_indexes(db):
+    # get_products filters on category and/or brand plus a price range
+    db.products.create_index([("category", ASCENDING), ("price", ASCENDING)])
+    db.products.create_index([("brand", ASCENDING), ("price", ASCENDING)])
+    db.products.create_index("price")
+    # Catalog snapshot refresh polls by modification time
+    db.products.create_index("updated_at", sparse=True)
+    db.products.create_index("created_at", sparse=True)
+
+def _recommendation_indexes(db):
+    db.recommendations.create_index("user_email", unique=True)
+    db.recommendations.create_index("product_ids")
+    # Co-purchase rebuilds stream paid orders
+    db.orders.create_index("status")
+
+def _preference_feature_indexes(db):
+    # Product changes look up the users sharing a scoring feature with the product
+    for field in (
+        "favorite_notes", "preferred_categories", "preferred_brands",
+        "price_range", "seasonal_preference", "scent_strength"
+    ):
+        db.preferences.create_index(field)
+    # Not sparse: short lists are found with {"min_score": None}
+    db.recommendations.create_index("min_score")
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "unique lookup indexes for users, preferences, carts, orders and products", _lookup_indexes),
+    Migration(2, "product filter and catalog refresh indexes", _product_filter_indexes),
+    Migration(3, "materialized recommendations and paid order indexes", _recommendation_indexes),
+    Migration(4, "preference feature and recommendation threshold indexes", _preference_feature_indexes),
+]
+
+def applied_versions(db) -> Dict[int, Dict]:
+    return {record["_id"]: record for record in db[MIGRATIONS_COLLECTION].find()}
+
+def run_migrations(db=None) -> List[int]:
+    """Apply pending migrations in order and return the versions applied"""
+    db = db if db is not None else mongo.database()
+    applied = applied_versions(db)
+    newly_applied = []
+    for migration in sorted(MIGRATIONS, key=lambda migration: migration.version):
+        if migration.version in applied:
+            continue
+        migration.apply(db)
+        try:
+            db[MIGRATIONS_COLLECTION].insert_one({
+                "_id": migration.version,
+                "description": migration.description,
+                "applied_at": datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            # Another worker finished the same migration first
+            continue
+        newly_applied.append(migration.version)
+    return newly_applied
+
+# Queries the routes and services run on every request, with representative values
+HOT_QUERIES = [
+    ("users", {"email": "user@example.com"}),
+    ("preferences", {"user_email": "user@example.com"}),
+    ("carts", {"user_email": "user@example.com"}),
+    ("orders", {"user_email": "user@example.com"}),
+    ("orders", {"payment_id": "payment"}),
+    ("orders", {"status": "paid"}),
+    ("products", {"name": "Perfume"}),
+    ("products", {"category": "floral"}),
+    ("products", {"brand": "brand"}),
+    ("products", {"price": {"$gte": 100000, "$lte": 500000}}),
+    ("products", {"category": "floral", "brand": "brand", "price": {"$gte": 100000}}),
+    ("products", {"$or": [
+        {"created_at": {"$gte": datetime(2024, 1, 1)}},
+        {"updated_at": {"$gte": datetime(2024, 1, 1)}}
+    ]}),
+    ("recommendations", {"user_email": "user@example.com"}),
+    ("recommendations", {"product_ids": {"$in": ["product"]}}),
+    ("recommendations", {"$or": [{"min_score": None}, {"min_score": {"$lte": 0}}]}),
+    ("preferences", {"$or": [
+        {"favorite_notes": {"$in": ["rose"]}},
+        {"preferred_categories": {"$in": ["floral"]}},
+        {"preferred_brands": {"$in": ["brand"]}},
+        {"seasonal_preference": {"$in": ["spring"]}},
+        {"scent_strength": {"$in": ["moderate"]}},
+        {"price_range": {"$in": ["mid-range"]}}
+    ]}),
+]
+
+def _stages(plan) -> Iterator[str]:
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+def verify_indexes(db=None) -> List[Dict]:
+    """explain() every hot query; `indexed` is False when the winning plan scans the collection"""
+    db = db if db is not None else mongo.database()
+    report = []
+    for collection, query in HOT_QUERIES:
+        explained = db[collection].find(query).explain()
+        stages = list(_stages(explained["queryPlanner"]["winningPlan"]))
+        report.append({
+            "collection": collection,
+            "query": query,
+            "stages": stages,
+            "indexed": "COLLSCAN" not in stages and any(stage in ("IXSCAN", "EXPRESS_IXSCAN", "IDHACK") for stage in stages)
+        })
+    return report
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Apply or inspect index migrations")
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    parser.add_argument("--verify", action="store_true", help="check that hot queries use an index")
+    args = parser.parse_args(argv)
+
+    db = mongo.database()
+    if args.status:
+        applied = applied_versions(db)
+        for migration in MIGRATIONS:
+            record = applied.get(migration.version)
+            state = f"applied {record['applied_at']:%Y-%m-%d %H:%M}" if record else "pending"
+            print(f"{migration.version:>3}  {state:<22} {migration.description}")
+        return
+
+    if args.verify:
+        failures = 0
+        for entry in verify_indexes(db):
+            failures += not entry["indexed"]
+            print(f"{'ok  ' if entry['indexed'] else 'SCAN'} {entry['collection']}.find({entry['query']}) -> {'/'.join(entry['stages'])}")
+        sys.exit(1 if failures else 0)
+
+    applied = run_migrations(db)
+    print(f"Applied migrations: {applied}" if applied else "No pending migrations")
+
+if __name__ == "__main__":
+    main()
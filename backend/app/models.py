@@ -77,5 +77,54 @@ class PerfumeCreate(BaseModel):
 class Perfume(PerfumeCreate):
     id: str
 
+# Lean response models: list views return summaries, detail views the rest.
+# Fields keep Mongo's "_id" key in the JSON output.
+class ProductSummary(BaseModel):
+    id: str = Field(alias="_id")
+    name: str
+    brand: Optional[str] = None
+    category: Optional[str] = None
+    notes: List[str] = []
+    price: Optional[float] = None
+    size_ml: Optional[int] = None
+
+class ProductDetail(ProductSummary):
+    description: Optional[str] = None
+    scent_strength: Optional[str] = None
+    season: Optional[str] = None
+
+class SimilarProduct(ProductSummary):
+    similarity: float
+
+class FacetedProducts(BaseModel):
+    total: int
+    items: List[ProductSummary]
+    # field -> value -> number of products
+    facets: Dict[str, Dict[str, int]]
+
+class Suggestion(BaseModel):
+    text: str
+    type: str  # "product", "brand" or "note"
+    product_id: Optional[str] = None
+
+# Order Models
+class OrderItemSummary(BaseModel):
+    product_id: str
+    name: Optional[str] = None
+    price: Optional[float] = None
+    quantity: int
+
+# Orders created before IDR/SOL pricing only carry `total_amount`; the
+# order repository maps it to total_amount_idr
+class OrderSummary(BaseModel):
+    id: str = Field(alias="_id")
+    status: str
+    created_at: Optional[datetime] = None
+    total_amount_idr: Optional[float] = None
+    total_amount_sol: Optional[float] = None
+    payment_currency: Optional[str] = None
+    payment_wallet: Optional[str] = None
+    items: List[OrderItemSummary] = []
+
 
 
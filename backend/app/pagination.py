@@ -0,0 +1,81 @@
+"""
+Keyset pagination for list endpoints.
+
+A cursor names the `_id` at the edge of the page it came from and the
+direction to continue in. The next page is one indexed range query on
+`_id` however deep it is, and inserts or deletes between requests cannot
+shift rows onto or off the page. The cursor travels in the X-Next-Cursor
+and X-Prev-Cursor response headers, so response bodies stay plain lists.
+"""
+import base64
+import json
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Response
+
+class Page(NamedTuple):
+    items: List[Dict]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+def encode_cursor(direction: str, document_id: ObjectId) -> str:
+    raw = json.dumps([direction, str(document_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, document_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return direction, ObjectId(document_id)
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid page cursor")
+
+async def keyset_page(
+    collection,
+    query: Optional[Dict] = None,
+    projection: Optional[Dict] = None,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    skip: int = 0
+) -> Page:
+    """
+    One page ordered by `_id`. Without a cursor, the first page (after
+    `skip` documents, kept for old clients). One extra document is fetched
+    to tell whether another page follows.
+    """
+    # Routes validate limit; 0 would read as "no limit" to MongoDB
+    assert limit > 0, "limit must be positive"
+    query = dict(query or {})
+    direction = "next"
+    if cursor:
+        direction, edge = decode_cursor(cursor)
+        query["_id"] = {"$gt": edge} if direction == "next" else {"$lt": edge}
+        skip = 0
+    order = 1 if direction == "next" else -1
+    documents = await collection.find(query, projection).sort("_id", order).skip(skip).limit(limit + 1).to_list(None)
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    if direction == "prev":
+        documents.reverse()
+    if not documents:
+        return Page([], None, None)
+
+    # Going forward there is a previous page whenever we did not start at the top
+    has_next = has_more if direction == "next" else True
+    has_prev = bool(cursor or skip) if direction == "next" else has_more
+    return Page(
+        documents,
+        encode_cursor("next", documents[-1]["_id"]) if has_next else None,
+        encode_cursor("prev", documents[0]["_id"]) if has_prev else None
+    )
+
+def set_page_headers(response: Response, page: Page, total: Optional[int] = None):
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if page.prev_cursor:
+        response.headers["X-Prev-Cursor"] = page.prev_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
@@ -0,0 +1,236 @@
+"""
+Async data access for request handlers.
+
+Each repository wraps one collection of the AsyncMongoClient database, so
+a slow round trip only suspends the awaiting request instead of blocking
+the event loop for every request in the worker. Collections are resolved
+lazily against the client opened by the app's lifespan.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+from bson import ObjectId
+
+from .database import async_db
+from .pagination import Page, keyset_page
+from .services.principals import principal_cache
+
+# Per-endpoint projections, mirroring the response models in models.py
+USER_PRINCIPAL_FIELDS = {"email": 1, "full_name": 1, "is_admin": 1, "disabled": 1}
+USER_CREDENTIAL_FIELDS = {"email": 1, "hashed_password": 1, "disabled": 1}
+USER_SUMMARY_FIELDS = {"email": 1, "full_name": 1}
+PRODUCT_SUMMARY_FIELDS = {
+    "name": 1, "brand": 1, "category": 1, "notes": 1, "price": 1, "size_ml": 1
+}
+PRODUCT_DETAIL_FIELDS = {"created_by": 0, "created_at": 0, "updated_by": 0, "updated_at": 0}
+ORDER_SUMMARY_FIELDS = {
+    "status": 1, "created_at": 1, "total_amount_idr": 1, "total_amount": 1, "total_amount_sol": 1,
+    "payment_currency": 1, "payment_wallet": 1,
+    "items.product_id": 1, "items.name": 1, "items.price": 1, "items.quantity": 1
+}
+
+class Repository:
+    """Async CRUD helpers over a single collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, query: Dict, projection: Optional[Dict] = None) -> Optional[Dict]:
+        return await self.collection.find_one(query, projection)
+
+    async def find(
+        self,
+        query: Optional[Dict] = None,
+        projection: Optional[Dict] = None,
+        skip: int = 0,
+        limit: int = 0,
+        sort: Optional[List] = None
+    ) -> List[Dict]:
+        cursor = self.collection.find(query or {}, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        return await cursor.skip(skip).limit(limit).to_list(None)
+
+    async def insert_one(self, document: Dict):
+        return await self.collection.insert_one(document)
+
+    async def update_one(self, query: Dict, update: Dict, upsert: bool = False):
+        return await self.collection.update_one(query, update, upsert=upsert)
+
+    async def delete_one(self, query: Dict):
+        return await self.collection.delete_one(query)
+
+    async def bulk_write(self, operations: List, ordered: bool = False):
+        return await self.collection.bulk_write(operations, ordered=ordered)
+
+    async def existing_values(self, field: str, values: Iterable) -> Set:
+        """Which of `values` are already stored in `field`, in one $in query"""
+        documents = await self.find({field: {"$in": list(values)}}, {field: 1, "_id": 0})
+        return {document[field] for document in documents}
+
+    async def page(
+        self,
+        query: Optional[Dict] = None,
+        projection: Optional[Dict] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        skip: int = 0
+    ) -> Page:
+        return await keyset_page(self.collection, query, projection, limit, cursor, skip)
+
+    async def estimated_count(self) -> int:
+        """Collection size from metadata, without counting documents"""
+        return await self.collection.estimated_document_count()
+
+class UserRepository(Repository):
+    async def get(self, email: str) -> Optional[Dict]:
+        """The user as a request principal, never including the password hash"""
+        return await self.find_one({"email": email}, USER_PRINCIPAL_FIELDS)
+
+    async def get_credentials(self, email: str) -> Optional[Dict]:
+        """Only for login: the fields needed to check a password"""
+        return await self.find_one({"email": email}, USER_CREDENTIAL_FIELDS)
+
+    async def exists(self, email: str) -> bool:
+        return await self.find_one({"email": email}, {"_id": 1}) is not None
+
+    async def create(self, user: Dict):
+        return await self.insert_one(user)
+
+    async def update(self, email: str, fields: Dict):
+        result = await self.update_one({"email": email}, {"$set": fields})
+        principal_cache.invalidate(email)
+        return result
+
+    async def list(self, limit: int = 10, cursor: Optional[str] = None, skip: int = 0) -> Page:
+        return await self.page(projection=USER_SUMMARY_FIELDS, limit=limit, cursor=cursor, skip=skip)
+
+class PreferenceRepository(Repository):
+    async def get(self, user_email: str) -> Optional[Dict]:
+        return await self.find_one({"user_email": user_email})
+
+    async def create(self, preferences: Dict):
+        return await self.insert_one(preferences)
+
+    async def update(self, user_email: str, fields: Dict):
+        return await self.update_one({"user_email": user_email}, {"$set": fields})
+
+    async def delete(self, user_email: str):
+        return await self.delete_one({"user_email": user_email})
+
+    async def list(self, limit: int = 10, cursor: Optional[str] = None, skip: int = 0) -> Page:
+        return await self.page(limit=limit, cursor=cursor, skip=skip)
+
+class ProductRepository(Repository):
+    async def get(self, product_id: str, projection: Optional[Dict] = PRODUCT_DETAIL_FIELDS) -> Optional[Dict]:
+        """Raises bson.errors.InvalidId for malformed ids"""
+        return await self.find_one({"_id": ObjectId(product_id)}, projection)
+
+    async def find_by_name(self, name: str, exclude_id: Optional[str] = None) -> Optional[Dict]:
+        query = {"name": name}
+        if exclude_id:
+            query["_id"] = {"$ne": ObjectId(exclude_id)}
+        return await self.find_one(query, {"_id": 1})
+
+    async def find_by_names(self, names: Iterable[str]) -> List[Dict]:
+        """Full documents, as the catalog keeps them"""
+        return await self.find({"name": {"$in": list(names)}})
+
+    async def list(self, query: Dict, skip: int = 0, limit: int = 10) -> List[Dict]:
+        return await self.find(query, PRODUCT_SUMMARY_FIELDS, skip=skip, limit=limit)
+
+    async def create(self, product: Dict):
+        return await self.insert_one(product)
+
+    async def update(self, product_id: str, fields: Dict):
+        return await self.update_one({"_id": ObjectId(product_id)}, {"$set": fields})
+
+    async def delete(self, product_id: str):
+        return await self.delete_one({"_id": ObjectId(product_id)})
+
+def empty_cart(user_email: str) -> Dict:
+    return {
+        "user_email": user_email,
+        "items": [],
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+        "total_amount": 0.0
+    }
+
+class CartRepository(Repository):
+    async def get(self, user_email: str) -> Optional[Dict]:
+        return await self.find_one({"user_email": user_email})
+
+    async def create(self, user_email: str) -> Dict:
+        cart = empty_cart(user_email)
+        await self.insert_one(cart)
+        return cart
+
+    async def save_items(self, user_email: str, items: List[Dict], total_amount: float):
+        return await self.update_one(
+            {"user_email": user_email},
+            {
+                "$set": {
+                    "items": items,
+                    "total_amount": total_amount,
+                    "updated_at": datetime.utcnow()
+                }
+            }
+        )
+
+    async def clear(self, user_email: str):
+        return await self.save_items(user_email, [], 0.0)
+
+class OrderRepository(Repository):
+    async def get(self, order_id: str, user_email: Optional[str] = None) -> Optional[Dict]:
+        query = {"_id": ObjectId(order_id)}
+        if user_email is not None:
+            query["user_email"] = user_email
+        return await self.find_one(query)
+
+    async def get_by_payment_id(self, payment_id: str) -> Optional[Dict]:
+        return await self.find_one({"payment_id": payment_id})
+
+    async def create(self, order: Dict):
+        return await self.insert_one(order)
+
+    async def update(self, order_id: str, fields: Dict):
+        return await self.update_one({"_id": ObjectId(order_id)}, {"$set": fields})
+
+    async def mark_paid(self, order_id: str) -> bool:
+        """True only for the one caller that moved the order to paid"""
+        result = await self.update_one(
+            {"_id": ObjectId(order_id), "status": {"$ne": "paid"}},
+            {"$set": {"status": "paid", "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count == 1
+
+    async def list_for_user(self, user_email: str, skip: int = 0, limit: int = 10) -> List[Dict]:
+        orders = await self.find({"user_email": user_email}, ORDER_SUMMARY_FIELDS, skip=skip, limit=limit)
+        for order in orders:
+            # Legacy orders predate the IDR/SOL split and only have total_amount
+            legacy_total = order.pop("total_amount", None)
+            if order.get("total_amount_idr") is None:
+                order["total_amount_idr"] = legacy_total
+        return orders
+
+user_repository = UserRepository(async_db.users)
+preference_repository = PreferenceRepository(async_db.preferences)
+product_repository = ProductRepository(async_db.products)
+cart_repository = CartRepository(async_db.carts)
+order_repository = OrderRepository(async_db.orders)
+
+# FastAPI dependencies, overridable through app.dependency_overrides
+def get_user_repository() -> UserRepository:
+    return user_repository
+
+def get_preference_repository() -> PreferenceRepository:
+    return preference_repository
+
+def get_product_repository() -> ProductRepository:
+    return product_repository
+
+def get_cart_repository() -> CartRepository:
+    return cart_repository
+
+def get_order_repository() -> OrderRepository:
+    return order_repository
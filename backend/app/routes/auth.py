@@ -1,18 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jose import JWTError
 from datetime import datetime, timedelta
 from typing import Optional, Dict
 import os
-from ..database import users_collection, carts_collection
+from ..repositories import (
+    UserRepository, CartRepository, get_user_repository, get_cart_repository
+)
 from ..models import UserCreate, UserInDB, Token, UserLogin, UserResponse
+from ..pagination import set_page_headers
+from ..services.principals import principal_cache
+from ..services.passwords import password_hasher
+from ..services.tokens import token_verifier
+from ..services.ingest import FORMATS, aiter_records, detect_format
+from ..services.user_import import UserImporter, import_hashing_pool
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = password_hasher.context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Helper Functions
+# Helper Functions; blocking, so handlers use password_hasher instead
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -26,32 +34,27 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(days=1)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(
-        to_encode, 
-        os.getenv("SECRET_KEY"), 
-        algorithm=os.getenv("ALGORITHM")
-    )
+    encoded_jwt = token_verifier.encode(to_encode)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict:
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    user_repository: UserRepository = Depends(get_user_repository)
+) -> Dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token, 
-            os.getenv("SECRET_KEY"), 
-            algorithms=[os.getenv("ALGORITHM")]
-        )
+        payload = token_verifier.decode(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
         
-    user = users_collection.find_one({"email": email})
+    user = await principal_cache.resolve(email, user_repository.get)
     if user is None:
         raise credentials_exception
     return user
@@ -62,43 +65,49 @@ async def get_current_active_user(current_user: Dict = Depends(get_current_user)
     return current_user
 
 @router.post("/register")
-async def register_user(user: UserCreate):
-    if users_collection.find_one({"email": user.email}):
+async def register_user(
+    user: UserCreate,
+    user_repository: UserRepository = Depends(get_user_repository),
+    cart_repository: CartRepository = Depends(get_cart_repository)
+):
+    if await user_repository.exists(user.email):
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     user_in_db = UserInDB(
         email=user.email,
         full_name=user.full_name,
         hashed_password=hashed_password
     )
     
-    users_collection.insert_one(user_in_db.dict())
+    await user_repository.create(user_in_db.dict())
     
     # Initialize an empty cart
-    cart = {
-                "user_email": user.email,
-                "items": [],
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-                "total_amount": 0.0
-            }
-    carts_collection.insert_one(cart)
+    await cart_repository.create(user.email)
 
     return {"message": "User registered successfully"}
 
 @router.post("/login", response_model=Token)
-async def login_json(user_credentials: UserLogin):
-    user = users_collection.find_one({"email": user_credentials.email})
-    if not user or not verify_password(user_credentials.password, user["hashed_password"]):
+async def login_json(
+    user_credentials: UserLogin,
+    user_repository: UserRepository = Depends(get_user_repository)
+):
+    user = await user_repository.get_credentials(user_credentials.email)
+    verified, new_hash = (
+        await password_hasher.verify(user_credentials.password, user["hashed_password"]) if user else (False, None)
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash is not None:
+        # Re-hash with the current cost if the stored hash is older
+        await user_repository.update(user["email"], {"hashed_password": new_hash})
     
     access_token_expires = timedelta(minutes=int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")))
     access_token = create_access_token(
@@ -107,14 +116,23 @@ async def login_json(user_credentials: UserLogin):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = users_collection.find_one({"email": form_data.username})
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    user_repository: UserRepository = Depends(get_user_repository)
+):
+    user = await user_repository.get_credentials(form_data.username)
+    verified, new_hash = (
+        await password_hasher.verify(form_data.password, user["hashed_password"]) if user else (False, None)
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash is not None:
+        # Re-hash with the current cost if the stored hash is older
+        await user_repository.update(user["email"], {"hashed_password": new_hash})
     
     access_token_expires = timedelta(minutes=int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")))
     access_token = create_access_token(
@@ -133,22 +151,20 @@ async def read_users_me(current_user: Dict = Depends(get_current_active_user)):
 @router.put("/me", response_model=UserResponse)
 async def update_user(
     user_update: UserCreate,
-    current_user: Dict = Depends(get_current_active_user)
+    current_user: Dict = Depends(get_current_active_user),
+    user_repository: UserRepository = Depends(get_user_repository)
 ):
     updates = {
         "full_name": user_update.full_name,
-        "hashed_password": get_password_hash(user_update.password)
+        "hashed_password": await password_hasher.hash(user_update.password)
     }
     
-    result = users_collection.update_one(
-        {"email": current_user["email"]},
-        {"$set": updates}
-    )
+    result = await user_repository.update(current_user["email"], updates)
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     
-    updated_user = users_collection.find_one({"email": current_user["email"]})
+    updated_user = await user_repository.get(current_user["email"])
     return UserResponse(
         email=updated_user["email"],
         full_name=updated_user["full_name"]
@@ -157,9 +173,13 @@ async def update_user(
 # Admin Only Endpoints
 @router.get("/users", response_model=list[UserResponse])
 async def read_users(
+    response: Response,
     skip: int = 0,
-    limit: int = 10,
-    current_user: Dict = Depends(get_current_active_user)
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: Dict = Depends(get_current_active_user),
+    user_repository: UserRepository = Depends(get_user_repository)
 ):
     # Check if user is admin
     if not current_user.get("is_admin"):
@@ -168,8 +188,81 @@ async def read_users(
             detail="Not enough permissions"
         )
     
-    users = list(users_collection.find().skip(skip).limit(limit))
+    # Pass X-Next-Cursor / X-Prev-Cursor back as ?cursor= to page
+    page = await user_repository.list(limit, cursor, skip)
+    total = await user_repository.estimated_count() if include_total else None
+    set_page_headers(response, page, total)
     return [
         UserResponse(email=user["email"], full_name=user["full_name"])
-        for user in users
-    ]
\ No newline at end of file
+        for user in page.items
+    ]
+
+# Admin only: bulk registration from a streamed NDJSON or CSV body
+@router.post("/users/import")
+async def import_users(
+    request: Request,
+    input_format: Optional[str] = Query(None, alias="format"),
+    current_user: Dict = Depends(get_current_active_user),
+    user_repository: UserRepository = Depends(get_user_repository),
+    cart_repository: CartRepository = Depends(get_cart_repository)
+):
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=403,
+            detail="Not enough permissions"
+        )
+    input_format = input_format or detect_format(request.headers.get("content-type"))
+    if input_format not in FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown format, expected one of: {', '.join(FORMATS)}"
+        )
+
+    try:
+        importer = UserImporter(
+            user_repository, cart_repository,
+            workers=import_hashing_pool.workers, executor=import_hashing_pool.executor()
+        )
+        report = await importer.run(aiter_records(request.stream(), input_format))
+        if report["error"]:
+            # Rows written before the error stay written; the report says which
+            return JSONResponse(
+                status_code=500,
+                content={"detail": f"Error importing users: {report['error']}", **report}
+            )
+        return report
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error importing users: {str(e)}"
+        )
+
+# Admin only: principal cache counters
+@router.get("/cache/stats")
+async def get_principal_cache_stats(current_user: Dict = Depends(get_current_active_user)):
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=403,
+            detail="Not enough permissions"
+        )
+    return principal_cache.stats()
+
+# Admin only: password hashing pool counters
+@router.get("/hashing/stats")
+async def get_password_hashing_stats(current_user: Dict = Depends(get_current_active_user)):
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=403,
+            detail="Not enough permissions"
+        )
+    return password_hasher.stats()
+
+# Admin only: verified-token cache counters
+@router.get("/tokens/stats")
+async def get_token_cache_stats(current_user: Dict = Depends(get_current_active_user)):
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=403,
+            detail="Not enough permissions"
+        )
+    return token_verifier.stats()
\ No newline at end of file
@@ -1,14 +1,15 @@
 # src/routes/checkout.py
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import httpx
 import os
 from datetime import datetime
-from bson import ObjectId
 
-from ..database import orders_collection, carts_collection
+from ..models import OrderSummary
+from ..repositories import OrderRepository, order_repository, get_order_repository
 from ..routes.auth import get_current_active_user
 from ..services.cart import CartManager
+from ..services.copurchase import copurchase_model
 
 router = APIRouter()
 
@@ -19,7 +20,8 @@ SOL_TO_IDR = 3200000
 USDT_TO_IDR = 16000
 
 class CheckoutManager:
-    def __init__(self):
+    def __init__(self, orders: OrderRepository = order_repository):
+        self.orders = orders
         self.cart_manager = CartManager()
         
     async def create_order(self, user_email: str) -> Dict:
@@ -41,7 +43,7 @@ class CheckoutManager:
                 "updated_at": datetime.utcnow()
             }
             
-            result = orders_collection.insert_one(order)
+            result = await self.orders.create(order)
             order["_id"] = str(result.inserted_id)
             
             return order
@@ -54,7 +56,7 @@ class CheckoutManager:
 
     async def create_payment(self, order_id: str, currency: str = "SOL") -> Dict:
         try:
-            order = orders_collection.find_one({"_id": ObjectId(order_id)})
+            order = await self.orders.get(order_id)
             if not order:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -100,10 +102,7 @@ class CheckoutManager:
                     "updated_at": datetime.utcnow()
                 }
 
-                orders_collection.update_one(
-                    {"_id": ObjectId(order_id)},
-                    {"$set": update_data}
-                )
+                await self.orders.update(order_id, update_data)
 
                 return {
                     **payment_data,
@@ -121,7 +120,7 @@ class CheckoutManager:
 
     async def check_payment_status(self, order_id: str) -> Dict:
         try:
-            order = orders_collection.find_one({"_id": ObjectId(order_id)})
+            order = await self.orders.get(order_id)
             if not order:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -147,16 +146,12 @@ class CheckoutManager:
                 payment_status = response.json()
                 
                 if payment_status["data"]["isPaid"]:
-                    orders_collection.update_one(
-                        {"_id": ObjectId(order_id)},
-                        {
-                            "$set": {
-                                "status": "paid",
-                                "updated_at": datetime.utcnow()
-                            }
-                        }
-                    )
+                    # Conditional, so a webhook and a status poll racing each other count the order once
+                    newly_paid = await self.orders.mark_paid(order_id)
                     await self.cart_manager.clear_cart(order["user_email"])
+                    if newly_paid:
+                        # Only this worker's model; other workers see the order on their next rebuild()
+                        copurchase_model.add_order(order)
 
                 return payment_status["data"]
 
@@ -216,7 +211,10 @@ async def check_payment_status(
         )
 
 @router.post("/checkout/webhook")
-async def payment_webhook(payment_data: Dict):
+async def payment_webhook(
+    payment_data: Dict,
+    order_repository: OrderRepository = Depends(get_order_repository)
+):
     try:
         payment_id = payment_data.get("paymentID")
         if not payment_id:
@@ -225,7 +223,7 @@ async def payment_webhook(payment_data: Dict):
                 detail="paymentID required"
             )
 
-        order = orders_collection.find_one({"payment_id": payment_id})
+        order = await order_repository.get_by_payment_id(payment_id)
         if not order:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -246,17 +244,16 @@ async def payment_webhook(payment_data: Dict):
             detail=f"Error processing webhook: {str(e)}"
         )
 
-@router.get("/orders")
+@router.get("/orders", response_model=List[OrderSummary])
 async def get_orders(
     current_user: Dict = Depends(get_current_active_user),
     skip: int = 0,
-    limit: int = 10
+    limit: int = 10,
+    order_repository: OrderRepository = Depends(get_order_repository)
 ):
     """Get user's order history"""
     try:
-        orders = list(orders_collection.find(
-            {"user_email": current_user["email"]}
-        ).skip(skip).limit(limit))
+        orders = await order_repository.list_for_user(current_user["email"], skip, limit)
         
         for order in orders:
             order["_id"] = str(order["_id"])
@@ -271,14 +268,12 @@ async def get_orders(
 @router.get("/orders/{order_id}")
 async def get_order(
     order_id: str,
-    current_user: Dict = Depends(get_current_active_user)
+    current_user: Dict = Depends(get_current_active_user),
+    order_repository: OrderRepository = Depends(get_order_repository)
 ):
     """Get specific order details"""
     try:
-        order = orders_collection.find_one({
-            "_id": ObjectId(order_id),
-            "user_email": current_user["email"]
-        })
+        order = await order_repository.get(order_id, current_user["email"])
         
         if not order:
             raise HTTPException(
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from ..database import db, preferences_collection
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status
+from ..repositories import PreferenceRepository, get_preference_repository
 from ..models import UserPreferences, PreferenceUpdate
-from typing import List
+from typing import List, Optional
 from .auth import get_current_active_user, get_current_user
+from ..services.materialized import recommendation_store
+from ..pagination import set_page_headers
 from datetime import datetime
 
 router = APIRouter()
@@ -19,13 +21,15 @@ def check_admin_access(current_user: dict):
 @router.post("/preferences")
 async def create_preferences(
     preferences: UserPreferences,
-    current_user: dict = Depends(get_current_active_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_active_user),
+    preference_repository: PreferenceRepository = Depends(get_preference_repository)
 ):
     try:
         user_email = current_user["email"]
         
         # Check if preferences already exist
-        existing = preferences_collection.find_one({"user_email": user_email})
+        existing = await preference_repository.get(user_email)
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -39,7 +43,8 @@ async def create_preferences(
             "created_by": user_email
         })
         
-        preferences_collection.insert_one(preference_data)
+        await preference_repository.create(preference_data)
+        background_tasks.add_task(recommendation_store.refresh_user, user_email)
         return {"message": "Preferences created successfully"}
     except HTTPException as he:
         raise he
@@ -51,9 +56,12 @@ async def create_preferences(
 
 # User can get their own preferences
 @router.get("/preferences/me")
-async def get_my_preferences(current_user: dict = Depends(get_current_user)):
+async def get_my_preferences(
+    current_user: dict = Depends(get_current_user),
+    preference_repository: PreferenceRepository = Depends(get_preference_repository)
+):
     try:
-        preferences = preferences_collection.find_one({"user_email": current_user["email"]})
+        preferences = await preference_repository.get(current_user["email"])
         if not preferences:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -73,23 +81,23 @@ async def get_my_preferences(current_user: dict = Depends(get_current_user)):
 @router.put("/preferences/me")
 async def update_my_preferences(
     updates: PreferenceUpdate,
-    current_user: dict = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    preference_repository: PreferenceRepository = Depends(get_preference_repository)
 ):
     try:
         update_data = updates.dict(exclude_unset=True)
         update_data["updated_at"] = datetime.utcnow()
         update_data["updated_by"] = current_user["email"]
         
-        result = preferences_collection.update_one(
-            {"user_email": current_user["email"]},
-            {"$set": update_data}
-        )
+        result = await preference_repository.update(current_user["email"], update_data)
         
         if result.modified_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Preferences not found"
             )
+        background_tasks.add_task(recommendation_store.refresh_user, current_user["email"])
         return {"message": "Preferences updated successfully"}
     except HTTPException as he:
         raise he
@@ -102,17 +110,27 @@ async def update_my_preferences(
 # Admin Endpoints - View and manage all preferences
 @router.get("/preferences", response_model=List[dict])
 async def get_all_preferences(
+    response: Response,
     current_user: dict = Depends(get_current_active_user),
     skip: int = 0,
-    limit: int = 10
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    preference_repository: PreferenceRepository = Depends(get_preference_repository)
 ):
     check_admin_access(current_user)
     
     try:
-        preferences = list(preferences_collection.find().skip(skip).limit(limit))
+        # Pass X-Next-Cursor / X-Prev-Cursor back as ?cursor= to page
+        page = await preference_repository.list(limit, cursor, skip)
+        total = await preference_repository.estimated_count() if include_total else None
+        set_page_headers(response, page, total)
+        preferences = page.items
         for pref in preferences:
             pref["_id"] = str(pref["_id"])
         return preferences
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -122,12 +140,13 @@ async def get_all_preferences(
 @router.get("/preferences/{user_email}")
 async def get_user_preferences(
     user_email: str,
-    current_user: dict = Depends(get_current_active_user)
+    current_user: dict = Depends(get_current_active_user),
+    preference_repository: PreferenceRepository = Depends(get_preference_repository)
 ):
     check_admin_access(current_user)
     
     try:
-        preferences = preferences_collection.find_one({"user_email": user_email})
+        preferences = await preference_repository.get(user_email)
         if not preferences:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -146,17 +165,20 @@ async def get_user_preferences(
 @router.delete("/preferences/{user_email}")
 async def delete_user_preferences(
     user_email: str,
-    current_user: dict = Depends(get_current_active_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_active_user),
+    preference_repository: PreferenceRepository = Depends(get_preference_repository)
 ):
     check_admin_access(current_user)
     
     try:
-        result = preferences_collection.delete_one({"user_email": user_email})
+        result = await preference_repository.delete(user_email)
         if result.deleted_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Preferences not found for user: {user_email}"
             )
+        background_tasks.add_task(recommendation_store.forget_user, user_email)
         return {"message": f"Preferences deleted successfully for user: {user_email}"}
     except HTTPException as he:
         raise he
@@ -171,7 +193,9 @@ async def delete_user_preferences(
 async def admin_update_preferences(
     user_email: str,
     updates: PreferenceUpdate,
-    current_user: dict = Depends(get_current_active_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_active_user),
+    preference_repository: PreferenceRepository = Depends(get_preference_repository)
 ):
     check_admin_access(current_user)
     
@@ -180,16 +204,14 @@ async def admin_update_preferences(
         update_data["updated_at"] = datetime.utcnow()
         update_data["updated_by"] = current_user["email"]
         
-        result = preferences_collection.update_one(
-            {"user_email": user_email},
-            {"$set": update_data}
-        )
+        result = await preference_repository.update(user_email, update_data)
         
         if result.modified_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Preferences not found for user: {user_email}"
             )
+        background_tasks.add_task(recommendation_store.refresh_user, user_email)
         return {"message": f"Preferences updated successfully for user: {user_email}"}
     except HTTPException as he:
         raise he
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from ..database import db, products_collection
-from ..models import Perfume, PerfumeCreate
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from ..repositories import ProductRepository, get_product_repository, PRODUCT_DETAIL_FIELDS
+from ..models import Perfume, PerfumeCreate, ProductSummary, ProductDetail, SimilarProduct, Suggestion, FacetedProducts
 from typing import List, Optional
 from .auth import get_current_active_user
-from bson import ObjectId
+from ..services.catalog import catalog
+from ..services.facets import facet_index
+from ..services.ingest import FORMATS, aiter_records, detect_format
+from ..services.materialized import recommendation_store
+from ..services.product_import import ProductImporter
+from ..services.search import search_index
+from ..services.similarity import similarity_index
+from ..services.suggest import suggest_index
 from datetime import datetime
 
 router = APIRouter()
@@ -17,9 +26,13 @@ def check_admin_access(current_user: dict):
         )
 
 # Helper function to validate product existence
-async def get_product_by_id(product_id: str):
+async def get_product_by_id(
+    product_id: str,
+    product_repository: ProductRepository,
+    projection: dict = PRODUCT_DETAIL_FIELDS
+):
     try:
-        product = products_collection.find_one({"_id": ObjectId(product_id)})
+        product = await product_repository.get(product_id, projection)
         if not product:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -36,13 +49,15 @@ async def get_product_by_id(product_id: str):
 @router.post("/products", status_code=status.HTTP_201_CREATED)
 async def create_product(
     perfume: PerfumeCreate,
-    current_user: dict = Depends(get_current_active_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_active_user),
+    product_repository: ProductRepository = Depends(get_product_repository)
 ):
     check_admin_access(current_user)
     
     try:
         # Check if product with same name already exists
-        existing_product = products_collection.find_one({"name": perfume.name})
+        existing_product = await product_repository.find_by_name(perfume.name)
         if existing_product:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -53,7 +68,9 @@ async def create_product(
         product_data["created_by"] = current_user["email"]
         product_data["created_at"] = datetime.utcnow()
         
-        result = products_collection.insert_one(product_data)
+        result = await product_repository.create(product_data)
+        await run_in_threadpool(catalog.upsert, str(result.inserted_id))
+        background_tasks.add_task(recommendation_store.products_changed, [str(result.inserted_id)])
         
         return {
             "id": str(result.inserted_id),
@@ -67,25 +84,72 @@ async def create_product(
             detail=f"Error creating product: {str(e)}"
         )
 
-@router.get("/products", response_model=List[dict])
+# Bulk upsert (Admin only): a streamed NDJSON or CSV feed of products, keyed on name
+@router.post("/products/import")
+async def import_products(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    input_format: Optional[str] = Query(None, alias="format"),
+    current_user: dict = Depends(get_current_active_user),
+    product_repository: ProductRepository = Depends(get_product_repository)
+):
+    check_admin_access(current_user)
+    input_format = input_format or detect_format(request.headers.get("content-type"))
+    if input_format not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown format, expected one of: {', '.join(FORMATS)}"
+        )
+
+    try:
+        importer = ProductImporter(product_repository, imported_by=current_user["email"])
+        report = await importer.run(aiter_records(request.stream(), input_format))
+        # Batches written before an error still need their recommendations refreshed
+        if importer.changed_ids:
+            background_tasks.add_task(recommendation_store.products_changed, importer.changed_ids)
+        if report["error"]:
+            return JSONResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content={"detail": f"Error importing products: {report['error']}", **report},
+                background=background_tasks
+            )
+        return report
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing products: {str(e)}"
+        )
+
+def _search_products(search: str, skip: int, limit: int) -> List[dict]:
+    catalog.ensure_fresh()
+    products = []
+    for product_id, _ in search_index.search(search, limit, skip):
+        product = catalog.get(product_id)
+        if product is None:
+            continue
+        product = dict(product)
+        product["_id"] = str(product["_id"])
+        products.append(product)
+    return products
+
+@router.get("/products", response_model=List[ProductSummary])
 async def search_products(
     search: Optional[str] = None,
     skip: int = 0,
-    limit: int = 10
+    limit: int = 10,
+    product_repository: ProductRepository = Depends(get_product_repository)
 ):
     """
-    Search products by name, brand, or category.
+    Search products by name, brand, category, or notes. Matching ignores
+    case and accents, accepts word prefixes and single typos, and results
+    are ranked by relevance.
     """
     try:
-        filter_query = {}
-        if search:
-            filter_query["$or"] = [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"brand": {"$regex": search, "$options": "i"}},
-                {"category": {"$regex": search, "$options": "i"}}
-            ]
-
-        products = list(products_collection.find(filter_query).skip(skip).limit(limit))
+        # Ranked from the in-memory search index, kept in sync with the catalog
+        if search and search.strip():
+            return await run_in_threadpool(_search_products, search, skip, limit)
+
+        products = await product_repository.list({}, skip=skip, limit=limit)
         for product in products:
             product["_id"] = str(product["_id"])  # Convert ObjectId to string
 
@@ -96,33 +160,67 @@ async def search_products(
             detail=f"Error searching products: {str(e)}"
         )
 
+def _suggest(q: str, limit: int) -> List[dict]:
+    catalog.ensure_fresh()
+    return suggest_index.suggest(q, limit)
+
+# Declared before /products/{product_id} so "suggest" is not taken for an id
+@router.get("/products/suggest", response_model=List[Suggestion])
+async def suggest_products(q: str = "", limit: int = Query(8, ge=1, le=50)):
+    """
+    Autocomplete for the search box: product names, brands and notes that
+    start with `q` or have a word starting with it, best first.
+    """
+    try:
+        return await run_in_threadpool(_suggest, q, limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error suggesting products: {str(e)}"
+        )
+
+def _browse(selected: dict, min_price: Optional[float], max_price: Optional[float], skip: int, limit: int) -> dict:
+    catalog.ensure_fresh()
+    total, product_ids, facets = facet_index.browse(selected, min_price, max_price, skip, limit)
+    items = []
+    for product_id in product_ids:
+        product = catalog.get(product_id)
+        if product is None:
+            continue
+        product = dict(product)
+        product["_id"] = str(product["_id"])
+        items.append(product)
+    return {"total": total, "items": items, "facets": facets}
+
+# Declared before /products/{product_id} so "browse" is not taken for an id
+@router.get("/products/browse", response_model=FacetedProducts)
 async def get_products(
     skip: int = 0,
     limit: int = 10,
-    category: str = None,
-    brand: str = None,
+    category: Optional[List[str]] = Query(None),
+    brand: Optional[List[str]] = Query(None),
+    season: Optional[List[str]] = Query(None),
+    scent_strength: Optional[List[str]] = Query(None),
+    notes: Optional[List[str]] = Query(None),
+    price: Optional[List[str]] = Query(None),
     min_price: float = None,
     max_price: float = None
 ):
+    """
+    Browse products by facet. Repeat a parameter to select several values
+    (any of them matches); different parameters must all match. Facet
+    counts for each field are computed as if that field had no selection.
+    """
     try:
-        filter_query = {}
-        if category:
-            filter_query["category"] = category
-        if brand:
-            filter_query["brand"] = brand
-        if min_price is not None or max_price is not None:
-            price_query = {}
-            if min_price is not None:
-                price_query["$gte"] = min_price
-            if max_price is not None:
-                price_query["$lte"] = max_price
-            if price_query:
-                filter_query["price"] = price_query
-
-        products = list(products_collection.find(filter_query).skip(skip).limit(limit))
-        for product in products:
-            product["_id"] = str(product["_id"])
-        return products
+        selected = {
+            "category": category,
+            "brand": brand,
+            "season": season,
+            "scent_strength": scent_strength,
+            "notes": notes,
+            "price": price
+        }
+        return await run_in_threadpool(_browse, selected, min_price, max_price, skip, limit)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -130,30 +228,59 @@ async def get_products(
         )
 
 # Get single product (Public access)
-@router.get("/products/{product_id}")
-async def get_product(product_id: str):
-    product = await get_product_by_id(product_id)
+@router.get("/products/{product_id}", response_model=ProductDetail)
+async def get_product(
+    product_id: str,
+    product_repository: ProductRepository = Depends(get_product_repository)
+):
+    product = await get_product_by_id(product_id, product_repository)
     product["_id"] = str(product["_id"])
     return product
 
+# "Smells like this": products with the most similar notes (Public access)
+def _similar_products(product_id: str, limit: int) -> Optional[List[dict]]:
+    if catalog.get(product_id) is None:
+        return None
+
+    similar = []
+    for similar_id, similarity in similarity_index.similar(product_id, limit):
+        product = catalog.get(similar_id)
+        if product is None:
+            continue
+        product = dict(product)
+        product["_id"] = str(product["_id"])
+        product["similarity"] = similarity
+        similar.append(product)
+    return similar
+
+@router.get("/products/{product_id}/similar", response_model=List[SimilarProduct])
+async def get_similar_products(product_id: str, limit: int = Query(5, ge=1, le=50)):
+    # The catalog may poll MongoDB synchronously, keep it off the event loop
+    similar = await run_in_threadpool(_similar_products, product_id, limit)
+    if similar is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+    return similar
+
 # Update product (Admin only)
 @router.put("/products/{product_id}")
 async def update_product(
     product_id: str,
     product_update: PerfumeCreate,
-    current_user: dict = Depends(get_current_active_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_active_user),
+    product_repository: ProductRepository = Depends(get_product_repository)
 ):
     check_admin_access(current_user)
     
     try:
         # Verify product exists
-        await get_product_by_id(product_id)
+        await get_product_by_id(product_id, product_repository, {"_id": 1})
         
         # Check if updating to an existing name
-        existing_product = products_collection.find_one({
-            "name": product_update.name,
-            "_id": {"$ne": ObjectId(product_id)}
-        })
+        existing_product = await product_repository.find_by_name(product_update.name, exclude_id=product_id)
         if existing_product:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -164,16 +291,15 @@ async def update_product(
         update_data["updated_by"] = current_user["email"]
         update_data["updated_at"] = datetime.utcnow()
         
-        result = products_collection.update_one(
-            {"_id": ObjectId(product_id)},
-            {"$set": update_data}
-        )
+        result = await product_repository.update(product_id, update_data)
         
         if result.modified_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Product not found or no changes made"
             )
+        await run_in_threadpool(catalog.upsert, product_id)
+        background_tasks.add_task(recommendation_store.products_changed, [product_id])
             
         return {"message": "Product updated successfully"}
     except HTTPException as he:
@@ -188,21 +314,25 @@ async def update_product(
 @router.delete("/products/{product_id}")
 async def delete_product(
     product_id: str,
-    current_user: dict = Depends(get_current_active_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_active_user),
+    product_repository: ProductRepository = Depends(get_product_repository)
 ):
     check_admin_access(current_user)
     
     try:
         # Verify product exists
-        await get_product_by_id(product_id)
+        await get_product_by_id(product_id, product_repository, {"_id": 1})
         
-        result = products_collection.delete_one({"_id": ObjectId(product_id)})
+        result = await product_repository.delete(product_id)
         
         if result.deleted_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Product not found"
             )
+        await run_in_threadpool(catalog.remove, product_id)
+        background_tasks.add_task(recommendation_store.products_changed, [], [product_id])
             
         return {"message": "Product deleted successfully"}
     except HTTPException as he:
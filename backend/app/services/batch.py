@@ -0,0 +1,214 @@
+"""
+Batch recommendations for every user in the preferences collection.
+
+Preference documents are streamed in chunks and scored across a process
+pool; each worker receives the catalog once, at start-up. The API shares
+one pool (batch_pool) across requests and only re-creates it when the
+catalog changes. This module is kept free of database imports so spawned
+workers start without connecting to MongoDB.
+
+CLI usage:
+    python -m app.services.batch --limit 10 --workers 8 --output recs.ndjson
+    python -m app.services.batch --materialize
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional
+
+from .scoring import CatalogScorer
+
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "500"))
+# Size of the scoring pool shared by API requests
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "0")) or os.cpu_count() or 1
+
+# Only the fields the scorer reads are shipped to workers
+SCORING_PRODUCT_FIELDS = ("_id", "notes", "category", "brand", "price", "season", "scent_strength")
+SCORING_PREFERENCE_FIELDS = (
+    "user_email", "favorite_notes", "preferred_categories", "price_range",
+    "preferred_brands", "seasonal_preference", "scent_strength"
+)
+
+_worker_scorer: Optional[CatalogScorer] = None
+
+def _init_worker(products: List[Dict]):
+    global _worker_scorer
+    _worker_scorer = CatalogScorer(products)
+
+def _score_chunk(preferences: List[Dict], limit: int) -> List[Dict]:
+    return [score_user(_worker_scorer, prefs, limit) for prefs in preferences]
+
+def score_user(scorer: CatalogScorer, preferences: Dict, limit: int) -> Dict:
+    return {
+        "user_email": preferences.get("user_email"),
+        "recommendations": [
+            {"product_id": scorer.product_id(row), "score": score}
+            for row, score in scorer.ranked(preferences, limit)
+        ]
+    }
+
+def _chunks(documents: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for document in documents:
+        chunk.append(document)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def slim_products(products: Iterable[Dict]) -> List[Dict]:
+    return [
+        {field: (str(product[field]) if field == "_id" else product[field])
+         for field in SCORING_PRODUCT_FIELDS if field in product}
+        for product in products
+    ]
+
+class ScoringPool:
+    """
+    A spawn process pool whose workers hold one catalog, shared by
+    concurrent batch runs. A run with a different catalog key replaces the
+    pool; the old one is shut down once its last run finishes.
+    """
+
+    def __init__(self, max_workers: int = BATCH_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._key: Optional[Hashable] = None
+        # Runs still using each executor, current or replaced
+        self._users: Dict[ProcessPoolExecutor, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, products: List[Dict], key: Hashable) -> Iterator[ProcessPoolExecutor]:
+        """The pool for this catalog (`products` slimmed, `key` identifying them)"""
+        with self._lock:
+            if self._executor is None or self._key != key:
+                self._retire()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(products,)
+                )
+                self._key = key
+            executor = self._executor
+            self._users[executor] = self._users.get(executor, 0) + 1
+        try:
+            yield executor
+        finally:
+            with self._lock:
+                self._users[executor] -= 1
+                if not self._users[executor]:
+                    del self._users[executor]
+                    if executor is not self._executor:
+                        executor.shutdown(wait=False)
+
+    def _retire(self):
+        if self._executor is not None and not self._users.get(self._executor):
+            self._executor.shutdown(wait=False)
+        self._executor = None
+        self._key = None
+
+    def shutdown(self):
+        """Stop the current pool, cancelling queued chunks; replaced pools finish their runs"""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+            self._key = None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+batch_pool = ScoringPool()
+
+def iter_batch_recommendations(
+    preferences_collection,
+    products: List[Dict],
+    limit: int = 10,
+    workers: Optional[int] = None,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+    pool: Optional[ScoringPool] = None,
+    catalog_key: Hashable = None,
+    query: Optional[Dict] = None
+) -> Iterator[Dict]:
+    """
+    Yield one result per preference document matching `query` (all by
+    default), in collection order. At most
+    two chunks per worker are in flight, so memory stays bounded no matter
+    how many users there are. With a shared `pool`, `workers` only limits
+    this run's share of it and `catalog_key` decides whether its workers
+    can be reused; without one, a pool of `workers` lives for this run.
+    """
+    products = slim_products(products)
+    projection = {field: 1 for field in SCORING_PREFERENCE_FIELDS}
+    cursor = preferences_collection.find(query or {}, projection).batch_size(chunk_size)
+    chunks = _chunks(({k: v for k, v in prefs.items() if k != "_id"} for prefs in cursor), chunk_size)
+
+    workers = workers or (pool.max_workers if pool else os.cpu_count() or 1)
+    if workers == 1:
+        scorer = CatalogScorer(products)
+        for chunk in chunks:
+            for prefs in chunk:
+                yield score_user(scorer, prefs, limit)
+        return
+
+    owned = pool is None
+    if owned:
+        pool = ScoringPool(workers)
+    workers = min(workers, pool.max_workers)
+    try:
+        with pool.acquire(products, catalog_key) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_score_chunk, chunk, limit))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    finally:
+        if owned:
+            pool.shutdown()
+
+def iter_ndjson(results: Iterable[Dict]) -> Iterator[str]:
+    for result in results:
+        yield json.dumps(result, default=str) + "\n"
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate recommendations for every user with preferences")
+    parser.add_argument("--limit", type=int, default=10, help="recommendations per user")
+    parser.add_argument("--workers", type=int, default=None, help="scoring processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE)
+    parser.add_argument("--output", default="-", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--materialize", action="store_true",
+                        help="bulk-write into the recommendations collection instead of NDJSON")
+    args = parser.parse_args(argv)
+
+    from ..database import preferences_collection
+    from .catalog import catalog
+    from .materialized import recommendation_store
+
+    # Materialized documents always hold the store's top-N
+    limit = recommendation_store.top_n if args.materialize else args.limit
+    results = iter_batch_recommendations(
+        preferences_collection, catalog.products(), limit, args.workers, args.chunk_size
+    )
+    if args.materialize:
+        written = recommendation_store.save_batch(results)
+        print(f"Materialized recommendations for {written} users", file=sys.stderr)
+        return
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for line in iter_ndjson(results):
+            output.write(line)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()
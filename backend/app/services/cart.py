@@ -1,9 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List, Dict, Optional
-from ..database import db, carts_collection, products_collection
+from ..repositories import CartRepository, ProductRepository, cart_repository, product_repository
 from ..routes.auth import get_current_active_user
-from bson import ObjectId
-from datetime import datetime
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -14,29 +12,22 @@ class CartItemRequest(BaseModel):
     quantity: int
 
 class CartManager:
-    def __init__(self):
-        self.carts_collection = carts_collection
-        self.products_collection = products_collection
+    def __init__(self, carts: CartRepository = cart_repository, products: ProductRepository = product_repository):
+        self.carts = carts
+        self.products = products
 
     async def get_cart(self, user_email: str) -> Dict:
         """Get user's cart or create a new one if it doesn't exist"""
-        cart = self.carts_collection.find_one({"user_email": user_email})
+        cart = await self.carts.get(user_email)
         if not cart:
-            cart = {
-                "user_email": user_email,
-                "items": [],
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-                "total_amount": 0.0
-            }
-            self.carts_collection.insert_one(cart)
+            cart = await self.carts.create(user_email)
         return cart
 
     async def add_to_cart(self, user_email: str, product_id: str, quantity: int) -> Dict:
         """Add a product to the user's cart"""
         try:
             # Validate product exists and get its details
-            product = self.products_collection.find_one({"_id": ObjectId(product_id)})
+            product = await self.products.get(product_id)
             if not product:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -67,16 +58,7 @@ class CartManager:
             total = sum(item["price"] * item["quantity"] for item in cart["items"])
             
             # Update cart in database
-            self.carts_collection.update_one(
-                {"user_email": user_email},
-                {
-                    "$set": {
-                        "items": cart["items"],
-                        "total_amount": total,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
+            await self.carts.save_items(user_email, cart["items"], total)
 
             return cart
 
@@ -113,16 +95,7 @@ class CartManager:
             total = sum(item["price"] * item["quantity"] for item in cart["items"])
             
             # Update cart in database
-            self.carts_collection.update_one(
-                {"user_email": user_email},
-                {
-                    "$set": {
-                        "items": cart["items"],
-                        "total_amount": total,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
+            await self.carts.save_items(user_email, cart["items"], total)
 
             return cart
 
@@ -135,16 +108,7 @@ class CartManager:
     async def clear_cart(self, user_email: str) -> Dict:
         """Remove all items from cart"""
         try:
-            self.carts_collection.update_one(
-                {"user_email": user_email},
-                {
-                    "$set": {
-                        "items": [],
-                        "total_amount": 0.0,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
+            await self.carts.clear(user_email)
             return {"message": "Cart cleared successfully"}
         except Exception as e:
             raise HTTPException(
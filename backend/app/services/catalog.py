@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from bson import ObjectId
+
+from ..database import products_collection
+from .scoring import CatalogScorer
+
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "30"))
+
+# Listener signature: (upserted product documents, removed product ids).
+# removed is None after a full load, when upserted is the entire catalog.
+CatalogListener = Callable[[List[Dict], List[str]], None]
+
+class CatalogSnapshot:
+    """
+    In-process copy of the products collection.
+
+    Products are loaded once and served from memory. Writes made through the
+    product routes are applied immediately via upsert()/remove(); writes made
+    by other workers are picked up by an incremental poll every
+    refresh_interval seconds (0 disables polling). Every change bumps
+    `version`, which downstream caches and indexes key on.
+    """
+
+    def __init__(self, collection, refresh_interval: float = CATALOG_REFRESH_SECONDS):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.version = 0
+        self._products: Dict[str, Dict] = {}
+        self._listeners: List[CatalogListener] = []
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._watermark = None
+        self._scorer: Optional[CatalogScorer] = None
+        self._scorer_version = -1
+
+    def subscribe(self, listener: CatalogListener):
+        """Register a callback invoked after every applied change"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _track_watermark(self, product: Dict):
+        for field in ("created_at", "updated_at"):
+            stamp = product.get(field)
+            if stamp is not None and (self._watermark is None or stamp > self._watermark):
+                self._watermark = stamp
+
+    def load(self):
+        """Full (re)load of the products collection"""
+        with self._lock:
+            products = {}
+            self._watermark = None
+            for product in self.collection.find():
+                products[str(product["_id"])] = product
+                self._track_watermark(product)
+            self._products = products
+            self._loaded = True
+            self._last_refresh = time.monotonic()
+            self.version += 1
+            self._notify(list(products.values()), None)
+
+    def ensure_fresh(self):
+        """Load on first use, then poll for outside changes once the interval has passed"""
+        if not self._loaded:
+            self.load()
+        elif self.refresh_interval > 0 and time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+
+    def refresh(self):
+        """Incremental sync: fetch documents written since the watermark and drop deleted ids"""
+        with self._lock:
+            if not self._loaded:
+                self.load()
+                return
+
+            changed = []
+            if self._watermark is not None:
+                query = {"$or": [
+                    {"created_at": {"$gte": self._watermark}},
+                    {"updated_at": {"$gte": self._watermark}}
+                ]}
+                for product in self.collection.find(query):
+                    product_id = str(product["_id"])
+                    if self._products.get(product_id) != product:
+                        changed.append(product)
+
+            live_ids = {str(doc["_id"]) for doc in self.collection.find({}, {"_id": 1})}
+            removed = [product_id for product_id in self._products if product_id not in live_ids]
+            # Documents written without timestamps only show up as unknown ids
+            missing = [ObjectId(product_id) for product_id in live_ids - self._products.keys()
+                       if ObjectId.is_valid(product_id)]
+            if missing:
+                known = {str(product["_id"]) for product in changed}
+                changed.extend(product for product in self.collection.find({"_id": {"$in": missing}})
+                               if str(product["_id"]) not in known)
+
+            self._last_refresh = time.monotonic()
+            if changed or removed:
+                self.apply(changed, removed)
+
+    def upsert(self, product_id: str):
+        """Re-read one product after a local write"""
+        if not self._loaded:
+            return
+        product = self.collection.find_one({"_id": ObjectId(product_id)})
+        if product is None:
+            self.remove(product_id)
+        else:
+            self.apply([product], [])
+
+    def remove(self, product_id: str):
+        self.apply([], [product_id])
+
+    def apply(self, upserted: Iterable[Dict], removed: Iterable[str]):
+        """Apply a batch of changes, bump the version and notify listeners once"""
+        with self._lock:
+            if not self._loaded:
+                # Nothing cached yet, the first read will load everything
+                return
+            upserted = list(upserted)
+            removed = [product_id for product_id in removed if self._products.pop(product_id, None) is not None]
+            for product in upserted:
+                self._products[str(product["_id"])] = product
+                self._track_watermark(product)
+            if not upserted and not removed:
+                return
+            self.version += 1
+            self._notify(upserted, removed)
+
+    def _notify(self, upserted: List[Dict], removed: Optional[List[str]]):
+        for listener in self._listeners:
+            try:
+                listener(upserted, removed)
+            except Exception as e:
+                print(f"Catalog listener {listener!r} failed: {str(e)}")
+
+    def products(self) -> List[Dict]:
+        """Current products in catalog order. Documents are shared; copy before mutating."""
+        self.ensure_fresh()
+        return list(self._products.values())
+
+    def get(self, product_id: str) -> Optional[Dict]:
+        self.ensure_fresh()
+        return self._products.get(product_id)
+
+    def scorer(self) -> CatalogScorer:
+        """Scoring engine for the current catalog version, rebuilt only when the catalog changes"""
+        self.ensure_fresh()
+        with self._lock:
+            if self._scorer is None or self._scorer_version != self.version:
+                self._scorer = CatalogScorer(list(self._products.values()), self.version)
+                self._scorer_version = self.version
+            return self._scorer
+
+catalog = CatalogSnapshot(products_collection)
@@ -0,0 +1,189 @@
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+from ..database import orders_collection
+
+COPURCHASE_MAX_NEIGHBORS = int(os.getenv("COPURCHASE_MAX_NEIGHBORS", "50"))
+COPURCHASE_REBUILD_SECONDS = float(os.getenv("COPURCHASE_REBUILD_SECONDS", "3600"))
+# Wait before retrying a build that failed, e.g. while MongoDB is still unreachable
+COPURCHASE_RETRY_SECONDS = float(os.getenv("COPURCHASE_RETRY_SECONDS", "30"))
+# Counters each item keeps while a build streams orders, 0 means 4x max_neighbors
+COPURCHASE_SKETCH_SIZE = int(os.getenv("COPURCHASE_SKETCH_SIZE", "0"))
+# Items beyond this in a single order are ignored, pairs grow quadratically
+MAX_ITEMS_PER_ORDER = 50
+ORDERS_BATCH_SIZE = 1000
+
+class CoPurchaseModel:
+    """
+    Sparse item-item co-occurrence counts built from paid orders.
+
+    A build streams the orders through a Misra-Gries summary per item that
+    holds at most sketch_size counters: when a new neighbour arrives at a
+    full row, every count in the row drops by one instead. Build memory is
+    therefore bounded by products x sketch_size, whatever the number of
+    distinct pairs. A kept count undercounts the true one by at most the
+    row's number of decrements, recorded in errors, which is never more
+    than the item's pair total / (sketch_size + 1); any neighbour above
+    that share is guaranteed to survive. Each row is then cut to its
+    max_neighbors strongest neighbours.
+
+    Between builds, newly paid orders only add pairs to items whose counts
+    were neither pruned nor decremented.
+
+    Builds run on a background thread started by the app's lifespan (see
+    start()), never on the request path; until the first one finishes,
+    every score and count is empty.
+    """
+
+    def __init__(self, collection, max_neighbors: int = COPURCHASE_MAX_NEIGHBORS,
+                 rebuild_interval: float = COPURCHASE_REBUILD_SECONDS,
+                 sketch_size: int = COPURCHASE_SKETCH_SIZE):
+        self.collection = collection
+        self.max_neighbors = max_neighbors
+        self.rebuild_interval = rebuild_interval
+        self.sketch_size = max(sketch_size or 4 * max_neighbors, max_neighbors)
+        self.item_counts: Counter = Counter()
+        self._neighbors: Dict[str, Counter] = {}
+        # Upper bound on how far each item's kept counts undercount, from the last build
+        self.errors: Counter = Counter()
+        # Items that lost neighbours to pruning or decrements in the last build
+        self._pruned: Set[str] = set()
+        self._built_at = None
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def built(self) -> bool:
+        return self._built_at is not None
+
+    @staticmethod
+    def _order_items(order: Dict) -> List[str]:
+        product_ids = []
+        for item in order.get("items") or []:
+            product_id = item.get("product_id") if isinstance(item, dict) else None
+            # Older orders store ObjectIds
+            if product_id and str(product_id) not in product_ids:
+                product_ids.append(str(product_id))
+        return product_ids[:MAX_ITEMS_PER_ORDER]
+
+    @staticmethod
+    def _count(neighbors: Dict[str, Counter], errors: Counter, item_counts: Counter,
+               product_ids: List[str], sketch_size: int):
+        for product_id in product_ids:
+            item_counts[product_id] += 1
+            row = neighbors.setdefault(product_id, Counter())
+            for other in product_ids:
+                if other == product_id:
+                    continue
+                if other in row or len(row) < sketch_size:
+                    row[other] += 1
+                    continue
+                # Full row: decrement every counter, each decrement pays for sketch_size + 1 pairs
+                errors[product_id] += 1
+                for key in list(row):
+                    row[key] -= 1
+                    if not row[key]:
+                        del row[key]
+
+    def rebuild(self):
+        """Full rebuild by streaming every paid order"""
+        neighbors: Dict[str, Counter] = {}
+        errors: Counter = Counter()
+        item_counts: Counter = Counter()
+        cursor = self.collection.find(
+            {"status": "paid"}, {"items.product_id": 1}
+        ).batch_size(ORDERS_BATCH_SIZE)
+        for order in cursor:
+            self._count(neighbors, errors, item_counts, self._order_items(order), self.sketch_size)
+        pruned = set(errors)
+        for product_id, row in neighbors.items():
+            if len(row) > self.max_neighbors:
+                neighbors[product_id] = Counter(dict(row.most_common(self.max_neighbors)))
+                pruned.add(product_id)
+        with self._lock:
+            self._neighbors = neighbors
+            self.errors = errors
+            self._pruned = pruned
+            self.item_counts = item_counts
+            self._built_at = time.monotonic()
+
+    def _stale(self) -> bool:
+        return self._built_at is None or (
+            self.rebuild_interval > 0 and time.monotonic() - self._built_at >= self.rebuild_interval
+        )
+
+    def ensure_built(self):
+        """Build if never built or stale; concurrent callers share one build"""
+        with self._build_lock:
+            if self._stale():
+                self.rebuild()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.ensure_built()
+            except Exception as e:
+                print(f"Could not build co-purchase model: {str(e)}")
+            if not self.built:
+                timeout = COPURCHASE_RETRY_SECONDS
+            elif self.rebuild_interval > 0:
+                timeout = self.rebuild_interval
+            else:
+                timeout = None
+            self._stop.wait(timeout)
+
+    def start(self):
+        """Build in the background now, then every rebuild_interval seconds"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="copurchase-build", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def add_order(self, order: Dict):
+        """
+        Fold a newly paid order into this process's counts. Call it once per
+        order; other workers only see the order on their next rebuild().
+        """
+        product_ids = self._order_items(order)
+        with self._lock:
+            if self._built_at is None:
+                # Not built yet, the first build will stream this order too
+                return
+            for product_id in product_ids:
+                self.item_counts[product_id] += 1
+                row = self._neighbors.setdefault(product_id, Counter())
+                for other in product_ids:
+                    # A pruned item's missing pairs had unknown counts, they wait for the next build
+                    if other != product_id and (other in row or product_id not in self._pruned):
+                        row[other] += 1
+
+    def scores_for(self, product_ids: Iterable[str]) -> Dict[str, float]:
+        """
+        Co-purchase affinity of every neighbour of the given items, using
+        cosine-normalized counts summed over the seeds and scaled to [0, 1].
+        """
+        scores: Counter = Counter()
+        with self._lock:
+            for product_id in set(product_ids):
+                seed_count = self.item_counts.get(product_id, 0)
+                for other, together in self._neighbors.get(product_id, {}).items():
+                    scores[other] += together / math.sqrt(seed_count * self.item_counts[other])
+        if not scores:
+            return {}
+        top = max(scores.values())
+        return {product_id: score / top for product_id, score in scores.items()}
+
+copurchase_model = CoPurchaseModel(orders_collection)
@@ -0,0 +1,238 @@
+import bisect
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .catalog import catalog
+
+FACET_FIELDS = ("category", "brand", "season", "scent_strength", "notes")
+# Upper bounds of the price buckets; the last bucket is open-ended
+FACET_PRICE_BUCKETS = [
+    float(bound) for bound in os.getenv("FACET_PRICE_BUCKETS", "100000,250000,500000,1000000").split(",")
+    if bound.strip()
+]
+
+def _format_price(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+def price_bucket_labels(bounds: List[float]) -> List[str]:
+    """["0-100000", "100000-250000", ..., "1000000+"]"""
+    labels = []
+    lower = 0.0
+    for bound in bounds:
+        labels.append(f"{_format_price(lower)}-{_format_price(bound)}")
+        lower = bound
+    labels.append(f"{_format_price(lower)}+")
+    return labels
+
+def _bitmap(slots: Iterable[int], size: int) -> int:
+    bits = bytearray((size + 7) // 8)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, "little")
+
+class FacetIndex:
+    """
+    Per-value bitmaps for faceted browsing.
+
+    Every product owns a bit position (its slot) and every facet value a
+    Python int with the bits of the products carrying it. A selection is
+    the OR of the selected values within a facet and the AND across
+    facets; a value's count is the popcount of its bitmap ANDed with the
+    selection on every other facet, so picking a brand still shows how
+    many products the other brands have. Slots follow catalog order and
+    are only compacted on a full reload, so results page in a stable order.
+    """
+
+    def __init__(self, fields: Tuple[str, ...] = FACET_FIELDS, price_bounds: List[float] = FACET_PRICE_BUCKETS):
+        self.fields = tuple(fields)
+        self.price_bounds = sorted(price_bounds)
+        self.price_labels = price_bucket_labels(self.price_bounds)
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._values: Dict[str, List[Tuple[str, str]]] = {}
+        self._bitmaps: Dict[str, Dict[str, int]] = {}
+        # Sorted (price, slot) pairs for min_price/max_price ranges
+        self._prices: List[Tuple[float, int]] = []
+        self._price_of: Dict[str, float] = {}
+        self._live = 0
+        self._lock = threading.RLock()
+        self.clear()
+
+    def _facet_values(self, product: Dict) -> List[Tuple[str, str]]:
+        values = []
+        for field in self.fields:
+            raw = product.get(field)
+            for value in raw if isinstance(raw, list) else [raw]:
+                if value is not None and value != "" and (field, str(value)) not in values:
+                    values.append((field, str(value)))
+        price = self._price(product)
+        if price is not None:
+            values.append(("price", self.price_labels[bisect.bisect_right(self.price_bounds, price)]))
+        return values
+
+    @staticmethod
+    def _price(product: Dict) -> Optional[float]:
+        price = product.get("price")
+        if isinstance(price, (int, float)) and not isinstance(price, bool):
+            return float(price)
+        return None
+
+    def _unset(self, product_id: str):
+        slot = self._slots[product_id]
+        mask = ~(1 << slot)
+        for field, value in self._values.pop(product_id, []):
+            bitmap = self._bitmaps[field][value] & mask
+            if bitmap:
+                self._bitmaps[field][value] = bitmap
+            else:
+                del self._bitmaps[field][value]
+        price = self._price_of.pop(product_id, None)
+        if price is not None:
+            index = bisect.bisect_left(self._prices, (price, slot))
+            if index < len(self._prices) and self._prices[index] == (price, slot):
+                del self._prices[index]
+
+    def add(self, product: Dict):
+        product_id = str(product["_id"])
+        with self._lock:
+            if product_id in self._slots:
+                # Updates keep their slot, and with it their place in the order
+                self._unset(product_id)
+            else:
+                self._slots[product_id] = len(self._ids)
+                self._ids.append(product_id)
+            slot = self._slots[product_id]
+            bit = 1 << slot
+            values = self._facet_values(product)
+            for field, value in values:
+                bitmaps = self._bitmaps[field]
+                bitmaps[value] = bitmaps.get(value, 0) | bit
+            self._values[product_id] = values
+            price = self._price(product)
+            if price is not None:
+                bisect.insort(self._prices, (price, slot))
+                self._price_of[product_id] = price
+            self._live |= bit
+
+    def remove(self, product_id: str):
+        with self._lock:
+            if product_id not in self._slots:
+                return
+            self._unset(product_id)
+            slot = self._slots.pop(product_id)
+            self._ids[slot] = None
+            self._live &= ~(1 << slot)
+
+    def clear(self):
+        with self._lock:
+            self._slots = {}
+            self._ids = []
+            self._values = {}
+            self._bitmaps = {field: {} for field in self.fields + ("price",)}
+            self._prices = []
+            self._price_of = {}
+            self._live = 0
+
+    def load(self, products: List[Dict]):
+        """Bulk build: each bitmap is assembled once instead of OR-ed in per product"""
+        with self._lock:
+            self.clear()
+            slots_by_value: Dict[Tuple[str, str], List[int]] = {}
+            for product in products:
+                product_id = str(product["_id"])
+                if product_id in self._slots:
+                    continue
+                slot = self._slots[product_id] = len(self._ids)
+                self._ids.append(product_id)
+                values = self._facet_values(product)
+                for value in values:
+                    slots_by_value.setdefault(value, []).append(slot)
+                self._values[product_id] = values
+                price = self._price(product)
+                if price is not None:
+                    self._prices.append((price, slot))
+                    self._price_of[product_id] = price
+            self._prices.sort()
+            size = len(self._ids)
+            for (field, value), slots in slots_by_value.items():
+                self._bitmaps[field][value] = _bitmap(slots, size)
+            self._live = (1 << size) - 1
+
+    def on_catalog_change(self, upserted: List[Dict], removed: Optional[List[str]]):
+        with self._lock:
+            if removed is None:
+                self.load(upserted)
+                return
+            for product_id in removed:
+                self.remove(product_id)
+            for product in upserted:
+                self.add(product)
+
+    def _price_range(self, min_price: Optional[float], max_price: Optional[float]) -> int:
+        start = 0 if min_price is None else bisect.bisect_left(self._prices, (min_price, -1))
+        end = len(self._prices) if max_price is None else bisect.bisect_right(self._prices, (max_price, len(self._ids)))
+        return _bitmap((slot for _, slot in self._prices[start:end]), len(self._ids))
+
+    def _slice(self, bitmap: int, skip: int, limit: int) -> List[str]:
+        # Least significant bit first, i.e. in slot order
+        bits = bin(bitmap)[:1:-1]
+        product_ids = []
+        position = bits.find("1")
+        while position != -1 and len(product_ids) < limit:
+            if skip:
+                skip -= 1
+            else:
+                product_ids.append(self._ids[position])
+            position = bits.find("1", position + 1)
+        return product_ids
+
+    def browse(
+        self,
+        selected: Dict[str, List[str]],
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        skip: int = 0,
+        limit: int = 10
+    ) -> Tuple[int, List[str], Dict[str, Dict[str, int]]]:
+        """(matching product count, product ids of the page, facet counts)"""
+        with self._lock:
+            base = self._live
+            if min_price is not None or max_price is not None:
+                base &= self._price_range(min_price, max_price)
+            masks = {}
+            for field, values in selected.items():
+                if values:
+                    bitmaps = self._bitmaps[field]
+                    mask = 0
+                    for value in values:
+                        mask |= bitmaps.get(value, 0)
+                    masks[field] = mask
+
+            matched = base
+            for mask in masks.values():
+                matched &= mask
+
+            facets = {}
+            for field in self.fields + ("price",):
+                # A facet's counts ignore its own selection
+                others = base
+                for other, mask in masks.items():
+                    if other != field:
+                        others &= mask
+                chosen = selected.get(field) or []
+                counts = {}
+                for value, bitmap in self._bitmaps[field].items():
+                    count = (bitmap & others).bit_count()
+                    if count or value in chosen:
+                        counts[value] = count
+                if field == "price":
+                    order = {label: index for index, label in enumerate(self.price_labels)}
+                    facets[field] = dict(sorted(counts.items(), key=lambda item: order.get(item[0], len(order))))
+                else:
+                    facets[field] = dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+            return matched.bit_count(), self._slice(matched, skip, limit), facets
+
+facet_index = FacetIndex()
+catalog.subscribe(facet_index.on_catalog_change)
@@ -0,0 +1,190 @@
+"""
+Incremental NDJSON/CSV parsing for bulk imports.
+
+Input arrives as raw byte chunks (an HTTP request body or a file) and is
+parsed line by line, so only one partial line is buffered however large
+the upload. A line longer than IMPORT_MAX_LINE_BYTES is dropped as it
+streams in and reported as a failed row. Every row carries its line number and either the parsed
+record or the reason it could not be parsed, so importers can report
+errors per row instead of failing the whole upload.
+
+CSV input needs a header row. Quoted fields cannot span lines.
+ImportReport is the summary importers return.
+"""
+import csv
+import json
+import os
+import time
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from pydantic import ValidationError
+
+FORMATS = ("ndjson", "csv")
+# Errors beyond this many are counted but not listed in an import report
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+# Longest accepted line, bounding what one record can buffer
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(1 << 20)))
+
+class ParsedRow(NamedTuple):
+    line: int
+    record: Optional[Dict]
+    error: Optional[str] = None
+
+def detect_format(content_type: Optional[str]) -> str:
+    """"csv" for text/csv bodies, otherwise NDJSON"""
+    if content_type and content_type.split(";")[0].strip().lower() in ("text/csv", "application/csv"):
+        return "csv"
+    return "ndjson"
+
+class ImportReport:
+    """
+    Row counts and per-row errors of one import. Subclasses name their
+    counters and the record field that identifies a row in errors.
+    """
+    counters: Tuple[str, ...] = ("inserted",)
+    key = "id"
+
+    def __init__(self, max_errors: int = IMPORT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.rows = 0
+        for counter in self.counters:
+            setattr(self, counter, 0)
+        self.failed = 0
+        self.errors: List[Dict] = []
+        # Set when an unexpected error stopped the import part way
+        self.error: Optional[str] = None
+        self.started = time.perf_counter()
+
+    def fail(self, line: int, key: Optional[str], error: str):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, self.key: key, "error": error})
+
+    def abort(self, error: Exception, unwritten: Iterable[Tuple[int, Optional[str]]]):
+        """
+        Record the error that stopped the import. `unwritten` are the
+        (line, key) rows accepted but not yet recorded as written; rows of
+        a bulk write cut short may still have been stored.
+        """
+        self.error = str(error)
+        for line, key in unwritten:
+            self.fail(line, key, f"Not imported, the import stopped: {self.error}")
+
+    def to_dict(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        report = {"rows": self.rows}
+        report.update((counter, getattr(self, counter)) for counter in self.counters)
+        report.update({
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "error": self.error,
+            "seconds": elapsed,
+            "rows_per_second": self.rows / elapsed if elapsed else 0.0
+        })
+        return report
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+class RecordParser:
+    """Feed raw bytes in, get ParsedRows out"""
+
+    def __init__(self, format: str = "ndjson", max_line_bytes: int = IMPORT_MAX_LINE_BYTES):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format!r}, expected one of: {', '.join(FORMATS)}")
+        self.format = format
+        self.max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+        # The current line outgrew max_line_bytes, its bytes are skipped up to the newline
+        self._overlong = False
+        self._line = 0
+        self._header: Optional[List[str]] = None
+
+    def _parse(self, raw: bytes) -> Optional[ParsedRow]:
+        self._line += 1
+        try:
+            text = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            return ParsedRow(self._line, None, "Line is not valid UTF-8")
+        if self._line == 1:
+            text = text.lstrip("\ufeff")
+        text = text.strip()
+        if not text:
+            return None
+
+        if self.format == "ndjson":
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                return ParsedRow(self._line, None, f"Invalid JSON: {str(e)}")
+            if not isinstance(record, dict):
+                return ParsedRow(self._line, None, "Expected a JSON object")
+            return ParsedRow(self._line, record)
+
+        values = next(csv.reader([text]))
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            return None
+        if len(values) != len(self._header):
+            return ParsedRow(
+                self._line, None, f"Expected {len(self._header)} columns, got {len(values)}"
+            )
+        return ParsedRow(self._line, dict(zip(self._header, values)))
+
+    def _end_line(self, raw: bytearray) -> Optional[ParsedRow]:
+        if self._overlong or len(raw) > self.max_line_bytes:
+            self._overlong = False
+            self._line += 1
+            return ParsedRow(self._line, None, f"Line is longer than {self.max_line_bytes} bytes")
+        return self._parse(raw)
+
+    def feed(self, data: bytes) -> List[ParsedRow]:
+        rows = []
+        buffer = self._buffer
+        # Buffered bytes hold no newline, only the new ones are searched
+        search = len(buffer)
+        buffer += data
+        start = 0
+        while True:
+            end = buffer.find(b"\n", search)
+            if end < 0:
+                break
+            row = self._end_line(buffer[start:end])
+            if row is not None:
+                rows.append(row)
+            start = search = end + 1
+        del buffer[:start]
+        if len(buffer) > self.max_line_bytes:
+            self._overlong = True
+            buffer.clear()
+        return rows
+
+    def close(self) -> List[ParsedRow]:
+        """Rows from a final line without a trailing newline"""
+        remainder, self._buffer = self._buffer, bytearray()
+        row = self._end_line(remainder) if remainder or self._overlong else None
+        return [row] if row is not None else []
+
+def iter_records(chunks: Iterable[bytes], format: str = "ndjson") -> Iterator[ParsedRow]:
+    parser = RecordParser(format)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+async def aiter_records(chunks: AsyncIterable[bytes], format: str = "ndjson") -> AsyncIterator[ParsedRow]:
+    parser = RecordParser(format)
+    async for chunk in chunks:
+        for row in parser.feed(chunk):
+            yield row
+    for row in parser.close():
+        yield row
+
+def iter_file_chunks(f, size: int = 1 << 16) -> Iterator[bytes]:
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            return
+        yield chunk
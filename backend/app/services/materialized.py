@@ -0,0 +1,205 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from pymongo import ReplaceOne
+
+from ..database import recommendations_collection, preferences_collection
+from .catalog import catalog
+from .scoring import PRICE_RANGE_NAMES, CatalogScorer
+from .batch import SCORING_PREFERENCE_FIELDS, ScoringPool, _chunks, batch_pool, iter_batch_recommendations
+
+MATERIALIZED_TOP_N = int(os.getenv("MATERIALIZED_TOP_N", "20"))
+# Candidate users whose thresholds are fetched per query on a product change
+PRODUCTS_CHANGED_BATCH_SIZE = int(os.getenv("PRODUCTS_CHANGED_BATCH_SIZE", "1000"))
+# Above this many affected users, a product change is rescored on the shared batch pool
+PRODUCTS_CHANGED_POOL_THRESHOLD = int(os.getenv("PRODUCTS_CHANGED_POOL_THRESHOLD", "500"))
+# Users per preferences query when rescoring on the pool, keeps each $in well under the document limit
+POOL_QUERY_SIZE = 10000
+
+class RecommendationStore:
+    """
+    Precomputed top-N recommendations per user, stored in the
+    `recommendations` collection keyed by user_email.
+
+    Documents look like:
+        {"user_email", "product_ids": [...], "scores": [...],
+         "min_score": score of the N-th item or None if fewer than N,
+         "computed_at"}
+
+    Recompute is incremental: a preference change rescores one user, a
+    product change rescores only the users whose stored top-N it can enter
+    or already belongs to. When a change affects many users, e.g. after a
+    large import, they are scored across `pool` and bulk-written.
+    """
+
+    def __init__(self, collection, preferences, snapshot, top_n: int = MATERIALIZED_TOP_N,
+                 pool: ScoringPool = batch_pool):
+        self.collection = collection
+        self.preferences = preferences
+        self.catalog = snapshot
+        self.top_n = top_n
+        self.pool = pool
+        self._lock = threading.Lock()
+
+    def _document(self, user_email: str, product_ids: List[str], scores: List[float]) -> Dict:
+        return {
+            "user_email": user_email,
+            "product_ids": product_ids,
+            "scores": scores,
+            "min_score": scores[-1] if len(scores) >= self.top_n else None,
+            "computed_at": datetime.utcnow()
+        }
+
+    def lookup(self, user_email: str, limit: int) -> Optional[List[Tuple[Dict, float]]]:
+        """
+        Stored (product, score) pairs for a user, or None when they have to
+        be computed live (nothing stored, limit above N, or stale product ids).
+        """
+        if limit > self.top_n:
+            return None
+        stored = self.collection.find_one(
+            {"user_email": user_email}, {"product_ids": 1, "scores": 1, "min_score": 1}
+        )
+        if not stored:
+            return None
+
+        recommendations = []
+        for product_id, score in zip(stored["product_ids"][:limit], stored["scores"]):
+            product = self.catalog.get(product_id)
+            if product is None:
+                return None
+            product = dict(product)
+            product["_id"] = str(product["_id"])
+            recommendations.append((product, score))
+        # A short list is only complete when the catalog itself was smaller than N
+        if len(recommendations) < limit and stored.get("min_score") is not None:
+            return None
+        return recommendations
+
+    def refresh_user(self, user_email: str, scorer: Optional[CatalogScorer] = None):
+        preferences = self.preferences.find_one({"user_email": user_email})
+        if not preferences:
+            self.forget_user(user_email)
+            return
+        scorer = scorer or self.catalog.scorer()
+        ranked = scorer.ranked(preferences, self.top_n)
+        document = self._document(
+            user_email,
+            [scorer.product_id(row) for row, _ in ranked],
+            [score for _, score in ranked]
+        )
+        self.collection.replace_one({"user_email": user_email}, document, upsert=True)
+
+    def forget_user(self, user_email: str):
+        self.collection.delete_one({"user_email": user_email})
+
+    def save_batch(self, results: Iterable[Dict], batch_size: int = 1000) -> int:
+        """Bulk-write results produced by batch.iter_batch_recommendations"""
+        written = 0
+        operations = []
+        for result in results:
+            items = result["recommendations"][:self.top_n]
+            document = self._document(
+                result["user_email"],
+                [item["product_id"] for item in items],
+                [item["score"] for item in items]
+            )
+            operations.append(ReplaceOne({"user_email": result["user_email"]}, document, upsert=True))
+            if len(operations) >= batch_size:
+                written += len(operations)
+                self.collection.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            written += len(operations)
+            self.collection.bulk_write(operations, ordered=False)
+        return written
+
+    @staticmethod
+    def _sharing_features(changed: CatalogScorer) -> Optional[Dict]:
+        """Preferences filter: a note, category, brand, season, strength or price range of a changed product"""
+        clauses = []
+        for field, vocab in (
+            ("favorite_notes", changed.note_vocab),
+            ("preferred_categories", changed.category_vocab),
+            ("preferred_brands", changed.brand_vocab),
+            ("seasonal_preference", changed.season_vocab),
+            ("scent_strength", changed.strength_vocab),
+        ):
+            values = [value for value in vocab if value is not None]
+            if values:
+                clauses.append({field: {"$in": values}})
+        ranges = [PRICE_RANGE_NAMES[bucket] for bucket in sorted(set(changed.price_buckets.tolist())) if bucket >= 0]
+        if ranges:
+            clauses.append({"price_range": {"$in": ranges}})
+        return {"$or": clauses} if clauses else None
+
+    def products_changed(
+        self,
+        upserted_ids: List[str] = (),
+        removed_ids: List[str] = (),
+        batch_size: int = PRODUCTS_CHANGED_BATCH_SIZE,
+        pool_threshold: int = PRODUCTS_CHANGED_POOL_THRESHOLD
+    ):
+        """
+        Rescore only the users a product write can affect. Candidates come
+        from indexed queries: users holding a changed product, users sharing
+        a scoring feature with one, and users whose list a zero score can
+        still enter. Thresholds are read per batch of candidates, and the
+        lock is only held while rescoring.
+        """
+        affected = set()
+        touched = list(upserted_ids) + list(removed_ids)
+        if touched:
+            # Users already holding a changed product may lose it
+            for stored in self.collection.find({"product_ids": {"$in": touched}}, {"user_email": 1}):
+                affected.add(stored["user_email"])
+
+        products = [self.catalog.get(product_id) for product_id in upserted_ids]
+        products = [product for product in products if product is not None]
+        if products:
+            # A product sharing nothing with a user scores 0, which only enters short or zero-score lists
+            for stored in self.collection.find(
+                {"$or": [{"min_score": None}, {"min_score": {"$lte": 0}}]}, {"user_email": 1}
+            ):
+                affected.add(stored["user_email"])
+
+            changed = CatalogScorer(products)
+            query = self._sharing_features(changed)
+            projection = {field: 1 for field in SCORING_PREFERENCE_FIELDS}
+            cursor = self.preferences.find(query, projection).batch_size(batch_size) if query else []
+            for chunk in _chunks(cursor, batch_size):
+                candidates = {
+                    preferences["user_email"]: preferences for preferences in chunk
+                    if preferences.get("user_email") not in affected
+                }
+                if not candidates:
+                    continue
+                for stored in self.collection.find(
+                    {"user_email": {"$in": list(candidates)}}, {"user_email": 1, "min_score": 1}
+                ):
+                    threshold = stored.get("min_score")
+                    # Ties can still enter the list through catalog order
+                    if threshold is None or changed.score(candidates[stored["user_email"]]).max() >= threshold:
+                        affected.add(stored["user_email"])
+
+        if not affected:
+            return
+        with self._lock:
+            scorer = self.catalog.scorer()
+            if len(affected) > pool_threshold:
+                self._rescore_on_pool(sorted(affected), scorer)
+                return
+            for user_email in affected:
+                self.refresh_user(user_email, scorer)
+
+    def _rescore_on_pool(self, user_emails: List[str], scorer: CatalogScorer):
+        # The scorer's products and version, so the pool is keyed on the catalog it scores
+        for start in range(0, len(user_emails), POOL_QUERY_SIZE):
+            results = iter_batch_recommendations(
+                self.preferences, scorer.products, limit=self.top_n, pool=self.pool,
+                catalog_key=scorer.version, query={"user_email": {"$in": user_emails[start:start + POOL_QUERY_SIZE]}}
+            )
+            self.save_batch(results)
+
+recommendation_store = RecommendationStore(recommendations_collection, preferences_collection, catalog)
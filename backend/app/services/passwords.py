@@ -0,0 +1,131 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from passlib.context import CryptContext
+
+# bcrypt releases the GIL while hashing, so a thread pool gives real
+# parallelism. The cap bounds how many cores logins can take from the
+# rest of the app; further calls wait in the pool's queue.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# bcrypt cost factor for new hashes; unset keeps passlib's default (12)
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+# Opt-in: re-hash on login when a stored hash uses a different cost
+PASSWORD_REHASH = os.getenv("PASSWORD_REHASH", "false").lower() == "true"
+# Queue waits and run times kept for the percentiles in stats()
+TIMING_WINDOW = 1024
+
+def make_context(rounds: Optional[int] = None, rehash: bool = False) -> CryptContext:
+    settings = {}
+    if rounds is not None:
+        settings["bcrypt__default_rounds"] = rounds
+        if rehash:
+            # passlib only flags hashes outside [min_rounds, max_rounds]
+            settings["bcrypt__min_rounds"] = rounds
+            settings["bcrypt__max_rounds"] = rounds
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", **settings)
+
+_worker_contexts: Dict[Optional[int], CryptContext] = {}
+
+def hash_passwords(passwords: List[str], rounds: Optional[int] = None) -> List[str]:
+    """Hash a batch of passwords; top-level so process pools can run it"""
+    context = _worker_contexts.get(rounds)
+    if context is None:
+        context = _worker_contexts[rounds] = make_context(rounds)
+    return [context.hash(password) for password in passwords]
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded thread pool so hashing never blocks the event
+    loop. workers=0 hashes inline on the caller's thread (the old behaviour,
+    kept for benchmarks).
+    """
+
+    def __init__(self, context: CryptContext, workers: int = PASSWORD_HASH_WORKERS, rehash: bool = False):
+        self.context = context
+        self.workers = workers
+        self.rehash = rehash
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=TIMING_WINDOW)
+        self._runs = deque(maxlen=TIMING_WINDOW)
+        self._submitted = 0
+        self._running = 0
+        self._completed = 0
+        self._rehashed = 0
+
+    def _timed(self, submitted_at: float, function: Callable, *args):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        try:
+            return function(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._waits.append(started - submitted_at)
+                self._runs.append(finished - started)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created on first use, and again after shutdown()
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._executor
+
+    async def _run(self, function: Callable, *args):
+        with self._lock:
+            self._submitted += 1
+        submitted_at = time.perf_counter()
+        if self.workers <= 0:
+            return self._timed(submitted_at, function, *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), self._timed, submitted_at, function, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(matches, new hash to store or None); a new hash only comes back with rehash enabled"""
+        if not self.rehash:
+            return await self._run(self.context.verify, password, hashed_password), None
+        matches, new_hash = await self._run(self.context.verify_and_update, password, hashed_password)
+        if new_hash is not None:
+            with self._lock:
+                self._rehashed += 1
+        return matches, new_hash
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits = np.array(self._waits) * 1000
+            runs = np.array(self._runs) * 1000
+            return {
+                "workers": self.workers,
+                "submitted": self._submitted,
+                "running": self._running,
+                "queued": self._submitted - self._completed - self._running,
+                "completed": self._completed,
+                "rehashed": self._rehashed,
+                "queue_wait_p50_ms": float(np.percentile(waits, 50)) if len(waits) else 0.0,
+                "queue_wait_p99_ms": float(np.percentile(waits, 99)) if len(waits) else 0.0,
+                "queue_wait_max_ms": float(waits.max()) if len(waits) else 0.0,
+                "hash_p50_ms": float(np.percentile(runs, 50)) if len(runs) else 0.0,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+password_hasher = PasswordHasher(
+    make_context(int(BCRYPT_ROUNDS) if BCRYPT_ROUNDS else None, rehash=PASSWORD_REHASH),
+    rehash=PASSWORD_REHASH
+)
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from .cache import TTLCache
+
+# With a directory shared by the workers (e.g. under /dev/shm), invalidating
+# a user in one worker touches a stamp file the others check on every hit.
+USER_CACHE_STAMP_DIR = os.getenv("USER_CACHE_STAMP_DIR")
+
+class PrincipalCache:
+    """
+    Resolved user principals keyed by email, so authenticated requests skip
+    the users lookup. Entries expire after `ttl` seconds; writes to a user
+    must call invalidate().
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30.0, stamp_dir: Optional[str] = None):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.stamp_dir = stamp_dir
+        if stamp_dir:
+            os.makedirs(stamp_dir, exist_ok=True)
+
+    def _stamp_path(self, email: str) -> str:
+        return os.path.join(self.stamp_dir, hashlib.sha1(email.encode()).hexdigest())
+
+    def _invalidated_at(self, email: str) -> float:
+        try:
+            return os.stat(self._stamp_path(email)).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def get(self, email: str) -> Optional[Dict]:
+        entry = self._cache.get(email)
+        if entry is None:
+            return None
+        loaded_at, principal = entry
+        if self.stamp_dir and self._invalidated_at(email) >= loaded_at:
+            self._cache.pop(email)
+            return None
+        # Handlers get their own copy to modify
+        return dict(principal)
+
+    async def resolve(self, email: str, load: Callable[[str], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        """Cached principal, or load(email) on a miss; unknown users are not cached"""
+        principal = self.get(email)
+        if principal is not None:
+            return principal
+        # Taken before the read, so an invalidation racing it is not lost
+        loaded_at = time.time()
+        principal = await load(email)
+        if principal is not None:
+            self._cache.set(email, (loaded_at, dict(principal)))
+        return principal
+
+    def invalidate(self, email: str):
+        self._cache.pop(email)
+        if self.stamp_dir:
+            path = self._stamp_path(email)
+            with open(path, "a"):
+                pass
+            os.utime(path)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict:
+        return {**self._cache.stats(), "shared": bool(self.stamp_dir)}
+
+principal_cache = PrincipalCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "30")),
+    stamp_dir=USER_CACHE_STAMP_DIR
+)
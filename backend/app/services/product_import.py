@@ -0,0 +1,202 @@
+"""
+Bulk product upsert from NDJSON or CSV supplier feeds, as an alternative
+to one POST/PUT /products call per product.
+
+Rows are validated as PerfumeCreate in batches and written with one
+unordered bulk_write of upserts keyed on the product name: new names are
+inserted, existing ones updated in place. After each batch the changed
+products are re-read with one query and handed to the catalog in a
+single apply(), so search, suggest, facet and similarity indexes are
+notified once per batch rather than once per row.
+
+In CSV feeds, `notes` are separated by `|` or `;`, and empty
+`scent_strength`/`season` cells mean no value. Failed rows are reported
+with their line number and do not stop the import. When a name appears
+twice in one batch, the later row wins. An unexpected error stops the
+import; the report then carries it in `error`, with the batches written
+until then.
+
+CLI usage:
+    python -m app.services.product_import feed.ndjson
+    python -m app.services.product_import feed.csv --batch-size 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ..database import mongo
+from ..models import PerfumeCreate
+from ..repositories import ProductRepository, product_repository
+from .catalog import catalog
+from .ingest import FORMATS, ImportReport, ParsedRow, iter_file_chunks, iter_records, validation_message
+from .materialized import recommendation_store
+
+PRODUCT_IMPORT_BATCH_SIZE = int(os.getenv("PRODUCT_IMPORT_BATCH_SIZE", "1000"))
+
+_NOTE_SEPARATOR = re.compile(r"[|;]")
+
+class ProductImportReport(ImportReport):
+    counters = ("inserted", "updated")
+    key = "name"
+
+def _perfume(record: Dict) -> PerfumeCreate:
+    notes = record.get("notes")
+    if isinstance(notes, str):
+        notes = [note.strip() for note in _NOTE_SEPARATOR.split(notes) if note.strip()]
+    return PerfumeCreate(
+        name=record.get("name"),
+        brand=record.get("brand"),
+        category=record.get("category"),
+        notes=notes,
+        price=record.get("price"),
+        size_ml=record.get("size_ml"),
+        description=record.get("description"),
+        scent_strength=record.get("scent_strength") or None,
+        season=record.get("season") or None
+    )
+
+class ProductImporter:
+    def __init__(
+        self,
+        products: ProductRepository,
+        batch_size: int = PRODUCT_IMPORT_BATCH_SIZE,
+        imported_by: Optional[str] = None
+    ):
+        self.products = products
+        self.batch_size = batch_size
+        self.imported_by = imported_by
+        # Ids of every inserted or updated product, for downstream refreshes
+        self.changed_ids: List[str] = []
+        # Rows of the batch being written until its outcome is in the report
+        self._writing: List[tuple] = []
+
+    def _screen(self, batch: List[ParsedRow], report: ProductImportReport) -> List[tuple]:
+        """Valid (line, PerfumeCreate) rows of a batch, one per name"""
+        accepted: Dict[str, tuple] = {}
+        for row in batch:
+            report.rows += 1
+            if row.error:
+                report.fail(row.line, None, row.error)
+                continue
+            try:
+                perfume = _perfume(row.record)
+            except ValidationError as e:
+                report.fail(row.line, row.record.get("name"), validation_message(e))
+                continue
+            previous = accepted.pop(perfume.name, None)
+            if previous is not None:
+                report.fail(previous[0], perfume.name, f"Duplicate name in input, line {row.line} used instead")
+            accepted[perfume.name] = (row.line, perfume)
+        return list(accepted.values())
+
+    async def _write(self, accepted: List[tuple], report: ProductImportReport):
+        self._writing = accepted
+        now = datetime.utcnow()
+        operations = []
+        for _, perfume in accepted:
+            fields = perfume.dict()
+            fields["updated_by"] = self.imported_by
+            fields["updated_at"] = now
+            operations.append(UpdateOne(
+                {"name": perfume.name},
+                {"$set": fields, "$setOnInsert": {"created_by": self.imported_by, "created_at": now}},
+                upsert=True
+            ))
+
+        failed_indexes = set()
+        try:
+            result = await self.products.bulk_write(operations)
+            upserted = result.bulk_api_result.get("upserted", [])
+        except BulkWriteError as e:
+            # Unordered: every other row was still written
+            upserted = e.details.get("upserted", [])
+            for error in e.details.get("writeErrors", []):
+                failed_indexes.add(error["index"])
+                line, perfume = accepted[error["index"]]
+                report.fail(line, perfume.name, error.get("errmsg"))
+        inserted_indexes = {item["index"] for item in upserted}
+        report.inserted += len(inserted_indexes)
+        report.updated += len(accepted) - len(inserted_indexes) - len(failed_indexes)
+        self._writing = []
+
+        names = [perfume.name for index, (_, perfume) in enumerate(accepted) if index not in failed_indexes]
+        if names:
+            changed = await self.products.find_by_names(names)
+            self.changed_ids.extend(str(product["_id"]) for product in changed)
+            # One catalog change, and one round of index updates, per batch
+            await run_in_threadpool(catalog.apply, changed, [])
+
+    async def run(self, rows: AsyncIterator[ParsedRow], progress=None) -> Dict:
+        """Upsert every row; `progress(report)` is called after each written batch"""
+        report = ProductImportReport()
+        batch: List[ParsedRow] = []
+
+        async def flush():
+            accepted = self._screen(batch, report)
+            if accepted:
+                await self._write(accepted, report)
+            if progress:
+                progress(report)
+
+        try:
+            async for row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    await flush()
+                    batch = []
+            if batch:
+                await flush()
+        except Exception as e:
+            report.abort(e, [(line, perfume.name) for line, perfume in self._writing])
+            self._writing = []
+        return report.to_dict()
+
+async def _file_rows(path: str, format: str) -> AsyncIterator[ParsedRow]:
+    with (sys.stdin.buffer if path == "-" else open(path, "rb")) as f:
+        for row in iter_records(iter_file_chunks(f), format):
+            yield row
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk upsert products from NDJSON or CSV")
+    parser.add_argument("input", help="NDJSON or CSV file, or - for stdin")
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="input format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=PRODUCT_IMPORT_BATCH_SIZE)
+    parser.add_argument("--imported-by", default=None, help="recorded as created_by/updated_by")
+    args = parser.parse_args(argv)
+
+    format = args.format or ("csv" if args.input.lower().endswith(".csv") else "ndjson")
+    importer = ProductImporter(product_repository, args.batch_size, args.imported_by)
+
+    def progress(report: ProductImportReport):
+        print(
+            f"{report.rows:,} rows, {report.inserted:,} inserted, {report.updated:,} updated, "
+            f"{report.failed:,} failed",
+            file=sys.stderr
+        )
+
+    async def run() -> Dict:
+        try:
+            report = await importer.run(_file_rows(args.input, format), progress)
+            if importer.changed_ids:
+                await run_in_threadpool(recommendation_store.products_changed, importer.changed_ids)
+            return report
+        finally:
+            await mongo.close()
+
+    report = asyncio.run(run())
+    json.dump(report, sys.stdout, indent=2, default=str)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,164 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Dict
-from ..database import db
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Optional, Tuple
+import base64
+import hashlib
+import json
+import os
+import numpy as np
+from ..database import db, preferences_collection, orders_collection
 from ..routes.auth import get_current_active_user
 from collections import Counter
+from .catalog import catalog
+from .batch import BATCH_WORKERS, batch_pool, iter_batch_recommendations, iter_ndjson
+from .materialized import recommendation_store
+from .copurchase import copurchase_model
+from .cache import TTLCache
+from .scoring import (
+    PRICE_RANGES, NOTE_WEIGHT, CATEGORY_WEIGHT, PRICE_WEIGHT,
+    BRAND_WEIGHT, SEASON_WEIGHT, SCENT_STRENGTH_WEIGHT
+)
+
+COPURCHASE_BLEND_WEIGHT = float(os.getenv("COPURCHASE_BLEND_WEIGHT", "2.0"))
+RECOMMENDATION_MODES = ("preferences", "blend")
+SCORING_FIELDS = (
+    "favorite_notes", "preferred_categories", "price_range",
+    "preferred_brands", "seasonal_preference", "scent_strength"
+)
 
 router = APIRouter()
 
+# Results keyed by preference fingerprint, catalog version and limit. Product
+# changes clear it; a preference change yields a new fingerprint.
+recommendation_cache = TTLCache(
+    maxsize=int(os.getenv("RECOMMENDATION_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("RECOMMENDATION_CACHE_TTL", "300"))
+)
+catalog.subscribe(lambda upserted, removed: recommendation_cache.clear())
+
+def preference_fingerprint(preferences: Dict) -> str:
+    """Canonical hash of the fields that affect scoring"""
+    canonical = {}
+    for field in SCORING_FIELDS:
+        value = preferences.get(field)
+        if isinstance(value, (list, tuple, set)):
+            # Only membership matters for list fields
+            value = sorted({json.dumps(item, sort_keys=True, default=str) for item in value})
+        canonical[field] = value
+    encoded = json.dumps(canonical, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+# Paging cursors carry the (score, product id) of the last item served, so
+# the next page is reconstructed by a keyset filter instead of server state.
+def encode_cursor(score: float, product_id: str) -> str:
+    raw = json.dumps([score, product_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, product_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(score), str(product_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid recommendation cursor")
+
+def next_cursor(page: List[Tuple[Dict, float]], limit: int) -> Optional[str]:
+    if limit <= 0 or len(page) < limit:
+        return None
+    product, score = page[-1]
+    return encode_cursor(score, product["_id"])
+
+# Helper function to check admin status
+def check_admin_access(current_user: dict):
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can perform this action"
+        )
+
 class PerfumeRecommender:
     def __init__(self):
         self.products_collection = db.products
         self.preferences_collection = db.preferences
+        self.catalog = catalog
 
     def get_recommendations(self, user_email: str, limit: int = 5) -> List[Dict]:
+        return [product for product, _ in self.get_recommendation_page(user_email, limit)]
+
+    def get_recommendation_page(
+        self, user_email: str, limit: int = 5, cursor: Optional[str] = None
+    ) -> List[Tuple[Dict, float]]:
+        """(product, score) pairs of the first page, or of the page after `cursor`"""
         try:
             # Get user preferences
             user_prefs = self.preferences_collection.find_one({"user_email": user_email})
             if not user_prefs:
                 raise HTTPException(status_code=404, detail="User preferences not found")
 
-            # Get all products
-            products = list(self.products_collection.find())
-            if not products:
+            # Products come from the in-memory catalog snapshot
+            scorer = self.catalog.scorer()
+            if not scorer.size:
                 raise HTTPException(status_code=404, detail="No products found in database")
 
-            # Score each product
-            scored_products = []
-            for product in products:
-                score = self._calculate_score(product, user_prefs)
-                # Convert ObjectId to string before adding to list
-                product["_id"] = str(product["_id"])
-                scored_products.append((score, product))
+            # Ties are ordered by product id, so any worker resumes at the same place
+            after = decode_cursor(cursor) if cursor else None
 
-            # Sort by score using the first element of tuple (the score)
-            scored_products.sort(key=lambda x: x[0], reverse=True)
+            # The scorer's own version, the catalog may have moved on since it was taken
+            key = (preference_fingerprint(user_prefs), scorer.version, limit, after)
+            cached = recommendation_cache.get(key)
+            if cached is None:
+                # Score the whole catalog at once and keep the top matches
+                cached = scorer.recommend_scored(user_prefs, limit, after)
+                recommendation_cache.set(key, cached)
+            return [(dict(product), score) for product, score in cached]
 
-            # Get top recommendations
-            recommendations = [product for _, product in scored_products[:limit]]
-            
+        except HTTPException as he:
+            raise he
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error generating recommendations: {str(e)}"
+            )
+
+    def get_blended_recommendations(
+        self, user_email: str, limit: int = 5, weight: float = COPURCHASE_BLEND_WEIGHT
+    ) -> List[Dict]:
+        """Preference score plus weighted co-purchase affinity with the user's paid orders"""
+        try:
+            user_prefs = self.preferences_collection.find_one({"user_email": user_email})
+            if not user_prefs:
+                raise HTTPException(status_code=404, detail="User preferences not found")
+
+            scorer = self.catalog.scorer()
+            if not scorer.size:
+                raise HTTPException(status_code=404, detail="No products found in database")
+
+            scores = scorer.score(user_prefs)
+            purchased = []
+            for order in orders_collection.find(
+                {"user_email": user_email, "status": "paid"}, {"items.product_id": 1}
+            ):
+                purchased.extend(item.get("product_id") for item in order.get("items", []))
+
+            affinity = copurchase_model.scores_for(purchased)
+            if affinity:
+                boost = np.zeros(scorer.size, dtype=np.float64)
+                for product_id, value in affinity.items():
+                    row = scorer.row_of(product_id)
+                    if row is not None:
+                        boost[row] = value
+                scores = scores + weight * boost
+
+            recommendations = []
+            for index in scorer.top_k(scores, limit, tie_keys=scorer.id_ranks()):
+                product = dict(scorer.products[index])
+                product["_id"] = str(product["_id"])
+                recommendations.append(product)
             return recommendations
 
+        except HTTPException as he:
+            raise he
         except Exception as e:
             raise HTTPException(
                 status_code=500,
@@ -53,41 +173,36 @@ class PerfumeRecommender:
             product_notes = set(product.get("notes", []))
             user_notes = set(preferences.get("favorite_notes", []))
             common_notes = product_notes & user_notes
-            score += len(common_notes) * 2
+            score += len(common_notes) * NOTE_WEIGHT
 
             # Category matching
             if product.get("category") in preferences.get("preferred_categories", []):
-                score += 1.5
+                score += CATEGORY_WEIGHT
 
             # Price range matching
-            price_ranges = {
-                "low-range": (0, 200000),
-                "mid-range": (200001, 500000),
-                "luxury": (500001, float('inf'))
-            }
             user_range = preferences.get("price_range")
-            if user_range in price_ranges:
-                min_price, max_price = price_ranges[user_range]
+            if user_range in PRICE_RANGES:
+                min_price, max_price = PRICE_RANGES[user_range]
                 product_price = product.get("price", 0)
                 if min_price <= product_price <= max_price:
-                    score += 1
+                    score += PRICE_WEIGHT
 
             # Brand preference
             if "preferred_brands" in preferences and \
                product.get("brand") in preferences["preferred_brands"]:
-                score += 1
+                score += BRAND_WEIGHT
 
             # Season matching
             if (preferences.get("seasonal_preference") and 
                 product.get("season") and 
                 preferences["seasonal_preference"] == product["season"]):
-                score += 0.5
+                score += SEASON_WEIGHT
 
             # Scent strength matching
             if (preferences.get("scent_strength") and 
                 product.get("scent_strength") and 
                 preferences["scent_strength"] == product["scent_strength"]):
-                score += 0.5
+                score += SCENT_STRENGTH_WEIGHT
 
             return score
             
@@ -97,20 +212,91 @@ class PerfumeRecommender:
 
 @router.get("/recommendations", response_model=List[Dict])
 async def get_recommendations(
+    response: Response,
+    background_tasks: BackgroundTasks,
     current_user: Dict = Depends(get_current_active_user),
-    limit: int = 2
+    limit: int = Query(2, ge=1, le=50),
+    mode: str = "preferences",
+    cursor: Optional[str] = None
 ):
+    if mode not in RECOMMENDATION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown mode, expected one of: {', '.join(RECOMMENDATION_MODES)}"
+        )
+    if cursor and mode == "blend":
+        raise HTTPException(status_code=400, detail="Blended recommendations are not paged, drop the cursor")
+
+    # Scoring is CPU-bound and the services use the synchronous client, so
+    # both run in the threadpool instead of on the event loop
     try:
-        recommender = PerfumeRecommender()
-        recommendations = recommender.get_recommendations(
-            user_email=current_user["email"],
-            limit=limit
+        if mode == "blend":
+            return await run_in_threadpool(
+                PerfumeRecommender().get_blended_recommendations, current_user["email"], limit
+            )
+
+        # Precomputed top-N: a single indexed lookup
+        page = None if cursor else await run_in_threadpool(
+            recommendation_store.lookup, current_user["email"], limit
         )
-        return recommendations
+        if page is None:
+            recommender = PerfumeRecommender()
+            page = await run_in_threadpool(
+                recommender.get_recommendation_page,
+                user_email=current_user["email"],
+                limit=limit,
+                cursor=cursor
+            )
+            if not cursor and limit <= recommendation_store.top_n:
+                background_tasks.add_task(recommendation_store.refresh_user, current_user["email"])
+
+        # "Show more" passes this back as ?cursor= to get the following page
+        cursor_out = next_cursor(page, limit)
+        if cursor_out:
+            response.headers["X-Next-Cursor"] = cursor_out
+        return [product for product, _ in page]
     except HTTPException as he:
         raise he
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing recommendation request: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+# Admin only: top-N for every user with preferences, streamed as NDJSON
+@router.get("/recommendations/batch")
+async def get_batch_recommendations(
+    current_user: Dict = Depends(get_current_active_user),
+    limit: int = 10,
+    workers: Optional[int] = Query(None, ge=1, le=BATCH_WORKERS)
+):
+    check_admin_access(current_user)
+
+    try:
+        # Version read first: a pool keyed on it never holds an older catalog
+        await run_in_threadpool(catalog.ensure_fresh)
+        version = catalog.version
+        products = await run_in_threadpool(catalog.products)
+        if not products:
+            raise HTTPException(status_code=404, detail="No products found in database")
+
+        results = iter_batch_recommendations(
+            preferences_collection, products, limit=limit, workers=workers,
+            pool=batch_pool, catalog_key=version
+        )
+        return StreamingResponse(iter_ndjson(results), media_type="application/x-ndjson")
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error generating batch recommendations: {str(e)}"
+        )
+
+# Admin only: recommendation result cache counters
+@router.get("/recommendations/cache/stats")
+async def get_recommendation_cache_stats(
+    current_user: Dict = Depends(get_current_active_user)
+):
+    check_admin_access(current_user)
+    return recommendation_cache.stats()
@@ -0,0 +1,330 @@
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+
+# Score weights shared by the vectorized engine and PerfumeRecommender._calculate_score
+NOTE_WEIGHT = 2.0
+CATEGORY_WEIGHT = 1.5
+PRICE_WEIGHT = 1.0
+BRAND_WEIGHT = 1.0
+SEASON_WEIGHT = 0.5
+SCENT_STRENGTH_WEIGHT = 0.5
+
+PRICE_RANGES = {
+    "low-range": (0, 200000),
+    "mid-range": (200001, 500000),
+    "luxury": (500001, float('inf'))
+}
+PRICE_RANGE_NAMES = list(PRICE_RANGES)
+
+def _as_list(value) -> list:
+    # Optional preference fields may be stored as null
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+def _intern(vocab: Dict, value) -> int:
+    try:
+        return vocab.setdefault(value, len(vocab))
+    except TypeError:
+        return -1
+
+def _lookup(vocab: Dict, values) -> List[int]:
+    ids = []
+    for value in values:
+        try:
+            if value in vocab:
+                ids.append(vocab[value])
+        except TypeError:
+            continue
+    return ids
+
+def price_bucket(price) -> int:
+    """Index into PRICE_RANGE_NAMES for a product price, or -1 if no range matches"""
+    for bucket, (min_price, max_price) in enumerate(PRICE_RANGES.values()):
+        try:
+            if min_price <= price <= max_price:
+                return bucket
+        except TypeError:
+            return -1
+    return -1
+
+def _postings(keys: np.ndarray, rows: Optional[np.ndarray], vocab_size: int):
+    """CSR-style postings (offsets, rows) for keys in [0, vocab_size); -1 keys are skipped"""
+    if rows is None:
+        rows = np.arange(keys.size, dtype=np.int64)
+    present = keys >= 0
+    keys, rows = keys[present], rows[present]
+    order = np.lexsort((rows, keys))
+    offsets = np.zeros(vocab_size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=vocab_size), out=offsets[1:])
+    return offsets, rows[order]
+
+def _gather(postings, ids: List[int]) -> List[np.ndarray]:
+    offsets, rows = postings
+    return [rows[offsets[i]:offsets[i + 1]] for i in ids]
+
+class CatalogScorer:
+    """
+    Encodes a product catalog into arrays once and scores every product
+    against a preference document with a handful of vectorized operations.
+
+    Scores match PerfumeRecommender._calculate_score. Rankings are by
+    descending score, then ascending product id, so every worker orders
+    ties the same way whatever its row layout.
+    """
+
+    def __init__(self, products: List[Dict], version: int = 0):
+        self.products = products
+        # Catalog version the products were taken from, for callers that cache results
+        self.version = version
+        self.size = len(products)
+        self._row_ids: Optional[Dict[str, int]] = None
+        self._id_ranks: Optional[np.ndarray] = None
+        self._sorted_ids: Optional[np.ndarray] = None
+
+        self.note_vocab: Dict = {}
+        self.category_vocab: Dict = {}
+        self.brand_vocab: Dict = {}
+        self.season_vocab: Dict = {}
+        self.strength_vocab: Dict = {}
+
+        note_rows: List[int] = []
+        note_cols: List[int] = []
+        categories = np.full(self.size, -1, dtype=np.int32)
+        brands = np.full(self.size, -1, dtype=np.int32)
+        seasons = np.full(self.size, -1, dtype=np.int32)
+        strengths = np.full(self.size, -1, dtype=np.int32)
+        price_buckets = np.full(self.size, -1, dtype=np.int8)
+
+        for row, product in enumerate(products):
+            # Multi-hot notes stored as (row, note id) pairs, one per distinct note
+            note_ids = {_intern(self.note_vocab, note) for note in _as_list(product.get("notes"))}
+            note_ids.discard(-1)
+            note_rows.extend([row] * len(note_ids))
+            note_cols.extend(note_ids)
+
+            if product.get("category") is not None:
+                categories[row] = _intern(self.category_vocab, product["category"])
+            if product.get("brand") is not None:
+                brands[row] = _intern(self.brand_vocab, product["brand"])
+            if product.get("season"):
+                seasons[row] = _intern(self.season_vocab, product["season"])
+            if product.get("scent_strength"):
+                strengths[row] = _intern(self.strength_vocab, product["scent_strength"])
+            price_buckets[row] = price_bucket(product.get("price", 0))
+
+        self.note_rows = np.asarray(note_rows, dtype=np.int64)
+        self.note_cols = np.asarray(note_cols, dtype=np.int64)
+        self.categories = categories
+        self.brands = brands
+        self.seasons = seasons
+        self.strengths = strengths
+        self.price_buckets = price_buckets
+
+        # Inverted indexes: attribute value id -> ascending product rows
+        self.note_postings = _postings(self.note_cols, self.note_rows, len(self.note_vocab))
+        self.category_postings = _postings(categories, None, len(self.category_vocab))
+        self.brand_postings = _postings(brands, None, len(self.brand_vocab))
+        self.season_postings = _postings(seasons, None, len(self.season_vocab))
+        self.strength_postings = _postings(strengths, None, len(self.strength_vocab))
+
+    def product_id(self, row: int) -> str:
+        return str(self.products[row]["_id"])
+
+    def row_of(self, product_id: str) -> Optional[int]:
+        if self._row_ids is None:
+            self._row_ids = {str(product["_id"]): row for row, product in enumerate(self.products)}
+        return self._row_ids.get(product_id)
+
+    def _id_index(self):
+        if self._id_ranks is None:
+            ids = np.array([str(product["_id"]) for product in self.products], dtype=str)
+            order = np.argsort(ids, kind="stable")
+            ranks = np.empty(self.size, dtype=np.int64)
+            ranks[order] = np.arange(self.size)
+            self._sorted_ids, self._id_ranks = ids[order], ranks
+
+    def id_ranks(self) -> np.ndarray:
+        """Position of each row's product id in ascending id order, the tie-break of every ranking"""
+        self._id_index()
+        return self._id_ranks
+
+    def ids_through(self, product_id: str) -> int:
+        """How many product ids sort at or before `product_id`, which need not exist any more"""
+        self._id_index()
+        return int(np.searchsorted(self._sorted_ids, product_id, side="right"))
+
+    @staticmethod
+    def _matches(column: np.ndarray, vocab_size: int, ids: List[int]) -> np.ndarray:
+        # Lookup table with a trailing False slot so that -1 (missing) never matches
+        table = np.zeros(vocab_size + 1, dtype=bool)
+        table[ids] = True
+        return table[column]
+
+    def _preference_ids(self, preferences: Dict) -> Dict[str, List[int]]:
+        season = preferences.get("seasonal_preference")
+        strength = preferences.get("scent_strength")
+        return {
+            "notes": _lookup(self.note_vocab, set(_as_list(preferences.get("favorite_notes")))),
+            "categories": _lookup(self.category_vocab, _as_list(preferences.get("preferred_categories"))),
+            "brands": _lookup(self.brand_vocab, _as_list(preferences.get("preferred_brands"))),
+            "season": _lookup(self.season_vocab, [season]) if season else [],
+            "strength": _lookup(self.strength_vocab, [strength]) if strength else [],
+        }
+
+    def candidates(self, preferences: Dict) -> np.ndarray:
+        """
+        Rows sharing at least one note, category, brand, season or scent
+        strength with the preferences: the union of the matching postings.
+        """
+        ids = self._preference_ids(preferences)
+        parts = (
+            _gather(self.note_postings, ids["notes"])
+            + _gather(self.category_postings, ids["categories"])
+            + _gather(self.brand_postings, ids["brands"])
+            + _gather(self.season_postings, ids["season"])
+            + _gather(self.strength_postings, ids["strength"])
+        )
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        if sum(part.size for part in parts) > self.size // 8:
+            # Broad profiles: marking a mask is cheaper than sorting the postings
+            mask = np.zeros(self.size, dtype=bool)
+            for part in parts:
+                mask[part] = True
+            return np.flatnonzero(mask)
+        rows = np.sort(np.concatenate(parts))
+        return rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+
+    def score(self, preferences: Dict, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Score the given rows (ascending), or every product in catalog order.
+        The result is aligned with rows.
+        """
+        size = self.size if rows is None else rows.size
+        scores = np.zeros(size, dtype=np.float64)
+        if not size:
+            return scores
+        ids = self._preference_ids(preferences)
+
+        def column(values: np.ndarray) -> np.ndarray:
+            return values if rows is None else values[rows]
+
+        if ids["notes"] and self.note_rows.size:
+            if rows is None:
+                wanted = np.zeros(len(self.note_vocab), dtype=np.float64)
+                wanted[ids["notes"]] = 1.0
+                common = np.bincount(self.note_rows, weights=wanted[self.note_cols], minlength=self.size)
+            else:
+                # Count note hits straight from the postings of the wanted notes
+                hits = _gather(self.note_postings, ids["notes"])
+                common = np.zeros(size, dtype=np.float64)
+                if hits:
+                    hits = np.concatenate(hits)
+                    positions = np.searchsorted(rows, hits).clip(max=size - 1)
+                    positions = positions[rows[positions] == hits]
+                    common = np.bincount(positions, minlength=size).astype(np.float64)
+            scores += NOTE_WEIGHT * common
+
+        if ids["categories"]:
+            scores += CATEGORY_WEIGHT * self._matches(column(self.categories), len(self.category_vocab), ids["categories"])
+
+        user_range = preferences.get("price_range")
+        if user_range in PRICE_RANGES:
+            scores += PRICE_WEIGHT * (column(self.price_buckets) == PRICE_RANGE_NAMES.index(user_range))
+
+        if ids["brands"]:
+            scores += BRAND_WEIGHT * self._matches(column(self.brands), len(self.brand_vocab), ids["brands"])
+
+        if ids["season"]:
+            scores += SEASON_WEIGHT * (column(self.seasons) == ids["season"][0])
+
+        if ids["strength"]:
+            scores += SCENT_STRENGTH_WEIGHT * (column(self.strengths) == ids["strength"][0])
+
+        return scores
+
+    @staticmethod
+    def top_k(
+        scores: np.ndarray, k: int, rows: Optional[np.ndarray] = None, tie_keys: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Rows of the k best scores, best first, ties ordered by ascending
+        tie_keys (default: the rows, i.e. catalog order). Only the selected
+        slice is sorted. scores and tie_keys are aligned with rows, which
+        must be ascending (default: all rows).
+        """
+        if rows is None:
+            rows = np.arange(scores.size)
+        if tie_keys is None:
+            tie_keys = rows
+        if k <= 0 or not scores.size:
+            return np.empty(0, dtype=np.intp)
+
+        if k < scores.size:
+            threshold = np.partition(scores, scores.size - k)[scores.size - k]
+            above = np.flatnonzero(scores > threshold)
+            ties = np.flatnonzero(scores == threshold)
+            ties = ties[np.argsort(tie_keys[ties], kind="stable")[:k - above.size]]
+            selected = np.concatenate((above, ties))
+        else:
+            selected = np.arange(scores.size)
+
+        order = np.lexsort((tie_keys[selected], -scores[selected]))
+        return rows[selected[order]]
+
+    def rank(self, preferences: Dict, limit: int) -> np.ndarray:
+        """
+        Rows of the top `limit` products. Only the candidate rows from the
+        inverted indexes are scored; the full scan is used when there are
+        too few candidates, when they cover more than half the catalog
+        (scoring them twice would cost more than one full pass), or when a
+        non-candidate could still tie or beat the last pick (they can only
+        earn the price range bonus).
+        """
+        candidates = self.candidates(preferences)
+        if limit > 0 and limit <= candidates.size <= self.size // 2:
+            scores = self.score(preferences, candidates)
+            top = self.top_k(scores, limit, candidates, self.id_ranks()[candidates])
+            outside_best = PRICE_WEIGHT if preferences.get("price_range") in PRICE_RANGES else 0.0
+            last_score = scores[np.searchsorted(candidates, top[-1])]
+            if last_score > outside_best:
+                return top
+        return self.top_k(self.score(preferences), limit, tie_keys=self.id_ranks())
+
+    def rank_after(self, preferences: Dict, limit: int, after_score: float, after_id: str) -> np.ndarray:
+        """
+        Next page of rows after (after_score, after_id) in ranking order; the
+        product need not exist any more. Each page is a linear filter plus a
+        partial selection, so the cost per page stays flat however deep the
+        client scrolls.
+        """
+        scores = self.score(preferences)
+        ranks = self.id_ranks()
+        after = (scores < after_score) | ((scores == after_score) & (ranks >= self.ids_through(after_id)))
+        eligible = np.flatnonzero(after)
+        return self.top_k(scores[eligible], limit, eligible, ranks[eligible])
+
+    def ranked(self, preferences: Dict, limit: int, after: Optional[Tuple[float, str]] = None) -> List[Tuple[int, float]]:
+        """(row, score) pairs of the top `limit` products, best first, optionally after a previous page"""
+        rows = self.rank(preferences, limit) if after is None else self.rank_after(preferences, limit, *after)
+        if not rows.size:
+            return []
+        ordered = np.sort(rows)
+        scores = self.score(preferences, ordered)[np.searchsorted(ordered, rows)]
+        return list(zip(rows.tolist(), scores.tolist()))
+
+    def recommend(self, preferences: Dict, limit: int) -> List[Dict]:
+        return [product for product, _ in self.recommend_scored(preferences, limit)]
+
+    def recommend_scored(
+        self, preferences: Dict, limit: int, after: Optional[Tuple[float, str]] = None
+    ) -> List[Tuple[Dict, float]]:
+        recommendations = []
+        for index, score in self.ranked(preferences, limit, after):
+            product = dict(self.products[index])
+            product["_id"] = str(product["_id"])
+            recommendations.append((product, score))
+        return recommendations
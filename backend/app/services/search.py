@@ -0,0 +1,209 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from .catalog import catalog
+
+# Field weights: a hit in the name counts more than one in the notes
+FIELD_WEIGHTS = {"name": 3.0, "brand": 2.0, "category": 1.5, "notes": 1.0}
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Score multipliers for terms matched by prefix or with a typo
+PREFIX_WEIGHT = 0.7
+FUZZY_WEIGHT = 0.5
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 4
+MAX_EXPANSIONS = 50
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+def fold(text: str) -> str:
+    """Case- and accent-insensitive form: "Eau de Créme" -> "eau de creme" """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def tokenize(text) -> List[str]:
+    if text is None:
+        return []
+    if isinstance(text, (list, tuple)):
+        return [token for item in text for token in tokenize(item)]
+    return _TOKEN.findall(fold(str(text)))
+
+def _deletes(term: str) -> Set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+class SearchIndex:
+    """
+    Inverted index over product name, brand, category and notes.
+
+    Documents are ranked with BM25 over field-weighted term frequencies.
+    Every query term must match, either exactly, as a prefix of an indexed
+    term, or within one edit; the typo lookup uses a symmetric-delete table,
+    so its cost does not grow with the vocabulary. Query time depends on the
+    number of matching products, not the catalog size.
+    """
+
+    def __init__(self, fields: Dict[str, float] = FIELD_WEIGHTS):
+        self.fields = fields
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._lengths: Dict[str, float] = {}
+        self._doc_terms: Dict[str, Set[str]] = {}
+        self._total_length = 0.0
+        # Sorted vocabulary for prefix ranges, delete variants for typos
+        self._vocabulary: List[str] = []
+        self._variants: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+
+    def _add_term(self, term: str):
+        bisect.insort(self._vocabulary, term)
+        for variant in _deletes(term) if len(term) >= MIN_FUZZY_LENGTH else ():
+            self._variants.setdefault(variant, set()).add(term)
+
+    def _drop_term(self, term: str):
+        index = bisect.bisect_left(self._vocabulary, term)
+        if index < len(self._vocabulary) and self._vocabulary[index] == term:
+            del self._vocabulary[index]
+        for variant in _deletes(term) if len(term) >= MIN_FUZZY_LENGTH else ():
+            terms = self._variants.get(variant)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._variants[variant]
+
+    def add(self, product: Dict):
+        product_id = str(product["_id"])
+        frequencies: Dict[str, float] = {}
+        length = 0.0
+        for field, weight in self.fields.items():
+            for token in tokenize(product.get(field)):
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+                length += weight
+        with self._lock:
+            self.remove(product_id)
+            for term, frequency in frequencies.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._add_term(term)
+                postings[product_id] = frequency
+            self._doc_terms[product_id] = set(frequencies)
+            self._lengths[product_id] = length
+            self._total_length += length
+
+    def remove(self, product_id: str):
+        with self._lock:
+            terms = self._doc_terms.pop(product_id, None)
+            if terms is None:
+                return
+            self._total_length -= self._lengths.pop(product_id)
+            for term in terms:
+                postings = self._postings[term]
+                del postings[product_id]
+                if not postings:
+                    del self._postings[term]
+                    self._drop_term(term)
+
+    def clear(self):
+        with self._lock:
+            self._postings = {}
+            self._lengths = {}
+            self._doc_terms = {}
+            self._total_length = 0.0
+            self._vocabulary = []
+            self._variants = {}
+
+    def on_catalog_change(self, upserted: List[Dict], removed: Optional[List[str]]):
+        with self._lock:
+            if removed is None:
+                self.clear()
+            for product_id in removed or []:
+                self.remove(product_id)
+            for product in upserted:
+                self.add(product)
+
+    def _expand(self, token: str) -> Dict[str, float]:
+        """Indexed terms a query token can match, with their score multipliers"""
+        expansions: Dict[str, float] = {}
+        if token in self._postings:
+            expansions[token] = 1.0
+        if len(token) >= MIN_PREFIX_LENGTH:
+            start = bisect.bisect_left(self._vocabulary, token)
+            for term in self._vocabulary[start:start + MAX_EXPANSIONS]:
+                if not term.startswith(token):
+                    break
+                expansions.setdefault(term, PREFIX_WEIGHT)
+        if len(token) >= MIN_FUZZY_LENGTH:
+            candidates = set(self._variants.get(token, ()))
+            for variant in _deletes(token):
+                if variant in self._postings:
+                    candidates.add(variant)
+                candidates |= self._variants.get(variant, set())
+            for term in candidates:
+                expansions.setdefault(term, FUZZY_WEIGHT)
+        return expansions
+
+    def search(self, query: str, limit: int = 10, skip: int = 0) -> List[Tuple[str, float]]:
+        """(product_id, score) pairs, best first"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        with self._lock:
+            count = len(self._lengths)
+            if not count:
+                return []
+            average_length = self._total_length / count
+            expanded = []
+            for token in tokens:
+                expansions = self._expand(token)
+                if not expansions:
+                    return []
+                size = sum(len(self._postings[term]) for term in expansions)
+                expanded.append((size, expansions))
+            # Rarest term first: later terms only score the surviving candidates
+            expanded.sort(key=lambda item: item[0])
+
+            scores: Optional[Dict[str, float]] = None
+            for size, expansions in expanded:
+                # One idf per query token, from all the terms it expands to,
+                # so a rare completion cannot outrank the exact word
+                frequency = min(size, count)
+                token_idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+                token_scores: Dict[str, float] = {}
+                for term, multiplier in expansions.items():
+                    postings = self._postings[term]
+                    idf = multiplier * token_idf
+                    if scores is None or size <= len(scores):
+                        matches = postings.items()
+                    else:
+                        matches = ((product_id, postings[product_id]) for product_id in scores if product_id in postings)
+                    for product_id, frequency in matches:
+                        norm = K1 * (1 - B + B * self._lengths[product_id] / average_length)
+                        score = idf * frequency * (K1 + 1) / (frequency + norm)
+                        if score > token_scores.get(product_id, 0.0):
+                            token_scores[product_id] = score
+                # Every query term has to match
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        product_id: score + token_scores[product_id]
+                        for product_id, score in scores.items() if product_id in token_scores
+                    }
+                if not scores:
+                    return []
+        key = lambda item: (-item[1], item[0])
+        if limit:
+            return heapq.nsmallest(skip + limit, scores.items(), key=key)[skip:]
+        return sorted(scores.items(), key=key)[skip:]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"documents": len(self._lengths), "terms": len(self._postings)}
+
+search_index = SearchIndex()
+catalog.subscribe(search_index.on_catalog_change)
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+from .catalog import catalog
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+_PRIME = (1 << 31) - 1
+
+def _note_hash(note) -> int:
+    digest = hashlib.blake2b(str(note).strip().casefold().encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % _PRIME
+
+class SimilarityIndex:
+    """
+    MinHash signatures over product notes with LSH banding.
+
+    Products whose signatures agree on every row of at least one band share
+    a bucket; lookups only compare against products in the same buckets and
+    rank them by the fraction of matching signature slots, an estimate of
+    the Jaccard similarity of their note sets.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERMUTATIONS, bands: int = LSH_BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        self._lock = threading.RLock()
+
+    def signature(self, notes: Iterable) -> Optional[np.ndarray]:
+        try:
+            hashes = np.fromiter({_note_hash(note) for note in notes}, dtype=np.uint64)
+        except TypeError:
+            return None
+        if not hashes.size:
+            return None
+        # (a * x + b) mod p for every permutation and note; values stay below 2^62
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, product_id: str, notes: Iterable):
+        with self._lock:
+            self.remove(product_id)
+            signature = self.signature(notes or [])
+            if signature is None:
+                return
+            self._signatures[product_id] = signature
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, set()).add(product_id)
+
+    def remove(self, product_id: str):
+        with self._lock:
+            signature = self._signatures.pop(product_id, None)
+            if signature is None:
+                return
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket is not None:
+                    bucket.discard(product_id)
+                    if not bucket:
+                        del self._buckets[band][key]
+
+    def clear(self):
+        with self._lock:
+            self._signatures = {}
+            self._buckets = [{} for _ in range(self.bands)]
+
+    def on_catalog_change(self, upserted: List[Dict], removed: Optional[List[str]]):
+        with self._lock:
+            if removed is None:
+                self.clear()
+            for product_id in removed or []:
+                self.remove(product_id)
+            for product in upserted:
+                self.add(str(product["_id"]), product.get("notes"))
+
+    def similar(self, product_id: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """(product_id, estimated Jaccard) pairs, most similar first"""
+        with self._lock:
+            signature = self._signatures.get(product_id)
+            if signature is None:
+                return []
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates |= self._buckets[band].get(key, set())
+            candidates.discard(product_id)
+            scored = [
+                (candidate, float(np.count_nonzero(self._signatures[candidate] == signature)) / self.num_perm)
+                for candidate in candidates
+            ]
+        # Ties by product id, so every worker returns the same list
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+similarity_index = SimilarityIndex()
+catalog.subscribe(similarity_index.on_catalog_change)
@@ -0,0 +1,176 @@
+import bisect
+import heapq
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .cache import TTLCache
+from .catalog import catalog
+from .copurchase import copurchase_model
+from .search import fold
+
+SUGGEST_CACHE_SIZE = int(os.getenv("SUGGEST_CACHE_SIZE", "4096"))
+# Product popularity comes from paid orders, which change without the catalog
+SUGGEST_CACHE_TTL = float(os.getenv("SUGGEST_CACHE_TTL", "60"))
+
+_WORD = re.compile(r"[^\W_]")
+
+def _normalize(text) -> str:
+    return " ".join(fold(str(text)).split())
+
+# (kind, id): ("product", product_id), ("brand", folded brand) or ("note", folded note)
+EntryKey = Tuple[str, str]
+
+class SuggestIndex:
+    """
+    Prefix index over product names, brands and notes for autocomplete.
+
+    Every phrase is stored in one sorted array once per word it contains,
+    keyed by the folded text from that word to the end, so "chan" finds
+    "Bleu de Chanel" as well as "Chanel". A prefix lookup is a bisect plus
+    a scan of the matching run. Phrases the query starts are ranked first,
+    then by popularity: paid orders for products, number of products for
+    brands and notes. Ranked results are cached per query until the
+    catalog changes.
+    """
+
+    def __init__(self, cache_size: int = SUGGEST_CACHE_SIZE, cache_ttl: float = SUGGEST_CACHE_TTL):
+        # Sorted (folded suffix, offset, entry key) triples
+        self._keys: List[Tuple[str, int, EntryKey]] = []
+        self._texts: Dict[EntryKey, str] = {}
+        # Products carrying each brand or note
+        self._counts: Dict[EntryKey, int] = {}
+        self._product_entries: Dict[str, List[EntryKey]] = {}
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _entry_keys(key: EntryKey, text: str) -> List[Tuple[str, int, EntryKey]]:
+        folded = _normalize(text)
+        starts = [match.start() for match in _WORD.finditer(folded)
+                  if match.start() == 0 or not _WORD.match(folded[match.start() - 1])]
+        return [(folded[start:], start, key) for start in starts]
+
+    def _product_phrases(self, product: Dict) -> List[Tuple[EntryKey, str]]:
+        phrases = []
+        if product.get("name"):
+            phrases.append((("product", str(product["_id"])), str(product["name"]).strip()))
+        if product.get("brand"):
+            phrases.append((("brand", _normalize(product["brand"])), str(product["brand"]).strip()))
+        for note in dict.fromkeys(product.get("notes") or []):
+            if note:
+                phrases.append((("note", _normalize(note)), str(note).strip()))
+        return phrases
+
+    def _insert(self, key: EntryKey, text: str):
+        for item in self._entry_keys(key, text):
+            bisect.insort(self._keys, item)
+
+    def _delete(self, key: EntryKey):
+        for item in self._entry_keys(key, self._texts.pop(key)):
+            index = bisect.bisect_left(self._keys, item)
+            if index < len(self._keys) and self._keys[index] == item:
+                del self._keys[index]
+
+    def _attach(self, product: Dict, bulk: bool = False):
+        entries = []
+        for key, text in self._product_phrases(product):
+            if key in entries:
+                continue
+            entries.append(key)
+            self._counts[key] = self._counts.get(key, 0) + 1
+            if key not in self._texts:
+                self._texts[key] = text
+                if bulk:
+                    self._keys.extend(self._entry_keys(key, text))
+                else:
+                    self._insert(key, text)
+        self._product_entries[str(product["_id"])] = entries
+
+    def add(self, product: Dict):
+        with self._lock:
+            self.remove(str(product["_id"]))
+            self._attach(product)
+
+    def remove(self, product_id: str):
+        with self._lock:
+            for key in self._product_entries.pop(product_id, []):
+                self._counts[key] -= 1
+                if not self._counts[key]:
+                    del self._counts[key]
+                    self._delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._keys = []
+            self._texts = {}
+            self._counts = {}
+            self._product_entries = {}
+
+    def load(self, products: List[Dict]):
+        """Bulk build: one sort instead of an insort per phrase"""
+        with self._lock:
+            self.clear()
+            for product in products:
+                self._attach(product, bulk=True)
+            self._keys.sort()
+
+    def on_catalog_change(self, upserted: List[Dict], removed: Optional[List[str]]):
+        with self._lock:
+            if removed is None:
+                self.load(upserted)
+            else:
+                for product_id in removed:
+                    self.remove(product_id)
+                for product in upserted:
+                    self.add(product)
+            self._cache.clear()
+
+    def _popularity(self, key: EntryKey) -> int:
+        if key[0] == "product":
+            # Built in the background at startup; until then products rank by length
+            return copurchase_model.item_counts.get(key[1], 0) if copurchase_model.built else 0
+        return self._counts.get(key, 0)
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict]:
+        prefix = _normalize(query)
+        if not prefix or limit <= 0:
+            return []
+        cached = self._cache.get((prefix, limit))
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            # Best offset per phrase: 0 means the phrase starts with the query
+            offsets: Dict[EntryKey, int] = {}
+            index = bisect.bisect_left(self._keys, (prefix,))
+            while index < len(self._keys) and self._keys[index][0].startswith(prefix):
+                _, offset, key = self._keys[index]
+                if offset < offsets.get(key, offset + 1):
+                    offsets[key] = offset
+                index += 1
+            ranked = heapq.nsmallest(
+                limit, offsets.items(),
+                key=lambda item: (item[1] > 0, -self._popularity(item[0]), len(self._texts[item[0]]), item[0])
+            )
+            suggestions = [
+                {
+                    "text": self._texts[key],
+                    "type": key[0],
+                    "product_id": key[1] if key[0] == "product" else None
+                }
+                for key, _ in ranked
+            ]
+            # Under the lock, so a concurrent catalog change cannot be overwritten with stale results
+            self._cache.set((prefix, limit), suggestions)
+        return suggestions
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {"phrases": len(self._texts), "keys": len(self._keys)}
+        stats["cache"] = self._cache.stats()
+        return stats
+
+suggest_index = SuggestIndex()
+catalog.subscribe(suggest_index.on_catalog_change)
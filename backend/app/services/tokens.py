@@ -0,0 +1,62 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from jose import jwt
+
+from .cache import TTLCache
+
+# Tokens without an `exp` claim are re-verified after this many seconds
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+class TokenVerifier:
+    """
+    Signs and verifies access tokens with key material read once, and keeps
+    the claims of recently verified tokens so a client reusing its bearer
+    token skips the HMAC check and JSON decode. Entries expire with the
+    token's own `exp`; invalid tokens are never cached.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = TOKEN_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._keys = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read SECRET_KEY and ALGORITHM; the app's lifespan calls this at startup"""
+        with self._lock:
+            self._keys = (os.getenv("SECRET_KEY"), os.getenv("ALGORITHM"))
+            self._cache.clear()
+
+    def _key_material(self):
+        if self._keys is None:
+            self.load()
+        return self._keys
+
+    def encode(self, claims: Dict) -> str:
+        secret_key, algorithm = self._key_material()
+        return jwt.encode(claims, secret_key, algorithm=algorithm)
+
+    def decode(self, token: str) -> Dict:
+        """The token's claims; raises jose.JWTError like jwt.decode"""
+        # Cached by digest so bearer tokens are not kept in memory
+        digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        cached = self._cache.get(digest)
+        if cached is not None:
+            return dict(cached)
+        secret_key, algorithm = self._key_material()
+        claims = jwt.decode(token, secret_key, algorithms=[algorithm])
+        expires_at = claims.get("exp")
+        ttl = None
+        if isinstance(expires_at, (int, float)):
+            ttl = min(expires_at - time.time(), self._cache.ttl)
+        if ttl is None or ttl > 0:
+            self._cache.set(digest, dict(claims), ttl=ttl)
+        return claims
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+token_verifier = TokenVerifier(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")))
@@ -0,0 +1,258 @@
+"""
+Bulk user import from NDJSON or CSV, as an alternative to one
+/auth/register call per user.
+
+Rows are read in batches. Each batch is validated and checked against
+existing emails with a single $in query. Its passwords are bcrypt-hashed
+in a process pool, and users and missing carts are written with unordered
+bulk_write. At most two batches per hashing process are in flight, so
+memory stays bounded however many rows the input has.
+
+Rows need `email`, `password` and `full_name`; imported users are never
+admins. Failed rows are reported with their line number and do not stop
+the import. An unexpected error (e.g. the database going away) does: the
+report then carries it in `error`, with everything written until then.
+
+The API hashes on import_hashing_pool, one process pool of
+IMPORT_HASH_WORKERS shared by every import request.
+
+CLI usage:
+    python -m app.services.user_import users.ndjson
+    python -m app.services.user_import users.csv --workers 8 --batch-size 1000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from pydantic import ValidationError
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from ..models import UserCreate
+from ..database import mongo
+from ..repositories import CartRepository, UserRepository, cart_repository, empty_cart, user_repository
+from .ingest import FORMATS, ImportReport, ParsedRow, iter_file_chunks, iter_records, validation_message
+from .passwords import BCRYPT_ROUNDS, hash_passwords
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+# Hashing processes shared by all import requests
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", "0")) or os.cpu_count() or 1
+
+class HashingPool:
+    """Spawn process pool for import hashing, created on first use and again after shutdown()"""
+
+    def __init__(self, workers: int = IMPORT_HASH_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+import_hashing_pool = HashingPool()
+
+class UserImportReport(ImportReport):
+    counters = ("inserted", "carts_created")
+    key = "email"
+
+class UserImporter:
+    def __init__(
+        self,
+        users: UserRepository,
+        carts: CartRepository,
+        workers: Optional[int] = None,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        rounds: Optional[int] = int(BCRYPT_ROUNDS) if BCRYPT_ROUNDS else None,
+        executor: Optional[Executor] = None
+    ):
+        """With a shared `executor`, `workers` only bounds this import's batches in flight"""
+        self.users = users
+        self.carts = carts
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.rounds = rounds
+        self.executor = executor
+        # Emails of batches still being hashed, so duplicates across batches
+        # are caught before the first copy reaches the database
+        self._in_flight: Set[str] = set()
+        # Rows of the batch being written until its outcome is in the report
+        self._writing: List[tuple] = []
+
+    async def _screen(self, batch: List[ParsedRow], report: ImportReport) -> List[tuple]:
+        """Valid, not yet registered (line, UserCreate) rows of a batch"""
+        candidates = []
+        for row in batch:
+            report.rows += 1
+            if row.error:
+                report.fail(row.line, None, row.error)
+                continue
+            record = row.record
+            try:
+                user = UserCreate(
+                    email=record.get("email"),
+                    password=record.get("password"),
+                    full_name=record.get("full_name")
+                )
+            except ValidationError as e:
+                report.fail(row.line, record.get("email"), validation_message(e))
+                continue
+            if user.email in self._in_flight:
+                report.fail(row.line, user.email, "Duplicate email in input")
+                continue
+            self._in_flight.add(user.email)
+            candidates.append((row.line, user))
+
+        existing = await self.users.existing_values("email", [user.email for _, user in candidates])
+        accepted = []
+        for line, user in candidates:
+            if user.email in existing:
+                self._in_flight.discard(user.email)
+                report.fail(line, user.email, "Email already registered")
+            else:
+                accepted.append((line, user))
+        return accepted
+
+    async def _write(self, accepted: List[tuple], hashing, report: ImportReport):
+        self._writing = accepted
+        hashed_passwords = await hashing
+        # The UserInDB fields, built directly: rows were validated in _screen
+        # and email validation is the costliest step after hashing
+        documents = [
+            {
+                "email": user.email,
+                "full_name": user.full_name,
+                "hashed_password": hashed_password,
+                "is_admin": False,
+                "created_at": datetime.utcnow()
+            }
+            for (_, user), hashed_password in zip(accepted, hashed_passwords)
+        ]
+        failed_indexes = set()
+        try:
+            await self.users.bulk_write([InsertOne(document) for document in documents])
+        except BulkWriteError as e:
+            # Unordered: every other row was still written
+            for error in e.details.get("writeErrors", []):
+                index = error["index"]
+                failed_indexes.add(index)
+                line, user = accepted[index]
+                message = "Email already registered" if error.get("code") == 11000 else error.get("errmsg")
+                report.fail(line, user.email, message)
+        inserted = [user.email for index, (_, user) in enumerate(accepted) if index not in failed_indexes]
+        report.inserted += len(inserted)
+        self._writing = []
+        self._in_flight.difference_update(user.email for _, user in accepted)
+
+        # Carts can already exist for emails that were registered and deleted
+        if inserted:
+            existing_carts = await self.carts.existing_values("user_email", inserted)
+            missing = [email for email in inserted if email not in existing_carts]
+            if missing:
+                try:
+                    result = await self.carts.bulk_write([InsertOne(empty_cart(email)) for email in missing])
+                    report.carts_created += result.inserted_count
+                except BulkWriteError as e:
+                    # A cart created concurrently is as good as ours
+                    report.carts_created += e.details.get("nInserted", 0)
+
+    async def run(self, rows: AsyncIterator[ParsedRow], progress=None) -> Dict:
+        """Import every row; `progress(report)` is called after each written batch"""
+        report = UserImportReport()
+        loop = asyncio.get_running_loop()
+        executor = self.executor or ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        pending = deque()
+
+        async def flush_one():
+            await self._write(*pending.popleft(), report)
+            if progress:
+                progress(report)
+
+        async def submit(batch: List[ParsedRow]):
+            accepted = await self._screen(batch, report)
+            if accepted:
+                hashing = loop.run_in_executor(
+                    executor, hash_passwords, [user.password for _, user in accepted], self.rounds
+                )
+                pending.append((accepted, hashing))
+            if len(pending) >= self.workers * 2:
+                await flush_one()
+
+        try:
+            batch: List[ParsedRow] = []
+            async for row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    await submit(batch)
+                    batch = []
+            if batch:
+                await submit(batch)
+            while pending:
+                await flush_one()
+        except Exception as e:
+            for _, hashing in pending:
+                hashing.cancel()
+            unwritten = self._writing + [row for accepted, _ in pending for row in accepted]
+            report.abort(e, [(line, user.email) for line, user in unwritten])
+            self._writing = []
+            self._in_flight.clear()
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        return report.to_dict()
+
+async def _file_rows(path: str, format: str) -> AsyncIterator[ParsedRow]:
+    with (sys.stdin.buffer if path == "-" else open(path, "rb")) as f:
+        for row in iter_records(iter_file_chunks(f), format):
+            yield row
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk import users from NDJSON or CSV")
+    parser.add_argument("input", help="NDJSON or CSV file, or - for stdin")
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="input format (default: from the file extension)")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--rounds", type=int, default=None, help="bcrypt cost (default: BCRYPT_ROUNDS)")
+    args = parser.parse_args(argv)
+
+    format = args.format or ("csv" if args.input.lower().endswith(".csv") else "ndjson")
+    importer = UserImporter(user_repository, cart_repository, args.workers, args.batch_size)
+    if args.rounds is not None:
+        importer.rounds = args.rounds
+
+    def progress(report: ImportReport):
+        print(f"{report.rows:,} rows, {report.inserted:,} inserted, {report.failed:,} failed", file=sys.stderr)
+
+    async def run() -> Dict:
+        try:
+            return await importer.run(_file_rows(args.input, format), progress)
+        finally:
+            await mongo.close()
+
+    report = asyncio.run(run())
+    json.dump(report, sys.stdout, indent=2, default=str)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Mixed-load concurrency benchmark: blocking pymongo calls made inside
+coroutines (how the route handlers used to query) versus the async
+repositories in app.repositories.
+
+Needs a reachable MongoDB at MONGODB_URL. It seeds, and finally drops, its
+own database (--database, default perfume_bench).
+
+Each simulated request is one of, weighted:
+  - product lookup by id      50%
+  - product search page       20%
+  - cart read                 20%
+  - cart write                10%
+
+Reports per mode and concurrency level: requests per second, p50/p99
+latency and the worst event-loop stall seen by a 5 ms ticker. The
+ticker stalls show what blocking calls cost every other request.
+
+Usage (from backend/):
+    python -m benchmarks.concurrency_bench --concurrency 1 16 64 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient, MongoClient
+
+from .synthetic import generate_catalog
+
+load_dotenv()
+
+from app.repositories import CartRepository, ProductRepository  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+OPERATIONS = ("product", "search", "cart_read", "cart_write")
+OPERATION_WEIGHTS = (0.5, 0.2, 0.2, 0.1)
+TICK_SECONDS = 0.005
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    return float(np.percentile(samples, percentile)) if samples else 0.0
+
+class BlockingWorkload:
+    """The pre-repository handler code: synchronous calls on the event loop"""
+
+    def __init__(self, db):
+        self.products = db.products
+        self.carts = db.carts
+
+    async def product(self, product_id, user_email):
+        return self.products.find_one({"_id": product_id})
+
+    async def search(self, product_id, user_email):
+        query = {"name": {"$regex": "Perfume 1", "$options": "i"}}
+        return list(self.products.find(query).skip(0).limit(10))
+
+    async def cart_read(self, product_id, user_email):
+        return self.carts.find_one({"user_email": user_email})
+
+    async def cart_write(self, product_id, user_email):
+        return self.carts.update_one(
+            {"user_email": user_email},
+            {"$set": {"updated_at": datetime.utcnow()}}
+        )
+
+class AsyncWorkload:
+    """The same requests through the async repositories"""
+
+    def __init__(self, db):
+        self.products = ProductRepository(db.products)
+        self.carts = CartRepository(db.carts)
+
+    async def product(self, product_id, user_email):
+        return await self.products.get(str(product_id))
+
+    async def search(self, product_id, user_email):
+        query = {"name": {"$regex": "Perfume 1", "$options": "i"}}
+        return await self.products.find(query, skip=0, limit=10)
+
+    async def cart_read(self, product_id, user_email):
+        return await self.carts.get(user_email)
+
+    async def cart_write(self, product_id, user_email):
+        return await self.carts.update_one(
+            {"user_email": user_email},
+            {"$set": {"updated_at": datetime.utcnow()}}
+        )
+
+def seed(db, products: int, users: int, seed_value: int):
+    db.products.drop()
+    db.carts.drop()
+    catalog = generate_catalog(products, seed_value)
+    db.products.insert_many(catalog)
+    db.carts.insert_many([
+        {"user_email": f"user{i}@example.com", "items": [], "total_amount": 0.0,
+         "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+        for i in range(users)
+    ])
+    db.carts.create_index("user_email")
+    return [product["_id"] for product in catalog]
+
+async def run_load(workload, product_ids: List, users: int, concurrency: int,
+                   requests: int, seed_value: int) -> Dict:
+    rng = random.Random(seed_value)
+    plan = [
+        (
+            rng.choices(OPERATIONS, OPERATION_WEIGHTS)[0],
+            rng.choice(product_ids),
+            f"user{rng.randrange(users)}@example.com"
+        )
+        for _ in range(requests)
+    ]
+    latencies: List[float] = []
+    stalls: List[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            stalls.append(time.perf_counter() - started - TICK_SECONDS)
+
+    async def worker():
+        while plan:
+            operation, product_id, user_email = plan.pop()
+            started = time.perf_counter()
+            await getattr(workload, operation)(product_id, user_email)
+            latencies.append(time.perf_counter() - started)
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "requests_per_second": requests / elapsed if elapsed else None,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "max_loop_stall_ms": max(stalls, default=0.0) * 1000,
+    }
+
+async def bench(args) -> List[Dict]:
+    url = os.getenv("MONGODB_URL")
+    sync_client = MongoClient(url)
+    async_client = AsyncMongoClient(url)
+    try:
+        product_ids = seed(sync_client[args.database], args.products, args.users, args.seed)
+        workloads = {
+            "blocking": BlockingWorkload(sync_client[args.database]),
+            "async": AsyncWorkload(async_client[args.database]),
+        }
+        results = []
+        for concurrency in args.concurrency:
+            for mode, workload in workloads.items():
+                # Warm-up so connection setup is not timed
+                await run_load(workload, product_ids, args.users, concurrency, concurrency, args.seed)
+                entry = await run_load(
+                    workload, product_ids, args.users, concurrency, args.requests, args.seed
+                )
+                entry["mode"] = mode
+                results.append(entry)
+                print(
+                    f"{mode:>8} x{concurrency:<4} {entry['requests_per_second']:,.0f} req/s, "
+                    f"p50 {entry['p50_ms']:.2f} ms, p99 {entry['p99_ms']:.2f} ms, "
+                    f"max loop stall {entry['max_loop_stall_ms']:.1f} ms"
+                )
+        return results
+    finally:
+        if not args.keep:
+            sync_client.drop_database(args.database)
+        sync_client.close()
+        await async_client.close()
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark blocking vs async MongoDB access under mixed load")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per mode and concurrency level")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", default=os.getenv("BENCH_DATABASE", "perfume_bench"))
+    parser.add_argument("--keep", action="store_true", help="keep the seeded database afterwards")
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    if not os.getenv("MONGODB_URL"):
+        parser.error("MONGODB_URL must point at a MongoDB server")
+
+    results = asyncio.run(bench(args))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"concurrency-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    settings = {key: value for key, value in vars(args).items() if key != "keep"}
+    with open(output, "w") as f:
+        json.dump({
+            "benchmark": "concurrency",
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "settings": settings,
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
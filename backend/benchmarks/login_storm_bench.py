@@ -0,0 +1,156 @@
+"""
+Login storm benchmark: latency of unauthenticated browsing while many
+clients log in at once, with bcrypt run inline on the event loop (how the
+auth handlers used to hash) versus in the password hashing pool.
+
+Runs the app in-process on the in-memory storage backend, so no MongoDB
+is needed. Each phase runs for --duration seconds:
+  - idle:   browsing only
+  - inline: browsing during a login storm, bcrypt on the event loop
+  - pool:   browsing during a login storm, bcrypt in app.services.passwords
+
+Reports per phase: browse requests per second and p50/p99 latency, logins
+per second, and the password pool's queue-wait p99.
+
+Usage (from backend/):
+    python -m benchmarks.login_storm_bench --logins 32 --browsers 8 --duration 5
+    python -m benchmarks.login_storm_bench --rounds 10 --pool-workers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from .synthetic import generate_catalog
+
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from app.database import db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.routes import auth  # noqa: E402
+from app.services.passwords import PASSWORD_HASH_WORKERS, PasswordHasher, make_context  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+PASSWORD = "benchmark-password"
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    return float(np.percentile(samples, percentile)) if samples else 0.0
+
+def seed(products: int, users: int, rounds: int, seed_value: int) -> List[str]:
+    catalog = generate_catalog(products, seed_value)
+    db.products.insert_many(catalog)
+    # One hash for everyone: seeding stays fast and every login costs the same
+    hashed_password = make_context(rounds).hash(PASSWORD)
+    db.users.insert_many([
+        {"email": f"user{i}@example.com", "full_name": f"User {i}",
+         "hashed_password": hashed_password, "is_admin": False, "created_at": datetime.utcnow()}
+        for i in range(users)
+    ])
+    return [str(product["_id"]) for product in catalog]
+
+async def run_phase(client: httpx.AsyncClient, product_ids: List[str], logins: int,
+                    browsers: int, duration: float, seed_value: int) -> Dict:
+    browse_latencies: List[float] = []
+    login_count = 0
+    deadline = time.perf_counter() + duration
+
+    async def browser(index: int):
+        rng = random.Random(seed_value + index)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(f"/api/products/{rng.choice(product_ids)}")
+            response.raise_for_status()
+            browse_latencies.append(time.perf_counter() - started)
+
+    async def login(index: int):
+        nonlocal login_count
+        while time.perf_counter() < deadline:
+            response = await client.post("/auth/login", json={
+                "email": f"user{index}@example.com", "password": PASSWORD
+            })
+            response.raise_for_status()
+            login_count += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(browser(i) for i in range(browsers)),
+        *(login(i) for i in range(logins))
+    )
+    elapsed = time.perf_counter() - started
+
+    return {
+        "logins_concurrent": logins,
+        "browse_requests_per_second": len(browse_latencies) / elapsed,
+        "browse_p50_ms": _percentile(browse_latencies, 50) * 1000,
+        "browse_p99_ms": _percentile(browse_latencies, 99) * 1000,
+        "logins_per_second": login_count / elapsed,
+    }
+
+async def bench(args) -> List[Dict]:
+    product_ids = seed(args.products, args.logins, args.rounds, args.seed)
+    context = make_context(args.rounds)
+    phases = [("idle", 0, 0), ("inline", args.logins, 0), ("pool", args.logins, args.pool_workers)]
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for phase, logins, workers in phases:
+            # Handlers look the hasher up on the module, so swapping it switches modes
+            hasher = PasswordHasher(context, workers=workers)
+            auth.password_hasher = hasher
+            # Warm-up so first-request setup is not timed
+            await run_phase(client, product_ids, min(logins, 1), 1, 0.2, args.seed)
+            entry = await run_phase(client, product_ids, logins, args.browsers, args.duration, args.seed)
+            entry["phase"] = phase
+            entry["hash_workers"] = workers
+            entry["queue_wait_p99_ms"] = hasher.stats()["queue_wait_p99_ms"]
+            hasher.shutdown()
+            results.append(entry)
+            print(
+                f"{phase:>6}: browse {entry['browse_requests_per_second']:,.0f} req/s, "
+                f"p50 {entry['browse_p50_ms']:.2f} ms, p99 {entry['browse_p99_ms']:.2f} ms; "
+                f"{entry['logins_per_second']:,.1f} logins/s"
+            )
+    return results
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Browse latency during a login storm, inline vs pooled bcrypt")
+    parser.add_argument("--logins", type=int, default=32, help="concurrent clients logging in")
+    parser.add_argument("--browsers", type=int, default=8, help="concurrent clients fetching products")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per phase")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--pool-workers", type=int, default=PASSWORD_HASH_WORKERS)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(bench(args))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"login-storm-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump({
+            "benchmark": "login_storm",
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "settings": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Recommender benchmark on synthetic catalogs, with no live MongoDB.
+
+Reports, per catalog size:
+  - legacy_scores_per_second: PerfumeRecommender._calculate_score in a Python loop
+  - build_seconds: encoding the catalog into a CatalogScorer
+  - scores_per_second / p50_ms / p99_ms: PerfumeRecommender.get_recommendations
+  - peak_memory_mb: tracemalloc peak while loading the catalog and serving
+
+Usage (from backend/):
+    python -m benchmarks.recommender_bench --sizes 1000 10000 100000
+    python -m benchmarks.recommender_bench --sizes 1000000 --requests 50 --baseline benchmarks/results/old.json
+"""
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .synthetic import generate_catalog, generate_preferences
+
+# The app's own in-process store, selected before anything under app is imported
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+from app.memory_store import MemoryDatabase  # noqa: E402
+from app.services.catalog import CatalogSnapshot  # noqa: E402
+from app.services.recommender import PerfumeRecommender  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# The per-product Python loop is only timed on a sample of large catalogs
+LEGACY_SAMPLE = 50000
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    return float(np.percentile(samples, percentile)) if samples else 0.0
+
+def bench_size(size: int, users: int, requests: int, limit: int, seed: int) -> Dict:
+    products = generate_catalog(size, seed)
+    preferences = generate_preferences(users, products, seed + 1)
+    memory = MemoryDatabase("recommender_bench")
+    memory.products.insert_many(products)
+    memory.preferences.insert_many(preferences)
+
+    recommender = PerfumeRecommender()
+    recommender.preferences_collection = memory.preferences
+    recommender.catalog = CatalogSnapshot(memory.products, refresh_interval=0)
+
+    sample = products[:LEGACY_SAMPLE]
+    started = time.perf_counter()
+    for product in sample:
+        recommender._calculate_score(product, preferences[0])
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    recommender.catalog.scorer()
+    build_seconds = time.perf_counter() - started
+
+    # Warm-up call, then timed calls without tracemalloc overhead
+    recommender.get_recommendations(preferences[0]["user_email"], limit)
+    latencies = []
+    for i in range(requests):
+        user_email = preferences[i % users]["user_email"]
+        started = time.perf_counter()
+        recommender.get_recommendations(user_email, limit)
+        latencies.append(time.perf_counter() - started)
+
+    # Separate pass for peak memory of a fresh load plus a few requests
+    recommender.catalog = CatalogSnapshot(memory.products, refresh_interval=0)
+    tracemalloc.start()
+    for i in range(min(requests, 10)):
+        recommender.get_recommendations(preferences[i % users]["user_email"], limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        "catalog_size": size,
+        "requests": requests,
+        "limit": limit,
+        "legacy_scores_per_second": len(sample) / legacy_seconds if legacy_seconds else None,
+        "build_seconds": build_seconds,
+        "scores_per_second": size * requests / total if total else None,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "peak_memory_mb": peak / (1024 * 1024),
+    }
+
+def compare(results: List[Dict], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {entry["catalog_size"]: entry for entry in json.load(f)["results"]}
+    for entry in results:
+        before = baseline.get(entry["catalog_size"])
+        if not before:
+            continue
+        print(
+            f"  {entry['catalog_size']:>9} products: "
+            f"p50 {before['p50_ms']:.2f} -> {entry['p50_ms']:.2f} ms, "
+            f"p99 {before['p99_ms']:.2f} -> {entry['p99_ms']:.2f} ms, "
+            f"peak {before['peak_memory_mb']:.1f} -> {entry['peak_memory_mb']:.1f} MB"
+        )
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark PerfumeRecommender on synthetic catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--users", type=int, default=200, help="synthetic preference profiles")
+    parser.add_argument("--requests", type=int, default=200, help="recommendation calls per size")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        entry = bench_size(size, args.users, args.requests, args.limit, args.seed)
+        results.append(entry)
+        print(
+            f"{size:>9} products: {entry['scores_per_second']:,.0f} scores/s "
+            f"(legacy {entry['legacy_scores_per_second']:,.0f}/s), "
+            f"p50 {entry['p50_ms']:.2f} ms, p99 {entry['p99_ms']:.2f} ms, "
+            f"build {entry['build_seconds']:.2f} s, peak {entry['peak_memory_mb']:.1f} MB"
+        )
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"recommender-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump({
+            "benchmark": "recommender",
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "settings": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        print(f"Compared with {args.baseline}:")
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
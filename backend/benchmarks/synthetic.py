@@ -0,0 +1,63 @@
+import numpy as np
+from bson import ObjectId
+from typing import Dict, List
+
+CATEGORIES = ["floral", "woody", "oriental", "fresh", "citrus", "gourmand", "aquatic", "chypre"]
+SEASONS = ["spring", "summer", "fall", "winter"]
+SCENT_STRENGTHS = ["light", "moderate", "strong"]
+PRICE_RANGES = ["low-range", "mid-range", "luxury"]
+NOTE_VOCABULARY_SIZE = 400
+
+def _zipf_weights(size: int, exponent: float = 1.1) -> np.ndarray:
+    # Note popularity in real catalogs is heavily skewed: rose and musk are everywhere
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+def note_vocabulary(size: int = NOTE_VOCABULARY_SIZE) -> List[str]:
+    return [f"note-{i}" for i in range(size)]
+
+def generate_catalog(size: int, seed: int = 0) -> List[Dict]:
+    """Synthetic product documents shaped like PerfumeCreate plus an _id"""
+    rng = np.random.default_rng(seed)
+    notes = np.array(note_vocabulary())
+    note_weights = _zipf_weights(notes.size)
+    brand_count = max(10, min(2000, size // 50))
+    note_counts = rng.integers(3, 13, size=size)
+    prices = np.round(rng.lognormal(mean=12.6, sigma=0.6, size=size), -3)
+
+    products = []
+    for i in range(size):
+        products.append({
+            "_id": ObjectId(),
+            "name": f"Perfume {i}",
+            "brand": f"brand-{int(rng.zipf(1.5)) % brand_count}",
+            "category": CATEGORIES[int(rng.integers(len(CATEGORIES)))],
+            "notes": rng.choice(notes, size=note_counts[i], replace=False, p=note_weights).tolist(),
+            "price": float(prices[i]),
+            "size_ml": int(rng.choice([30, 50, 75, 100])),
+            "description": "Synthetic benchmark product",
+            "scent_strength": SCENT_STRENGTHS[int(rng.integers(len(SCENT_STRENGTHS)))],
+            "season": SEASONS[int(rng.integers(len(SEASONS)))],
+        })
+    return products
+
+def generate_preferences(count: int, products: List[Dict], seed: int = 1) -> List[Dict]:
+    """Synthetic preference documents, favourite notes follow the catalog distribution"""
+    rng = np.random.default_rng(seed)
+    notes = np.array(note_vocabulary())
+    note_weights = _zipf_weights(notes.size)
+    brands = sorted({product["brand"] for product in products}) or ["brand-0"]
+
+    preferences = []
+    for i in range(count):
+        preferences.append({
+            "_id": ObjectId(),
+            "user_email": f"user{i}@example.com",
+            "favorite_notes": rng.choice(notes, size=int(rng.integers(1, 6)), replace=False, p=note_weights).tolist(),
+            "preferred_categories": rng.choice(CATEGORIES, size=int(rng.integers(1, 3)), replace=False).tolist(),
+            "price_range": PRICE_RANGES[int(rng.integers(len(PRICE_RANGES)))],
+            "preferred_brands": rng.choice(brands, size=min(len(brands), int(rng.integers(0, 3))), replace=False).tolist(),
+            "seasonal_preference": SEASONS[int(rng.integers(len(SEASONS)))] if rng.random() < 0.7 else None,
+            "scent_strength": SCENT_STRENGTHS[int(rng.integers(len(SCENT_STRENGTHS)))] if rng.random() < 0.7 else None,
+        })
+    return preferences
@@ -0,0 +1,49 @@
+import asyncio
+import os
+from pathlib import Path
+
+# Run against the in-memory store, seeded from the shipped dump
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("MEMORY_DUMP_PATH", str(Path(__file__).resolve().parent.parent / "backup" / "perfume_db"))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+import pytest
+
+from app.main import app, lifespan
+
+class Client:
+    """
+    Synchronous client over httpx.ASGITransport. Starlette's TestClient
+    does not work with the pinned httpx 0.28. The app's lifespan and every
+    request run on one event loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return self.loop.run_until_complete(self._client.request(method, url, **kwargs))
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+
+@pytest.fixture
+def client():
+    loop = asyncio.new_event_loop()
+    context = lifespan(app)
+    loop.run_until_complete(context.__aenter__())
+    client = Client(loop)
+    try:
+        yield client
+    finally:
+        app.dependency_overrides.clear()
+        loop.run_until_complete(client._client.aclose())
+        loop.run_until_complete(context.__aexit__(None, None, None))
+        loop.close()
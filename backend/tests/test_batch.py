@@ -0,0 +1,43 @@
+from bson import ObjectId
+
+from app.main import app
+from app.memory_store import MemoryDatabase
+from app.routes.auth import get_current_active_user
+from app.services.batch import BATCH_WORKERS, ScoringPool, iter_batch_recommendations
+
+def _data():
+    db = MemoryDatabase("batch_test")
+    db.preferences.insert_many([
+        {"user_email": f"user{i}@example.com", "favorite_notes": ["rose"], "preferred_categories": ["floral"],
+         "price_range": "mid-range"}
+        for i in range(5)
+    ])
+    products = [
+        {"_id": ObjectId(), "name": f"Perfume {i}", "category": "floral" if i % 2 else "woody",
+         "notes": ["rose"], "price": 300000}
+        for i in range(4)
+    ]
+    return db.preferences, products
+
+def test_pool_is_reused_until_the_catalog_changes():
+    preferences, products = _data()
+    expected = list(iter_batch_recommendations(preferences, products, limit=2, workers=1))
+    pool = ScoringPool(2)
+    try:
+        first = list(iter_batch_recommendations(preferences, products, limit=2, pool=pool, catalog_key=1))
+        executor = pool._executor
+        second = list(iter_batch_recommendations(preferences, products, limit=2, pool=pool, catalog_key=1))
+        assert pool._executor is executor
+        assert first == second == expected
+
+        list(iter_batch_recommendations(preferences, products, limit=2, pool=pool, catalog_key=2))
+        assert pool._executor is not executor
+        assert executor._shutdown_thread
+    finally:
+        pool.shutdown()
+    assert pool._executor is None
+
+def test_workers_is_bounded(client):
+    app.dependency_overrides[get_current_active_user] = lambda: {"email": "admin@example.com", "is_admin": True}
+    for workers in (0, BATCH_WORKERS + 1):
+        assert client.get("/api/recommendations/batch", params={"workers": workers}).status_code == 422
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from bson import ObjectId
+
+from app.memory_store import MemoryDatabase
+from app.services.copurchase import CoPurchaseModel
+
+def _orders(*orders):
+    db = MemoryDatabase("copurchase_test")
+    db.orders.insert_many([
+        {"status": "paid", "items": [{"product_id": product_id} for product_id in items]}
+        for items in orders
+    ])
+    return db.orders
+
+def test_object_id_items_are_counted_once():
+    product_id = ObjectId()
+    model = CoPurchaseModel(_orders([product_id, str(product_id), "B"]))
+    model.rebuild()
+    assert model.item_counts == {str(product_id): 1, "B": 1}
+
+def test_retained_neighbours_keep_exact_counts():
+    model = CoPurchaseModel(
+        _orders(["A", "D"], ["A", "E"], ["A", "F"], ["A", "B"], ["A", "B"], ["A", "F"], ["A", "F"]),
+        max_neighbors=1
+    )
+    model.rebuild()
+    assert model._neighbors["A"] == {"F": 3}
+
+    # A was pruned: only its retained pair grows until the next build
+    model.add_order({"items": [{"product_id": "A"}, {"product_id": "B"}, {"product_id": "F"}]})
+    assert model._neighbors["A"] == {"F": 4}
+
+def test_build_memory_is_bounded():
+    # A is bought with B every other order and with a new item in between
+    orders = []
+    for i in range(200):
+        orders.append(["A", "B"] if i % 2 else ["A", f"X{i}"])
+    model = CoPurchaseModel(_orders(*orders), max_neighbors=2, sketch_size=4)
+    model.rebuild()
+
+    assert len(model._neighbors["A"]) <= 2
+    # The true count is 100, the kept one undercounts by at most the recorded error
+    assert 100 - model.errors["A"] <= model._neighbors["A"]["B"] <= 100
+    assert model.errors["A"] <= 200 // 5
+    assert "A" in model._pruned
+
+def test_concurrent_callers_share_one_build():
+    orders = _orders(["A", "B"])
+    builds = []
+    find = orders.find
+
+    def slow_find(*args, **kwargs):
+        builds.append(1)
+        time.sleep(0.05)
+        return find(*args, **kwargs)
+
+    orders.find = slow_find
+    model = CoPurchaseModel(orders)
+    threads = [threading.Thread(target=model.ensure_built) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert model.built
+
+def test_background_build():
+    model = CoPurchaseModel(_orders(["A", "B"]))
+    assert model.scores_for(["A"]) == {}
+    model.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not model.built and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert model.scores_for(["A"]) == {"B": 1.0}
+    finally:
+        model.stop()
@@ -0,0 +1,23 @@
+from app.services.ingest import RecordParser, iter_records
+
+def test_lines_split_across_chunks():
+    body = b'{"a": 1}\n{"a": 2}\n{"a": 3}'
+    chunks = [body[i:i + 3] for i in range(0, len(body), 3)]
+    assert [row.record for row in iter_records(chunks)] == [{"a": 1}, {"a": 2}, {"a": 3}]
+
+def test_overlong_line_is_reported_and_skipped():
+    parser = RecordParser(max_line_bytes=16)
+    rows = parser.feed(b'{"a": 1}\n{"long": "')
+    for _ in range(100):
+        rows += parser.feed(b"x" * 10)
+        # Nothing of the long line is kept while it streams in
+        assert len(parser._buffer) <= 16
+    rows += parser.feed(b'"}\n{"a": 3}\n{"b": "' + b"y" * 20)
+    rows += parser.close()
+
+    assert [(row.line, row.record, row.error) for row in rows] == [
+        (1, {"a": 1}, None),
+        (2, None, "Line is longer than 16 bytes"),
+        (3, {"a": 3}, None),
+        (4, None, "Line is longer than 16 bytes"),
+    ]
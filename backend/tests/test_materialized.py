@@ -0,0 +1,68 @@
+import pytest
+from bson import ObjectId
+
+from app.memory_store import MemoryDatabase
+from app.services.batch import ScoringPool
+from app.services.materialized import RecommendationStore
+from app.services.scoring import CatalogScorer
+
+def _product(name, category, brand, notes, price):
+    return {"_id": ObjectId(), "name": name, "category": category, "brand": brand, "notes": notes,
+            "price": price, "size_ml": 100, "scent_strength": None, "season": None}
+
+class Snapshot:
+    def __init__(self, products):
+        self.products = {str(product["_id"]): product for product in products}
+
+    def get(self, product_id):
+        return self.products.get(product_id)
+
+    def scorer(self):
+        return CatalogScorer(list(self.products.values()))
+
+def _preferences(email, notes, categories):
+    return {"user_email": email, "favorite_notes": notes, "preferred_categories": categories,
+            "price_range": "luxury", "preferred_brands": [], "seasonal_preference": None, "scent_strength": None}
+
+def test_products_changed_rescores_only_matching_users():
+    db = MemoryDatabase("materialized_test")
+    snapshot = Snapshot([
+        _product("Rose One", "floral", "A", ["rose"], 900000),
+        _product("Oud One", "woody", "B", ["oud"], 900000),
+    ])
+    store = RecommendationStore(db.recommendations, db.preferences, snapshot, top_n=1)
+    db.preferences.insert_many([
+        _preferences("rose@example.com", ["rose", "jasmine"], ["floral"]),
+        _preferences("oud@example.com", ["oud"], ["woody"]),
+    ])
+    for email in ("rose@example.com", "oud@example.com"):
+        store.refresh_user(email)
+
+    rose_two = _product("Rose Two", "floral", "C", ["rose", "jasmine"], 900000)
+    snapshot.products[str(rose_two["_id"])] = rose_two
+    refreshed = []
+    refresh_user = store.refresh_user
+    store.refresh_user = lambda email, scorer=None: refreshed.append(email) or refresh_user(email, scorer)
+    store.products_changed([str(rose_two["_id"])])
+
+    assert refreshed == ["rose@example.com"]
+    stored = db.recommendations.find_one({"user_email": "rose@example.com"})
+    assert stored["product_ids"] == [str(rose_two["_id"])]
+
+def test_products_changed_above_threshold_scores_on_the_pool():
+    db = MemoryDatabase("materialized_test")
+    snapshot = Snapshot([_product("Rose One", "floral", "A", ["rose"], 900000)])
+    # One worker scores inline, the same path the pool's workers run
+    store = RecommendationStore(db.recommendations, db.preferences, snapshot, top_n=1, pool=ScoringPool(1))
+    emails = [f"rose{i}@example.com" for i in range(3)]
+    db.preferences.insert_many([_preferences(email, ["rose", "jasmine"], ["floral"]) for email in emails])
+    for email in emails:
+        store.refresh_user(email)
+
+    rose_two = _product("Rose Two", "floral", "C", ["rose", "jasmine"], 900000)
+    snapshot.products[str(rose_two["_id"])] = rose_two
+    store.refresh_user = lambda email, scorer=None: pytest.fail("rescored one by one")
+    store.products_changed([str(rose_two["_id"])], pool_threshold=2)
+
+    for email in emails:
+        assert db.recommendations.find_one({"user_email": email})["product_ids"] == [str(rose_two["_id"])]
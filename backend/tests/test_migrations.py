@@ -0,0 +1,62 @@
+import os
+import uuid
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from app.memory_store import MemoryDatabase
+from app.migrations import HOT_QUERIES, MIGRATIONS, run_migrations, verify_indexes
+
+# Hot queries the memory store answers with a hash lookup: equality on a unique index
+MEMORY_INDEXED = [
+    ("users", {"email": "user@example.com"}),
+    ("preferences", {"user_email": "user@example.com"}),
+    ("carts", {"user_email": "user@example.com"}),
+    ("products", {"name": "Perfume"}),
+    ("recommendations", {"user_email": "user@example.com"}),
+]
+
+def _indexed(report):
+    return [(entry["collection"], entry["query"]) for entry in report if entry["indexed"]]
+
+def test_migrations_apply_once():
+    db = MemoryDatabase("migrations_test")
+    assert run_migrations(db) == [migration.version for migration in MIGRATIONS]
+    assert run_migrations(db) == []
+    assert db.products.index_information()["name_1"]["unique"]
+
+def test_memory_explain_matches_lookups():
+    db = MemoryDatabase("migrations_test")
+    assert _indexed(verify_indexes(db)) == []
+
+    run_migrations(db)
+    report = verify_indexes(db)
+    assert _indexed(report) == MEMORY_INDEXED
+    # Non-unique indexes are recorded but never used by the memory store
+    scans = [(entry["collection"], entry["query"]) for entry in report if not entry["indexed"]]
+    assert ("products", {"category": "floral"}) in scans
+    assert all(entry["stages"] == ["COLLSCAN"] for entry in report if not entry["indexed"])
+
+def _mongo_database():
+    url = os.getenv("MONGODB_URL")
+    if not url:
+        pytest.skip("MONGODB_URL is not set")
+    client = MongoClient(url, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip("MongoDB is not reachable")
+    return client, f"migrations_test_{uuid.uuid4().hex[:8]}"
+
+def test_mongo_hot_queries_use_indexes():
+    client, name = _mongo_database()
+    try:
+        db = client[name]
+        run_migrations(db)
+        report = verify_indexes(db)
+        assert _indexed(report) == HOT_QUERIES, [entry for entry in report if not entry["indexed"]]
+    finally:
+        client.drop_database(name)
+        client.close()
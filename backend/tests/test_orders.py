@@ -0,0 +1,33 @@
+import asyncio
+
+from app.routes.auth import get_current_active_user
+from app.main import app
+from app.memory_store import AsyncMemoryDatabase, MemoryDatabase
+from app.repositories import OrderRepository
+
+# Orders in backup/perfume_db predate total_amount_idr and use status "pending"
+LEGACY_ORDER_USER = "test2@example.com"
+
+def test_legacy_orders_render(client):
+    app.dependency_overrides[get_current_active_user] = lambda: {"email": LEGACY_ORDER_USER}
+
+    response = client.get("/api/orders")
+
+    assert response.status_code == 200
+    orders = response.json()
+    assert len(orders) == 1
+    order = orders[0]
+    assert order["status"] == "pending"
+    assert order["total_amount_idr"] == 140.0
+    assert order["total_amount_sol"] is None
+    assert [item["name"] for item in order["items"]] == ["Sauvage", "California"]
+
+def test_order_is_marked_paid_once():
+    orders = OrderRepository(AsyncMemoryDatabase(MemoryDatabase("orders_test")).orders)
+
+    async def race():
+        result = await orders.create({"user_email": "buyer@example.com", "status": "pending_payment", "items": []})
+        order_id = str(result.inserted_id)
+        return await asyncio.gather(orders.mark_paid(order_id), orders.mark_paid(order_id))
+
+    assert sorted(asyncio.run(race())) == [False, True]
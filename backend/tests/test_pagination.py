@@ -0,0 +1,19 @@
+import asyncio
+
+import pytest
+
+from app.main import app
+from app.memory_store import AsyncMemoryDatabase, MemoryDatabase
+from app.pagination import keyset_page
+from app.routes.auth import get_current_active_user
+
+@pytest.mark.parametrize("path", ["/auth/users", "/api/preferences"])
+@pytest.mark.parametrize("limit", [0, -1, 101])
+def test_list_routes_reject_out_of_range_limits(client, path, limit):
+    app.dependency_overrides[get_current_active_user] = lambda: {"email": "admin@example.com", "is_admin": True}
+    assert client.get(f"{path}?limit={limit}").status_code == 422
+
+def test_keyset_page_requires_a_positive_limit():
+    collection = AsyncMemoryDatabase(MemoryDatabase("pagination_test")).users
+    with pytest.raises(AssertionError):
+        asyncio.run(keyset_page(collection, limit=0))
@@ -0,0 +1,53 @@
+import json
+import uuid
+
+from app.database import async_db
+from app.main import app
+from app.repositories import ProductRepository, get_product_repository
+from app.routes.auth import get_current_active_user
+from app.services.ingest import ParsedRow
+from app.services.product_import import ProductImporter
+
+def _rows(count):
+    return [
+        {"name": f"Import {uuid.uuid4().hex[:8]}", "brand": "Brand", "category": "floral", "notes": ["rose"],
+         "price": 300000, "size_ml": 50, "description": "Imported"}
+        for _ in range(count)
+    ]
+
+class FailingProducts(ProductRepository):
+    """Writes the first `succeed` batches, then loses the database"""
+
+    def __init__(self, collection, succeed=0):
+        super().__init__(collection)
+        self.succeed = succeed
+
+    async def bulk_write(self, operations, ordered=False):
+        if self.succeed <= 0:
+            raise ConnectionError("database went away")
+        self.succeed -= 1
+        return await super().bulk_write(operations, ordered)
+
+def test_failed_import_reports_batches_already_written(client):
+    importer = ProductImporter(FailingProducts(async_db.products, succeed=1), batch_size=2)
+
+    async def rows():
+        for line, record in enumerate(_rows(5), start=1):
+            yield ParsedRow(line, record)
+
+    report = client.loop.run_until_complete(importer.run(rows()))
+    assert report["error"] == "database went away"
+    assert report["inserted"] == 2
+    assert report["failed"] == 2
+    assert len(importer.changed_ids) == 2
+
+def test_import_route_returns_partial_report(client):
+    app.dependency_overrides[get_current_active_user] = lambda: {"email": "admin@example.com", "is_admin": True}
+    app.dependency_overrides[get_product_repository] = lambda: FailingProducts(async_db.products)
+
+    body = "".join(json.dumps(row) + "\n" for row in _rows(3))
+    response = client.post("/api/products/import", content=body)
+    assert response.status_code == 500
+    report = response.json()
+    assert report["detail"] == "Error importing products: database went away"
+    assert report["inserted"] == 0 and report["failed"] == 3
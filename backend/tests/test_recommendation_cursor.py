@@ -0,0 +1,86 @@
+import random
+
+from bson import ObjectId
+
+from app.main import app
+from app.memory_store import MemoryDatabase
+from app.routes.auth import get_current_active_user
+from app.services.recommender import (
+    PerfumeRecommender, decode_cursor, next_cursor, preference_fingerprint, recommendation_cache
+)
+from app.services.scoring import CatalogScorer
+
+PREFERENCES = {"favorite_notes": ["rose"], "preferred_categories": ["floral"], "price_range": "mid-range"}
+
+def _products(count):
+    rng = random.Random(7)
+    return [
+        {"_id": ObjectId(), "name": f"Perfume {i}", "category": rng.choice(["floral", "woody"]),
+         "brand": "brand", "notes": rng.sample(["rose", "oud", "musk"], 1),
+         "price": rng.choice([150000, 300000]), "size_ml": 50}
+        for i in range(count)
+    ]
+
+def _pages(scorer, limit):
+    served, after = [], None
+    while True:
+        page = scorer.recommend_scored(PREFERENCES, limit, after)
+        served.extend((product["_id"], score) for product, score in page)
+        cursor = next_cursor(page, limit)
+        if cursor is None:
+            return served
+        after = decode_cursor(cursor)
+
+def test_pages_agree_across_row_layouts():
+    products = _products(40)
+    shuffled = products[:]
+    random.Random(3).shuffle(shuffled)
+
+    pages = [_pages(CatalogScorer(rows), 7) for rows in (products, shuffled)]
+    assert pages[0] == pages[1]
+    # Every product exactly once, best score first and ties by product id
+    assert sorted(pages[0], key=lambda item: (-item[1], item[0])) == pages[0]
+    assert len({product_id for product_id, _ in pages[0]}) == len(products)
+
+def test_cursor_resumes_after_deleted_product():
+    products = _products(20)
+    scorer = CatalogScorer(products)
+    first = scorer.recommend_scored(PREFERENCES, 5)
+    after = decode_cursor(next_cursor(first, 5))
+
+    remaining = [product for product in products if str(product["_id"]) != after[1]]
+    resumed = CatalogScorer(remaining).recommend_scored(PREFERENCES, 5, after)
+    assert resumed == scorer.recommend_scored(PREFERENCES, 5, after)
+
+class RacingCatalog:
+    """Refreshed right after handing out a scorer"""
+    def __init__(self, products):
+        self.products = products
+        self.version = 1
+
+    def scorer(self):
+        scorer = CatalogScorer(self.products, self.version)
+        self.version += 1
+        return scorer
+
+def test_results_are_cached_under_the_scorer_version():
+    db = MemoryDatabase("recommendation_cursor_test")
+    db.preferences.insert_one({"user_email": "user@example.com", **PREFERENCES})
+    recommender = PerfumeRecommender()
+    recommender.preferences_collection = db.preferences
+    recommender.catalog = RacingCatalog(_products(10))
+    recommendation_cache.clear()
+    try:
+        recommender.get_recommendation_page("user@example.com", 5)
+        fingerprint = preference_fingerprint(PREFERENCES)
+        assert recommendation_cache.get((fingerprint, 1, 5, None)) is not None
+        assert recommendation_cache.get((fingerprint, 2, 5, None)) is None
+    finally:
+        recommendation_cache.clear()
+
+def test_route_rejects_bad_limits_and_blend_cursors(client):
+    app.dependency_overrides[get_current_active_user] = lambda: {"email": "user@example.com"}
+    for limit in (0, 51):
+        assert client.get(f"/api/recommendations?limit={limit}").status_code == 422
+    response = client.get("/api/recommendations?mode=blend&cursor=abc")
+    assert response.status_code == 400
@@ -0,0 +1,39 @@
+from bson import ObjectId
+
+from app.services.scoring import CatalogScorer
+
+def _catalog():
+    # 8 of 10 products are floral, 2 carry oud
+    return [
+        {"_id": ObjectId(), "name": f"Perfume {i}", "category": "floral" if i < 8 else "woody",
+         "brand": "brand", "notes": ["oud"] if i in (3, 9) else ["rose"], "price": 300000, "size_ml": 50}
+        for i in range(10)
+    ]
+
+def _rank(scorer, preferences, limit):
+    """rank() plus whether it scored a candidate subset"""
+    subsets = []
+    score = scorer.score
+    scorer.score = lambda prefs, rows=None: subsets.append(rows is not None) or score(prefs, rows)
+    try:
+        return scorer.rank(preferences, limit).tolist(), any(subsets)
+    finally:
+        scorer.score = score
+
+def _full_scan(scorer, preferences, limit):
+    return scorer.top_k(scorer.score(preferences), limit, tie_keys=scorer.id_ranks()).tolist()
+
+def test_broad_profiles_go_straight_to_full_scan():
+    scorer = CatalogScorer(_catalog())
+    broad = {"preferred_categories": ["floral"], "favorite_notes": ["oud"]}
+    assert scorer.candidates(broad).size > scorer.size // 2
+    rows, scored_subset = _rank(scorer, broad, 3)
+    assert not scored_subset
+    assert rows == _full_scan(scorer, broad, 3)
+
+def test_narrow_profiles_score_candidates_only():
+    scorer = CatalogScorer(_catalog())
+    narrow = {"favorite_notes": ["oud"]}
+    rows, scored_subset = _rank(scorer, narrow, 2)
+    assert scored_subset
+    assert rows == _full_scan(scorer, narrow, 2)
@@ -0,0 +1,8 @@
+from app.services.similarity import SimilarityIndex
+
+def test_ties_are_ordered_by_product_id():
+    index = SimilarityIndex()
+    for product_id in ("d", "b", "c", "a"):
+        index.add(product_id, ["rose", "oud"])
+    index.add("seed", ["rose", "oud"])
+    assert index.similar("seed", 3) == [("a", 1.0), ("b", 1.0), ("c", 1.0)]
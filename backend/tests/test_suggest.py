@@ -0,0 +1,29 @@
+from collections import Counter
+
+from bson import ObjectId
+
+from app.services.copurchase import copurchase_model
+from app.services.suggest import SuggestIndex
+
+def _index():
+    index = SuggestIndex(cache_ttl=0)
+    products = [{"_id": ObjectId(), "name": name, "brand": "Dior", "notes": []}
+                for name in ("Sauvage", "Sauvage Elixir")]
+    index.load(products)
+    return index, [str(product["_id"]) for product in products]
+
+def test_suggest_never_builds_copurchase_model(monkeypatch):
+    def rebuild():
+        raise AssertionError("suggest must not build the co-purchase model")
+
+    monkeypatch.setattr(copurchase_model, "rebuild", rebuild)
+    monkeypatch.setattr(copurchase_model, "_built_at", None)
+    monkeypatch.setattr(copurchase_model, "item_counts", Counter())
+    index, _ = _index()
+    assert [s["text"] for s in index.suggest("sau")] == ["Sauvage", "Sauvage Elixir"]
+
+def test_suggest_ranks_by_paid_orders_once_built(monkeypatch):
+    index, (_, elixir_id) = _index()
+    monkeypatch.setattr(copurchase_model, "_built_at", 0.0)
+    monkeypatch.setattr(copurchase_model, "item_counts", Counter({elixir_id: 3}))
+    assert [s["text"] for s in index.suggest("sau")] == ["Sauvage Elixir", "Sauvage"]
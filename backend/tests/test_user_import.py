@@ -0,0 +1,67 @@
+import asyncio
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.database import async_db
+from app.main import app
+from app.memory_store import AsyncMemoryDatabase, MemoryDatabase
+from app.repositories import CartRepository, UserRepository, get_user_repository
+from app.routes.auth import get_current_active_user
+from app.services.ingest import ParsedRow
+from app.services.user_import import UserImporter, import_hashing_pool
+
+def _rows(count):
+    return [
+        {"email": f"import-{uuid.uuid4().hex[:8]}@example.com", "password": "secret123", "full_name": "Imported"}
+        for _ in range(count)
+    ]
+
+def _body(rows):
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+class FailingUsers(UserRepository):
+    """Inserts the first `succeed` batches, then loses the database"""
+
+    def __init__(self, collection, succeed=0):
+        super().__init__(collection)
+        self.succeed = succeed
+
+    async def bulk_write(self, operations, ordered=False):
+        if self.succeed <= 0:
+            raise ConnectionError("database went away")
+        self.succeed -= 1
+        return await super().bulk_write(operations, ordered)
+
+def test_failed_import_reports_rows_already_written():
+    db = AsyncMemoryDatabase(MemoryDatabase("user_import_test"))
+    importer = UserImporter(
+        FailingUsers(db.users, succeed=1), CartRepository(db.carts),
+        workers=1, batch_size=2, rounds=4, executor=ThreadPoolExecutor(1)
+    )
+
+    async def rows():
+        for line, record in enumerate(_rows(5), start=1):
+            yield ParsedRow(line, record)
+
+    report = asyncio.run(importer.run(rows()))
+    assert report["error"] == "database went away"
+    assert report["inserted"] == 2
+    assert report["failed"] == 3
+    assert report["rows"] == report["inserted"] + report["failed"]
+
+def test_import_route_shares_pool_and_returns_partial_report(client):
+    app.dependency_overrides[get_current_active_user] = lambda: {"email": "admin@example.com", "is_admin": True}
+
+    response = client.post("/auth/users/import", content=_body(_rows(2)))
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 2
+    executor = import_hashing_pool.executor()
+
+    app.dependency_overrides[get_user_repository] = lambda: FailingUsers(async_db.users)
+    response = client.post("/auth/users/import", content=_body(_rows(2)))
+    assert response.status_code == 500
+    report = response.json()
+    assert report["detail"] == "Error importing users: database went away"
+    assert report["inserted"] == 0 and report["failed"] == 2
+    assert import_hashing_pool.executor() is executor